@@ -12,11 +12,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from asreviewcontrib.hyperopt.active import HyperActiveEntryPoint
-from asreviewcontrib.hyperopt.cluster import HyperClusterEntryPoint
-from asreviewcontrib.hyperopt.passive import HyperPassiveEntryPoint
-from asreviewcontrib.hyperopt.show_trials import ShowTrialsEntryPoint
-from asreviewcontrib.hyperopt.create_config import CreateConfigEntryPoint
+from importlib import import_module
 
 __version__ = "0.2.0"
 __extension_name__ = "asreview-hyperopt"
+
+# The entry points are imported on first use, so that importing the package
+# (e.g. by every MPI rank, or by the asreview CLI) does not load all
+# dependencies.
+_ENTRY_POINTS = {
+    "HyperActiveEntryPoint": "asreviewcontrib.hyperopt.active",
+    "HyperClusterEntryPoint": "asreviewcontrib.hyperopt.cluster",
+    "HyperPassiveEntryPoint": "asreviewcontrib.hyperopt.passive",
+    "ShowTrialsEntryPoint": "asreviewcontrib.hyperopt.show_trials",
+    "CreateConfigEntryPoint": "asreviewcontrib.hyperopt.create_config",
+    "CompareTrialsEntryPoint": "asreviewcontrib.hyperopt.compare_trials",
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = _ENTRY_POINTS[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    return getattr(import_module(module_name), name)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_ENTRY_POINTS))
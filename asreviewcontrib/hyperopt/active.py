@@ -13,8 +13,12 @@
 # limitations under the License.
 
 import sys
+import time
 import argparse
 import logging
+import os
+from functools import partial
+from itertools import product
 
 from asreview.entry_points import BaseEntryPoint
 
@@ -22,7 +26,6 @@ from asreviewcontrib.hyperopt.serial_executor import serial_executor
 from asreviewcontrib.hyperopt.serial_executor import serial_hyper_optimize
 from asreviewcontrib.hyperopt.job_utils import get_data_names,\
     _base_parse_arguments
-from asreviewcontrib.hyperopt.active_job import ActiveJobRunner
 
 
 class HyperActiveEntryPoint(BaseEntryPoint):
@@ -49,28 +52,57 @@ def _parse_arguments():
         type=str,
         default="nb",
         help="Prediction model for active learning."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time."
     )
     parser.add_argument(
         "-q", "--query_strategy",
         type=str,
         default="max_random",
         help="Query strategy for active learning."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time."
     )
     parser.add_argument(
         "-b", "--balance_strategy",
         type=str,
         default="simple",
         help="Balance strategy for active learning."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time."
     )
     parser.add_argument(
         "-e", "--feature_extraction",
         type=str,
         default="tfidf",
-        help="Feature extraction method.")
+        help="Feature extraction method."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time.")
+    parser.add_argument(
+        "--batch_runs",
+        action="store_true",
+        help="Simulate all runs of a dataset in lock-step, in a single job."
+        " Only for the nb and logistic models with the max query strategy"
+        " and the simple balance strategy; other combinations are simulated"
+        " run by run."
+    )
     return parser
 
 
 def main(argv=sys.argv[1:]):
+    # The time budget includes the start up and the final flush of results.
+    start_time = time.time()
+    # Import the job runner here, so that the asreview CLI starts quickly.
+    from asreviewcontrib.hyperopt.active_job import ActiveJobRunner
+    from asreviewcontrib.hyperopt.sweep import SweepJobRunner
+    from asreviewcontrib.hyperopt.sweep import parse_names
+    from asreviewcontrib.hyperopt.feature_cache import FeatureCache
+    from asreviewcontrib.hyperopt.metrics import MetricsRecorder
+    from asreviewcontrib.hyperopt.metrics import get_worker_ids
+    from asreviewcontrib.hyperopt.profiling import JobProfiler
+    from asreviewcontrib.hyperopt.scratch import ScratchStaging
+    from asreviewcontrib.hyperopt.warm_start import WarmStart
+
     parser = _parse_arguments()
     args = vars(parser.parse_args(argv))
     datasets = args["datasets"].split(",")
@@ -79,27 +111,80 @@ def main(argv=sys.argv[1:]):
     balance_name = args["balance_strategy"]
     query_name = args["query_strategy"]
     n_iter = args["n_iter"]
+    deadline = None
+    if args["time_budget"] is not None:
+        deadline = start_time + args["time_budget"]
+    cost_aware = args["cost_aware"]
     use_mpi = args["use_mpi"]
     n_run = args["n_run"]
     server_job = args["server_job"]
     data_dir = args["data_dir"]
     output_dir = args["output_dir"]
+    job_timeout = args["job_timeout"]
+    max_retries = args["max_retries"]
 
     data_names = get_data_names(datasets, data_dir=data_dir)
+    if use_mpi and args["n_threads"] > 1:
+        parser.error("--n_threads cannot be used with --mpi.")
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_executor
-        executor = mpi_executor
+        executor = partial(mpi_executor, job_timeout=job_timeout,
+                           max_retries=max_retries)
+    elif args["n_threads"] > 1:
+        from asreviewcontrib.hyperopt.thread_executor import thread_executor
+        executor = partial(thread_executor, n_threads=args["n_threads"])
     else:
         executor = serial_executor
 
-    job_runner = ActiveJobRunner(
-        data_names, model_name=model_name, query_name=query_name,
-        balance_name=balance_name, feature_name=feature_name,
-        executor=executor, n_run=n_run, server_job=server_job,
-        data_dir=data_dir, output_dir=output_dir)
+    # Comma separated lists of models give a sweep over all combinations.
+    combinations = list(product(parse_names(model_name),
+                                parse_names(query_name),
+                                parse_names(balance_name),
+                                parse_names(feature_name)))
+    job_runners = []
+    for model, query, balance, feature in combinations:
+        runner_output_dir = output_dir
+        if output_dir is not None and len(combinations) > 1:
+            runner_output_dir = os.path.join(
+                output_dir, "_".join([model, query, balance, feature]))
+        job_runner = ActiveJobRunner(
+            data_names, model_name=model, query_name=query,
+            balance_name=balance, feature_name=feature,
+            executor=executor, n_run=n_run, server_job=server_job,
+            data_dir=data_dir, output_dir=runner_output_dir,
+            batch_runs=args["batch_runs"])
+        if args["warm_start"] is not None:
+            job_runner.warm_start = WarmStart(
+                args["warm_start"].split(","), args["n_warm_start"])
+        if args["profile"] is not None:
+            job_runner.profiler = JobProfiler(
+                args["profile"],
+                os.path.join(job_runner.trials_dir, "profiles"))
+        if args["scratch_dir"] is not None:
+            job_runner.scratch = ScratchStaging(
+                args["scratch_dir"], job_runner.trials_dir,
+                flush=args["scratch_flush"])
+        if args["n_threads"] > 1:
+            job_runner.feature_cache = FeatureCache()
+        job_runners.append(job_runner)
+
+    if len(job_runners) > 1:
+        job_runner = SweepJobRunner(job_runners, executor=executor,
+                                    server_job=server_job)
+    metrics_dir = os.path.commonpath([runner.trials_dir
+                                      for runner in job_runners])
+
+    if args["metrics"] or args["prometheus_file"] is not None:
+        job_runner.metrics = MetricsRecorder(
+            os.path.join(metrics_dir, "metrics.jsonl"),
+            prometheus_fp=args["prometheus_file"],
+            interval=args["metrics_interval"],
+            workers=get_worker_ids(use_mpi, server_job, args["n_threads"]))
 
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_hyper_optimize
-        mpi_hyper_optimize(job_runner, n_iter)
+        mpi_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                           cost_aware=cost_aware)
     else:
-        serial_hyper_optimize(job_runner, n_iter)
+        serial_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                              cost_aware=cost_aware)
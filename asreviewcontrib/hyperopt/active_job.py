@@ -12,36 +12,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 import os
-import pickle
-from distutils.dir_util import copy_tree
 
-from hyperopt import STATUS_OK, Trials, fmin, tpe
 import numpy as np
-from tqdm import tqdm
-
 
 from asreview.analysis.analysis import Analysis
 from asreview.balance_strategies.utils import get_balance_model
+from asreview.feature_extraction.utils import get_feature_class
 from asreview.feature_extraction.utils import get_feature_model
 from asreview.models.utils import get_model
 from asreview.query_strategies.utils import get_query_model
-from asreview import ASReviewData
 from asreview.review.factory import get_reviewer
 
+from asreviewcontrib.hyperopt.base_job import BaseJobRunner
+from asreviewcontrib.hyperopt.batch_simulate import avg_time_to_discovery
+from asreviewcontrib.hyperopt.batch_simulate import batch_simulate
+from asreviewcontrib.hyperopt.batch_simulate import get_batch_model
+from asreviewcontrib.hyperopt.batch_simulate import supports_batch_simulation
 from asreviewcontrib.hyperopt.job_utils import get_trial_fp
 from asreviewcontrib.hyperopt.job_utils import get_split_param
 from asreviewcontrib.hyperopt.job_utils import data_fp_from_name
+from asreviewcontrib.hyperopt.job_utils import get_out_dir
+from asreviewcontrib.hyperopt.model_cache import cache_model_loaders
+from asreviewcontrib.hyperopt.random_state import get_random_state
+from asreviewcontrib.hyperopt.random_state import uses_global_random_state
 from asreviewcontrib.hyperopt.serial_executor import serial_executor
-from os.path import isfile
+from asreviewcontrib.hyperopt.timing import PhaseTimer
+
 
+# Value of i_run for jobs that simulate all runs of a dataset.
+ALL_RUNS = -1
 
-class ActiveJobRunner():
+
+class ActiveJobRunner(BaseJobRunner):
     def __init__(self, data_names, model_name, query_name, balance_name,
                  feature_name, executor=serial_executor,
                  n_run=8, n_papers=1502, n_instances=50, n_included=1,
                  n_excluded=1, server_job=False, data_dir="data",
-                 output_dir=None):
+                 output_dir=None, batch_runs=False):
 
         self.trials_dir, self.trials_fp = get_trial_fp(
             data_names, model_name=model_name, balance_name=balance_name,
@@ -49,6 +58,8 @@ class ActiveJobRunner():
             hyper_type="active", output_dir=output_dir)
 
         self.feature_name = feature_name
+        # Load pretrained models only once per process.
+        cache_model_loaders(feature_name)
         self.balance_name = balance_name
         self.query_name = query_name
         self.model_name = model_name
@@ -65,41 +76,107 @@ class ActiveJobRunner():
         self.data_dir = data_dir
         self._cache = {data_name: {"priors": {}}
                        for data_name in data_names}
-
-    def create_loss_function(self):
-        def objective_func(param):
-            jobs = create_jobs(param, self.data_names, self.n_run)
-
-            self.executor(jobs, self, stop_workers=False,
-                          server_job=self.server_job)
-            losses = []
-            for data_name in self.data_names:
-                data_dir = os.path.join(self.trials_dir, 'current', data_name)
-                losses.append(loss_from_dir(data_dir))
-            return {"loss": np.average(losses), 'status': STATUS_OK}
-
-        return objective_func
+        self._loss_memo = {}
+
+        # Simulate the runs of each dataset in lock-step in a single job.
+        # The models are trained from the start, so the priors need both
+        # included and excluded records.
+        self.batch_runs = (
+            batch_runs and n_included > 0 and n_excluded > 0
+            and supports_batch_simulation(model_name, query_name,
+                                          balance_name))
+        if batch_runs and not self.batch_runs:
+            logging.warning(
+                f"Cannot simulate the runs of {model_name}/{query_name}/"
+                f"{balance_name} in lock-step, simulating them separately.")
+        self.feature_class = get_feature_class(feature_name)
+
+    def create_jobs(self, param, data_names):
+        if self.batch_runs:
+            return [{"param": param, "data_name": data_name, "i_run": ALL_RUNS}
+                    for data_name in data_names]
+        return create_jobs(param, data_names, self.n_run)
+
+    def dataset_loss(self, data_name):
+        if self.batch_runs:
+            return loss_from_batch_file(
+                get_batch_file_name(self.results_dir, data_name))
+        data_dir = os.path.join(self.results_dir, 'current', data_name)
+        return loss_from_dir(data_dir)
+
+    def run_settings(self):
+        return (self.n_run, self.n_papers, self.n_instances, self.n_included,
+                self.n_excluded)
+
+    def trials_info(self):
+        return {
+            "model_name": self.model_name,
+            "balance_name": self.balance_name,
+            "feature_name": self.feature_name,
+            "query_name": self.query_name,
+        }
+
+    def uses_global_random_state(self):
+        return uses_global_random_state(
+            model_name=self.model_name, query_name=self.query_name,
+            balance_name=self.balance_name, feature_name=self.feature_name)
 
     def execute(self, param, data_name, i_run):
+        if i_run == ALL_RUNS:
+            return self.execute_batch(param, data_name)
+
+        timer = PhaseTimer()
         split_param = get_split_param(param)
-        state_file = get_state_file_name(self.trials_dir, data_name, i_run)
+        state_file = get_state_file_name(self.results_dir, data_name,
+                                         i_run)
         try:
             os.remove(state_file)
         except FileNotFoundError:
             pass
 
-        start_idx = self.get_cached_priors(data_name, i_run)
-
-        reviewer = get_reviewer(
-            data_fp_from_name(self.data_dir, data_name),
-            mode='simulate', model=self.model_name,
-            query_strategy=self.query_name, balance_strategy=self.balance_name,
-            feature_extraction=self.feature_name, n_instances=self.n_instances,
-            n_papers=self.n_papers, state_file=state_file,
-            prior_idx=start_idx,
-            **split_param)
-
-        reviewer.review()
+        with timer.phase("data"):
+            start_idx = self.get_cached_priors(data_name, i_run)
+
+        # The reviewer loads the data and computes the feature matrix.
+        with timer.phase("features"):
+            reviewer = get_reviewer(
+                data_fp_from_name(self.data_dir, data_name),
+                mode='simulate', model=self.model_name,
+                query_strategy=self.query_name,
+                balance_strategy=self.balance_name,
+                feature_extraction=self.feature_name,
+                n_instances=self.n_instances,
+                n_papers=self.n_papers, state_file=state_file,
+                prior_idx=start_idx,
+                **split_param)
+
+        with timer.phase("review"):
+            reviewer.review()
+        return timer.report()
+
+    def execute_batch(self, param, data_name):
+        """Simulate all runs of a dataset in lock-step."""
+        timer = PhaseTimer()
+        split_param = get_split_param(param)
+        feature_model = self.feature_class(**split_param["feature_param"])
+        model = get_batch_model(self.model_name, **split_param["model_param"])
+
+        with timer.phase("data"):
+            labels = self.get_cached_labels(data_name)
+            prior_idx = np.array([self.get_cached_priors(data_name, i_run)
+                                  for i_run in range(self.n_run)])
+        with timer.phase("features"):
+            X = self.get_features(feature_model, split_param["feature_param"],
+                                  data_name)
+        with timer.phase("review"):
+            label_order, proba_order = batch_simulate(
+                X, labels, prior_idx, model, n_instances=self.n_instances,
+                n_papers=self.n_papers)
+        with timer.phase("io"):
+            np.savez(get_batch_file_name(self.results_dir, data_name),
+                     labels=labels, label_order=label_order,
+                     proba_order=proba_order, n_initial=prior_idx.shape[1])
+        return timer.report()
 
     def get_cached_priors(self, data_name, i_run):
         try:
@@ -107,22 +184,22 @@ class ActiveJobRunner():
         except KeyError:
             pass
 
-        try:
-            as_data = self._cache[data_name]["as_data"]
-        except KeyError:
-            data_fp = data_fp_from_name(self.data_dir, data_name)
-            as_data = ASReviewData.from_file(data_fp)
-            self._cache[data_name]["as_data"] = as_data
+        as_data = self.get_cached_as_data(data_name)
 
-        np.random.seed(i_run)
+        random_state = get_random_state(i_run)
         ones = np.where(as_data.labels == 1)[0]
         zeros = np.where(as_data.labels == 0)[0]
-        included = np.random.choice(ones, self.n_included, replace=False)
-        excluded = np.random.choice(zeros, self.n_excluded, replace=False)
+        included = random_state.choice(ones, self.n_included, replace=False)
+        excluded = random_state.choice(zeros, self.n_excluded, replace=False)
         self._cache[data_name]["priors"][i_run] = np.append(included, excluded)
 
         return self._cache[data_name]["priors"][i_run]
 
+    def prewarm(self):
+        for data_name in self.data_names:
+            for i_run in range(self.n_run):
+                self.get_cached_priors(data_name, i_run)
+
     def get_hyper_space(self):
         model_hs, model_hc = get_model(self.model_name).hyper_space()
         query_hs, query_hc = get_query_model(self.query_name).hyper_space()
@@ -134,58 +211,6 @@ class ActiveJobRunner():
         hyper_choices = {**model_hc, **query_hc, **balance_hc, **feature_hc}
         return hyper_space, hyper_choices
 
-    def hyper_optimize(self, n_iter):
-        obj_function = self.create_loss_function()
-        hyper_space, hyper_choices = self.get_hyper_space()
-
-        try:
-            with open(self.trials_fp, "rb") as fp:
-                trials_data = pickle.load(fp)
-            trials = trials_data["trials"]
-        except FileNotFoundError:
-            trials = None
-            print(f"Creating new hyper parameter optimization run: "
-                  f"{self.trials_fp}")
-
-        if trials is None:
-            trials = Trials()
-            n_start_evals = 0
-        else:
-            n_start_evals = len(trials.trials)
-
-        try:
-            current_dir = os.path.join(self.trials_dir, "current")
-            for data_name in os.listdir(current_dir):
-                data_dir = os.path.join(current_dir, data_name)
-                result_files = [os.path.join(data_dir, f)
-                                for f in os.listdir(data_dir)]
-                for res_file in result_files:
-                    if isfile(res_file):
-                        os.remove(res_file)
-        except FileNotFoundError:
-            pass
-
-        for i in tqdm(range(n_iter)):
-            fmin(fn=obj_function,
-                 space=hyper_space,
-                 algo=tpe.suggest,
-                 max_evals=i+n_start_evals+1,
-                 trials=trials,
-                 show_progressbar=False)
-            trials_data = {
-                "trials": trials,
-                "hyper_choices": hyper_choices,
-                "model_name": self.model_name,
-                "balance_name": self.balance_name,
-                "feature_name": self.feature_name,
-                "query_name": self.query_name,
-            }
-            with open(self.trials_fp, "wb") as fp:
-                pickle.dump(trials_data, fp)
-            if trials.best_trial['tid'] == len(trials.trials)-1:
-                copy_tree(os.path.join(self.trials_dir, "current"),
-                          os.path.join(self.trials_dir, "best"))
-
 
 def loss_spread(time_results, n_papers, moment=1.0):
     loss = 0
@@ -200,6 +225,15 @@ def loss_from_dir(data_dir):
     return loss_spread(results, len(analysis.labels))
 
 
+def loss_from_batch_file(batch_fp):
+    with np.load(batch_fp) as data:
+        labels = data["labels"]
+        results = avg_time_to_discovery(
+            labels, data["label_order"], data["proba_order"],
+            int(data["n_initial"]))
+    return loss_spread(results, len(labels))
+
+
 def create_jobs(param, data_names, n_run):
     jobs = []
     for data_name in data_names:
@@ -215,3 +249,8 @@ def create_jobs(param, data_names, n_run):
 def get_state_file_name(trials_dir, data_name, i_run):
     return os.path.join(trials_dir, "current", data_name,
                         f"results_{i_run}.h5")
+
+
+def get_batch_file_name(trials_dir, data_name):
+    return os.path.join(get_out_dir(trials_dir, data_name),
+                        "results_all_runs.npz")
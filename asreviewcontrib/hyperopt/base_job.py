@@ -0,0 +1,428 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+from os.path import isfile
+import pickle
+import threading
+import time
+from itertools import count
+from distutils.dir_util import copy_tree
+
+from hyperopt import STATUS_FAIL, STATUS_OK, Trials, fmin, tpe
+import numpy as np
+from tqdm import tqdm
+
+from asreview import ASReviewData
+
+from asreviewcontrib.hyperopt.cost_aware import cost_aware_suggest
+from asreviewcontrib.hyperopt.feature_cache import DETERMINISTIC_FEATURES
+from asreviewcontrib.hyperopt.fidelity import compute_subsample_idx
+from asreviewcontrib.hyperopt.job_utils import JobFailedError
+from asreviewcontrib.hyperopt.job_utils import canonical_param
+from asreviewcontrib.hyperopt.job_utils import data_fp_from_name
+from asreviewcontrib.hyperopt.profiling import write_profile_summary
+from asreviewcontrib.hyperopt.timing import PhaseTimer
+from asreviewcontrib.hyperopt.timing import merge_reports
+from asreviewcontrib.hyperopt.token_counts import TokenCounts
+from asreviewcontrib.hyperopt.token_counts import supports_token_counts
+from asreviewcontrib.hyperopt.trials_summary import write_trials_summary
+
+
+class BaseJobRunner():
+    """Shared optimization loop of the active, passive and cluster runners.
+
+    Subclasses should set the attributes trials_dir, trials_fp, data_names,
+    executor, server_job, data_dir, _cache and _loss_memo, and implement the
+    methods create_jobs, dataset_loss, get_hyper_space and execute.
+    """
+
+    # Set to a JobProfiler to profile (a selection of) the jobs.
+    profiler = None
+    # Set to a MetricsRecorder to export throughput and utilization metrics.
+    metrics = None
+    # Set to a FeatureCache to reuse feature matrices between trials.
+    feature_cache = None
+    # Set to a WarmStart to start from the best configurations of other runs.
+    warm_start = None
+    # Derive TF-IDF features from the cached token counts of each dataset.
+    use_token_counts = True
+    # Jobs in threads share the token counts; only one thread counts at once.
+    _token_counts_lock = threading.Lock()
+    # Set to a SharedFileStore to share labels and feature matrices between
+    # the processes of a node.
+    shared_store = None
+    # Set to a ScratchStaging to write result files to node-local scratch.
+    scratch = None
+    # Result directory of the job running in the current thread.
+    _thread_state = threading.local()
+
+    def create_jobs(self, param, data_names):
+        raise NotImplementedError
+
+    def dataset_loss(self, data_name):
+        raise NotImplementedError
+
+    def run_settings(self):
+        """Settings besides the parameters that determine the loss."""
+        return ()
+
+    def trials_info(self):
+        """Names of the models to store in the trials file."""
+        return {}
+
+    def uses_global_random_state(self):
+        """Whether the jobs seed NumPy's global random state.
+
+        Such jobs cannot run in threads of the same process.
+        """
+        return True
+
+    def create_loss_function(self):
+        def objective_func(param):
+            start_time = time.time()
+            jobs = self.create_jobs(param, self.missing_data_names(param))
+
+            reports = []
+            if len(jobs):
+                try:
+                    reports = self.executor(jobs, self, stop_workers=False,
+                                            server_job=self.server_job)
+                except JobFailedError as err:
+                    logging.error(f"Trial failed: {err}")
+                    return {"status": STATUS_FAIL, "error": str(err)}
+            return self.trial_result(param, reports, start_time)
+
+        return objective_func
+
+    def missing_data_names(self, param):
+        """Datasets for which the loss of the parameters is not known yet.
+
+        TPE regularly suggests configurations that were already evaluated;
+        only the datasets that are not in the memo need to be run.
+        """
+        return [data_name for data_name in self.data_names
+                if self.memo_key(param, data_name) not in self._loss_memo]
+
+    def trial_result(self, param, reports, start_time):
+        """Compute the loss after the jobs of a trial have finished."""
+        if self.scratch is not None:
+            for report in reports:
+                if report is not None:
+                    self.scratch.store(report.pop("files", {}))
+        missing = self.missing_data_names(param)
+        timer = PhaseTimer()
+        with timer.phase("loss"):
+            for data_name in missing:
+                self._loss_memo[self.memo_key(param, data_name)] = \
+                    self.dataset_loss(data_name)
+        loss = np.average([self._loss_memo[self.memo_key(param, data_name)]
+                           for data_name in self.data_names])
+        report = merge_reports(list(reports) + [timer.report()])
+        return {"loss": loss, 'status': STATUS_OK,
+                "wall_time": time.time() - start_time,
+                "n_memo": len(self.data_names) - len(missing), **report}
+
+    @property
+    def results_dir(self):
+        """Directory with the current (and best) result files.
+
+        With scratch staging, jobs write to a temporary directory on the
+        scratch disk, and the loss is computed from a local mirror.
+        """
+        try:
+            return self._thread_state.results_dir
+        except AttributeError:
+            pass
+        if self.scratch is None:
+            return self.trials_dir
+        return self.scratch.local_dir
+
+    def execute_job(self, param, data_name, i_run, **kwargs):
+        """Execute a job; this is the method that the executors call."""
+        if self.scratch is None:
+            return self._execute_job(param, data_name, i_run, **kwargs)
+
+        job_dir = self.scratch.job_dir()
+        self._thread_state.results_dir = job_dir
+        try:
+            report = self._execute_job(param, data_name, i_run, **kwargs)
+        finally:
+            del self._thread_state.results_dir
+        return {**(report or {}), "files": self.scratch.collect(job_dir)}
+
+    def _execute_job(self, param, data_name, i_run, **kwargs):
+        if self.profiler is not None and self.profiler.is_selected(
+                param, data_name, i_run):
+            return self.profiler.run(self.execute, param, data_name, i_run,
+                                     **kwargs)
+        return self.execute(param=param, data_name=data_name, i_run=i_run,
+                            **kwargs)
+
+    def memo_key(self, param, data_name):
+        return (canonical_param(param), data_name, self.run_settings())
+
+    def get_cached_as_data(self, data_name):
+        try:
+            return self._cache[data_name]["as_data"]
+        except KeyError:
+            pass
+        data_fp = data_fp_from_name(self.data_dir, data_name)
+        as_data = ASReviewData.from_file(data_fp)
+        self._cache[data_name]["as_data"] = as_data
+        return as_data
+
+    def shared_key(self, data_name, *key):
+        """Key in the shared store; it changes when the data file changes."""
+        try:
+            data_id = self._cache[data_name]["data_id"]
+        except KeyError:
+            data_fp = data_fp_from_name(self.data_dir, data_name)
+            stat = os.stat(data_fp)
+            data_id = (os.path.abspath(data_fp), stat.st_size,
+                       stat.st_mtime_ns)
+            self._cache[data_name]["data_id"] = data_id
+        return (data_id, *key)
+
+    def get_cached_labels(self, data_name):
+        """Labels of a dataset, from the shared store if there is one."""
+        if self.shared_store is None:
+            return self.get_cached_as_data(data_name).labels
+        return self.shared_store.get(
+            self.shared_key(data_name, "labels"),
+            lambda: self.get_cached_as_data(data_name).labels)
+
+    def get_cached_subsample_idx(self, data_name, fidelity):
+        """Records of a dataset that are used at a fidelity (< 1)."""
+        subsamples = self._cache[data_name].setdefault("subsample_idx", {})
+        try:
+            return subsamples[fidelity]
+        except KeyError:
+            pass
+        subsample_idx = compute_subsample_idx(
+            self.get_cached_labels(data_name), fidelity)
+        subsamples[fidelity] = subsample_idx
+        return subsample_idx
+
+    def get_features(self, feature_model, feature_param, data_name,
+                     fidelity=1.0):
+        """Feature matrix of a dataset, from the feature cache if possible.
+
+        Only feature extraction methods that do not depend on the random
+        state are cached, so that the results do not change. At a fidelity
+        below 1, the features of a subsample of the records are computed.
+        With a shared store, the dataset is only loaded by the process that
+        computes the features.
+        """
+        def compute_features():
+            as_data = self.get_cached_as_data(data_name)
+            texts, title, abstract = as_data.texts, as_data.title, \
+                as_data.abstract
+            if fidelity < 1:
+                idx = self.get_cached_subsample_idx(data_name, fidelity)
+                texts, title, abstract = [np.asarray(x)[idx]
+                                          for x in [texts, title, abstract]]
+
+            if self.use_token_counts and supports_token_counts(feature_model):
+                ngram_max = int(feature_model.ngram_max)
+                token_counts = self.get_cached_token_counts(
+                    data_name, fidelity, ngram_max, texts, title, abstract)
+                return token_counts.tfidf(ngram_max, feature_model.split_ta)
+            return feature_model.fit_transform(texts, title, abstract)
+
+        if self.feature_name not in DETERMINISTIC_FEATURES:
+            return compute_features()
+
+        key = (self.feature_name, canonical_param(feature_param), data_name,
+               fidelity)
+
+        def compute():
+            if self.shared_store is None:
+                return compute_features()
+            return self.shared_store.get(self.shared_key(data_name, *key),
+                                         compute_features)
+
+        if self.feature_cache is None:
+            return compute()
+        return self.feature_cache.get(key, compute)
+
+    def get_cached_token_counts(self, data_name, fidelity, ngram_max, texts,
+                                title, abstract):
+        """N-gram counts of a dataset, recounted for longer n-grams."""
+        with self._token_counts_lock:
+            all_counts = self._cache[data_name].setdefault("token_counts", {})
+            token_counts = all_counts.get(fidelity)
+            if token_counts is None or token_counts.ngram_max < ngram_max:
+                token_counts = TokenCounts(texts, title, abstract, ngram_max)
+                all_counts[fidelity] = token_counts
+        return token_counts
+
+    def prewarm(self):
+        """Fill the cache before the first trial, so its timing is fair."""
+        for data_name in self.data_names:
+            self.get_cached_labels(data_name)
+
+    def load_trials(self):
+        try:
+            with open(self.trials_fp, "rb") as fp:
+                trials_data = pickle.load(fp)
+            self._loss_memo.update(trials_data.get("loss_memo", {}))
+            return trials_data["trials"]
+        except FileNotFoundError:
+            print(f"Creating new hyper parameter optimization run: "
+                  f"{self.trials_fp}")
+        return Trials()
+
+    def save_trials(self, trials, hyper_choices):
+        trials_data = {
+            "trials": trials,
+            "hyper_choices": hyper_choices,
+            "loss_memo": self._loss_memo,
+            "datasets": ",".join(self.data_names),
+            **self.trials_info(),
+        }
+        # With scratch staging, the jobs do not create trials_dir.
+        os.makedirs(self.trials_dir, exist_ok=True)
+        # Write to a temporary file first, so that the trials file is never
+        # left half written when the job is killed.
+        tmp_fp = self.trials_fp + ".tmp"
+        with open(tmp_fp, "wb") as fp:
+            pickle.dump(trials_data, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_fp, self.trials_fp)
+        write_trials_summary(self.trials_fp, trials_data)
+
+    def clear_current(self):
+        """Remove result files of unfinished trials."""
+        try:
+            current_dir = os.path.join(self.results_dir, "current")
+            for data_name in os.listdir(current_dir):
+                data_dir = os.path.join(current_dir, data_name)
+                result_files = [os.path.join(data_dir, f)
+                                for f in os.listdir(data_dir)]
+                for res_file in result_files:
+                    if isfile(res_file):
+                        os.remove(res_file)
+        except FileNotFoundError:
+            pass
+
+    def hyper_optimize(self, n_iter=None, deadline=None, cost_aware=False):
+        """Optimize the hyper parameters.
+
+        Arguments
+        ---------
+        n_iter: int
+            Number of trials to run. If None, run one trial, or as many as
+            fit before the deadline.
+        deadline: float
+            Time (as time.time()) at which the optimization should be
+            finished. No new trial is started if it is expected to finish
+            too late to flush the result files before the deadline.
+        cost_aware: bool
+            Prefer configurations with a high expected improvement per
+            second of run time, instead of plain TPE.
+        """
+        obj_function = self.create_loss_function()
+        hyper_space, hyper_choices = self.get_hyper_space()
+
+        trials = self.load_trials()
+        n_start_evals = len(trials.trials)
+        self.clear_current()
+        algo = cost_aware_suggest if cost_aware else tpe.suggest
+        if self.warm_start is not None:
+            algo = self.warm_start.wrap_algo(algo, trials, hyper_choices)
+
+        if n_iter is None and deadline is None:
+            n_iter = 1
+        if self.metrics is not None:
+            self.metrics.start()
+        iterations = range(n_iter) if n_iter is not None else count()
+
+        for i in tqdm(iterations, total=n_iter):
+            if deadline is not None:
+                time_left = deadline - time.time() - self.estimate_flush_time()
+                if estimate_trial_time(trials) > time_left:
+                    print(f"Stopping after {i} trials: time budget "
+                          "is (nearly) used up.")
+                    break
+            trial_start = time.time()
+            fmin(fn=obj_function,
+                 space=hyper_space,
+                 algo=algo,
+                 max_evals=i+n_start_evals+1,
+                 trials=trials,
+                 show_progressbar=False,
+                 return_argmin=False)
+            self.save_trials(trials, hyper_choices)
+            if self.metrics is not None:
+                self.metrics.trial_finished(time.time() - trial_start)
+                self.metrics.maybe_write()
+            if is_best_trial(trials):
+                self.copy_best()
+
+        if self.scratch is not None:
+            self.scratch.flush()
+        if self.metrics is not None:
+            self.metrics.write()
+        if self.profiler is not None:
+            write_profile_summary(
+                self.profiler.profile_dir,
+                os.path.join(self.trials_dir, "profile_summary.txt"))
+
+    def estimate_flush_time(self):
+        """Time needed to flush the result files at the end of the run."""
+        if self.scratch is None:
+            return 0
+        return self.scratch.max_batch_time
+
+    def copy_best(self):
+        """Copy the result files of the current trial to best."""
+        if self.scratch is not None:
+            self.scratch.copy_best()
+        else:
+            copy_tree(os.path.join(self.trials_dir, "current"),
+                      os.path.join(self.trials_dir, "best"))
+
+
+def trial_durations(trials):
+    """Wall clock time in seconds of all finished trials."""
+    durations = []
+    for trial in trials.trials:
+        if trial["book_time"] is None or trial["refresh_time"] is None:
+            continue
+        durations.append(
+            (trial["refresh_time"] - trial["book_time"]).total_seconds())
+    return durations
+
+
+def estimate_trial_time(trials, n_history=10):
+    """Pessimistic estimate of the time the next trial will take.
+
+    This is the maximum time of the last n_history trials, or 0 if there
+    are no finished trials yet.
+    """
+    durations = trial_durations(trials)[-n_history:]
+    if not len(durations):
+        return 0
+    return max(durations)
+
+
+def is_best_trial(trials):
+    """Check whether the last trial is the best (successful) one so far."""
+    last_trial = trials.trials[-1]
+    if last_trial["result"]["status"] != STATUS_OK:
+        return False
+    return trials.best_trial['tid'] == last_trial['tid']
@@ -15,6 +15,9 @@ import sys
 
 import argparse
 import logging
+import os
+import time
+from functools import partial
 
 from asreview.entry_points import BaseEntryPoint
 
@@ -22,7 +25,7 @@ from asreviewcontrib.hyperopt.serial_executor import serial_executor
 from asreviewcontrib.hyperopt.serial_executor import serial_hyper_optimize
 from asreviewcontrib.hyperopt.job_utils import get_data_names,\
     _base_parse_arguments
-from asreviewcontrib.hyperopt.cluster_job import ClusterJobRunner
+from asreviewcontrib.hyperopt.job_utils import parse_size
 
 
 class HyperClusterEntryPoint(BaseEntryPoint):
@@ -48,25 +51,74 @@ def _parse_arguments():
         type=str,
         default="doc2vec",
         help="Feature extraction method.")
+    parser.add_argument(
+        "--shared_dir",
+        type=str,
+        default=None,
+        help="Node-local directory (e.g. /dev/shm/hyperopt) to share the"
+        " labels and TF-IDF feature matrices between the processes of a"
+        " node through memory-mapped files."
+    )
+    parser.add_argument(
+        "--shared_memory",
+        type=parse_size,
+        default=None,
+        help="Size of an MPI shared memory window per node (e.g. 16G). One"
+        " rank per node computes the labels and TF-IDF feature matrices in"
+        " this window, and the other ranks of the node read them without"
+        " copies. Only with --mpi."
+    )
+    parser.add_argument(
+        "--shared_timeout",
+        type=float,
+        default=3600,
+        help="Maximum number of seconds to wait for another process that is"
+        " computing a shared matrix (--shared_dir or --shared_memory). After"
+        " that, the process computes the matrix itself."
+    )
     return parser
 
 
 def main(argv=sys.argv[1:]):
+    # The time budget includes the start up and the final flush of results.
+    start_time = time.time()
+    # Import the job runner here, so that the asreview CLI starts quickly.
+    from asreviewcontrib.hyperopt.cluster_job import ClusterJobRunner
+    from asreviewcontrib.hyperopt.feature_cache import FeatureCache
+    from asreviewcontrib.hyperopt.metrics import MetricsRecorder
+    from asreviewcontrib.hyperopt.metrics import get_worker_ids
+    from asreviewcontrib.hyperopt.profiling import JobProfiler
+    from asreviewcontrib.hyperopt.scratch import ScratchStaging
+    from asreviewcontrib.hyperopt.shared_store import create_shared_store
+    from asreviewcontrib.hyperopt.warm_start import WarmStart
+
     parser = _parse_arguments()
     args = vars(parser.parse_args(argv))
     datasets = args["datasets"].split(",")
     feature_name = args["feature_extraction"]
     n_iter = args["n_iter"]
+    deadline = None
+    if args["time_budget"] is not None:
+        deadline = start_time + args["time_budget"]
+    cost_aware = args["cost_aware"]
     use_mpi = args["use_mpi"]
     n_run = args["n_run"]
     server_job = args["server_job"]
     data_dir = args["data_dir"]
     output_dir = args["output_dir"]
+    job_timeout = args["job_timeout"]
+    max_retries = args["max_retries"]
 
     data_names = get_data_names(datasets, data_dir=data_dir)
+    if use_mpi and args["n_threads"] > 1:
+        parser.error("--n_threads cannot be used with --mpi.")
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_executor
-        executor = mpi_executor
+        executor = partial(mpi_executor, job_timeout=job_timeout,
+                           max_retries=max_retries)
+    elif args["n_threads"] > 1:
+        from asreviewcontrib.hyperopt.thread_executor import thread_executor
+        executor = partial(thread_executor, n_threads=args["n_threads"])
     else:
         executor = serial_executor
 
@@ -74,9 +126,41 @@ def main(argv=sys.argv[1:]):
         data_names, feature_name, executor=executor,
         n_cluster_run=n_run, server_job=server_job,
         data_dir=data_dir, output_dir=output_dir)
+    if args["n_threads"] > 1:
+        job_runner.feature_cache = FeatureCache()
+
+    if args["metrics"] or args["prometheus_file"] is not None:
+        job_runner.metrics = MetricsRecorder(
+            os.path.join(job_runner.trials_dir, "metrics.jsonl"),
+            prometheus_fp=args["prometheus_file"],
+            interval=args["metrics_interval"],
+            workers=get_worker_ids(use_mpi, server_job, args["n_threads"]))
+    if args["warm_start"] is not None:
+        job_runner.warm_start = WarmStart(
+            args["warm_start"].split(","), args["n_warm_start"])
+    if args["profile"] is not None:
+        job_runner.profiler = JobProfiler(
+            args["profile"], os.path.join(job_runner.trials_dir, "profiles"))
+    if args["scratch_dir"] is not None:
+        job_runner.scratch = ScratchStaging(
+            args["scratch_dir"], job_runner.trials_dir,
+            flush=args["scratch_flush"])
+    if args["shared_memory"] is not None and not use_mpi:
+        parser.error("--shared_memory can only be used with --mpi.")
+    if args["shared_memory"] is not None and server_job:
+        from asreviewcontrib.hyperopt.mpi_shared_store import \
+            supports_threads
+        if not supports_threads():
+            parser.error("--shared_memory with --server_job requires an MPI"
+                         " library with MPI_THREAD_MULTIPLE support.")
+    job_runner.shared_store = create_shared_store(args["shared_dir"],
+                                                  args["shared_memory"],
+                                                  args["shared_timeout"])
 
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_hyper_optimize
-        mpi_hyper_optimize(job_runner, n_iter)
+        mpi_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                           cost_aware=cost_aware)
     else:
-        serial_hyper_optimize(job_runner, n_iter)
+        serial_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                              cost_aware=cost_aware)
@@ -12,30 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 from os.path import isfile
 import json
-import pickle
-from distutils.dir_util import copy_tree
 
-from hyperopt import STATUS_OK, Trials, fmin, tpe
 import numpy as np
-from tqdm import tqdm
 from sklearn.cluster import KMeans
 
-from asreview import ASReviewData
 from asreview.feature_extraction.utils import get_feature_class
 
+from asreviewcontrib.hyperopt.base_job import BaseJobRunner
 from asreviewcontrib.hyperopt.cluster_utils import normalized_cluster_score
 from asreviewcontrib.hyperopt.job_utils import get_trial_fp
 from asreviewcontrib.hyperopt.job_utils import get_split_param
-from asreviewcontrib.hyperopt.job_utils import data_fp_from_name
 from asreviewcontrib.hyperopt.job_utils import get_label_fp
 from asreviewcontrib.hyperopt.job_utils import get_out_fp
+from asreviewcontrib.hyperopt.model_cache import cache_model_loaders
+from asreviewcontrib.hyperopt.random_state import get_random_state
+from asreviewcontrib.hyperopt.random_state import uses_global_random_state
 from asreviewcontrib.hyperopt.serial_executor import serial_executor
+from asreviewcontrib.hyperopt.timing import PhaseTimer
 
 
-class ClusterJobRunner():
+class ClusterJobRunner(BaseJobRunner):
     def __init__(self, data_names, feature_name, executor=serial_executor,
                  n_cluster_run=30, n_feature_run=1, server_job=False,
                  data_dir="data", output_dir=None):
@@ -46,6 +44,8 @@ class ClusterJobRunner():
 
         self.feature_name = feature_name
         self.feature_class = get_feature_class(feature_name)
+        # Load pretrained models only once per process.
+        cache_model_loaders(feature_name)
 
         self.data_names = data_names
         self.executor = executor
@@ -55,98 +55,61 @@ class ClusterJobRunner():
         self.server_job = server_job
         self._cache = {data_name: {}
                        for data_name in data_names}
+        self._loss_memo = {}
 
-    def create_loss_function(self):
-        def objective_func(param):
-            jobs = create_jobs(param, self.data_names, self.n_feature_run)
+    def create_jobs(self, param, data_names):
+        return create_jobs(param, data_names, self.n_feature_run)
 
-            self.executor(jobs, self, stop_workers=False,
-                          server_job=self.server_job)
-            losses = []
-            for data_name in self.data_names:
-                label_fp = get_label_fp(self.trials_dir, data_name)
-                res_files = [get_out_fp(self.trials_dir, data_name, i_run)
-                             for i_run in range(self.n_feature_run)]
-                losses.append(loss_from_files(res_files, label_fp))
-            return {"loss": np.average(losses), 'status': STATUS_OK}
+    def dataset_loss(self, data_name):
+        label_fp = get_label_fp(self.results_dir, data_name)
+        res_files = [get_out_fp(self.results_dir, data_name, i_run)
+                     for i_run in range(self.n_feature_run)]
+        return loss_from_files(res_files, label_fp)
 
-        return objective_func
+    def run_settings(self):
+        return (self.n_feature_run, self.n_cluster_run)
+
+    def trials_info(self):
+        return {"feature_name": self.feature_name}
+
+    def uses_global_random_state(self):
+        return uses_global_random_state(feature_name=self.feature_name)
 
     def execute(self, param, data_name, i_run):
+        timer = PhaseTimer()
         split_param = get_split_param(param)
         feature_model = self.feature_class(**split_param["feature_param"])
 
-        as_data = self.get_cached_as_data(data_name)
-        out_fp = get_out_fp(self.trials_dir, data_name, i_run)
+        with timer.phase("data"):
+            labels = self.get_cached_labels(data_name)
+        out_fp = get_out_fp(self.results_dir, data_name, i_run)
 
-        X = feature_model.fit_transform(
-            as_data.texts, as_data.title, as_data.abstract)
+        with timer.phase("features"):
+            X = self.get_features(feature_model, split_param["feature_param"],
+                                  data_name)
 
-        n_clusters = max(2, int(len(as_data.labels)/200))
-        np.random.seed(i_run)
+        n_clusters = max(2, int(len(labels)/200))
+        random_state = get_random_state(i_run)
         all_predictions = []
-        for _ in range(self.n_cluster_run):
-            kmeans_model = KMeans(n_clusters=n_clusters, n_init=1, n_jobs=1)
-            all_predictions.append(kmeans_model.fit_predict(X).tolist())
-
-        with open(out_fp, "w") as fp:
-            json.dump({"predictions": all_predictions}, fp)
-
-        label_fp = get_label_fp(self.trials_dir, data_name)
-        if i_run == 0 and not isfile(label_fp):
-            with open(label_fp, "w") as fp:
-                json.dump(as_data.labels.tolist(), fp)
-
-    def get_cached_as_data(self, data_name):
-        try:
-            return self._cache[data_name]["as_data"]
-        except KeyError:
-            pass
-        data_fp = data_fp_from_name(self.data_dir, data_name)
-        as_data = ASReviewData.from_file(data_fp)
-        self._cache[data_name]["as_data"] = as_data
-        return as_data
+        with timer.phase("cluster"):
+            for _ in range(self.n_cluster_run):
+                kmeans_model = KMeans(n_clusters=n_clusters, n_init=1,
+                                      n_jobs=1, random_state=random_state)
+                all_predictions.append(kmeans_model.fit_predict(X).tolist())
+
+        with timer.phase("io"):
+            with open(out_fp, "w") as fp:
+                json.dump({"predictions": all_predictions}, fp)
+
+            label_fp = get_label_fp(self.results_dir, data_name)
+            if i_run == 0 and not isfile(label_fp):
+                with open(label_fp, "w") as fp:
+                    json.dump(labels.tolist(), fp)
+        return timer.report()
 
     def get_hyper_space(self):
         return self.feature_class().hyper_space()
 
-    def hyper_optimize(self, n_iter):
-        obj_function = self.create_loss_function()
-        hyper_space, hyper_choices = self.get_hyper_space()
-
-        try:
-            with open(self.trials_fp, "rb") as fp:
-                trials_data = pickle.load(fp)
-            trials = trials_data["trials"]
-        except FileNotFoundError:
-            trials = None
-            print(f"Creating new hyper parameter optimization run: "
-                  f"{self.trials_fp}")
-
-        if trials is None:
-            trials = Trials()
-            n_start_evals = 0
-        else:
-            n_start_evals = len(trials.trials)
-
-        for i in tqdm(range(n_iter)):
-            fmin(fn=obj_function,
-                 space=hyper_space,
-                 algo=tpe.suggest,
-                 max_evals=i+n_start_evals+1,
-                 trials=trials,
-                 show_progressbar=False)
-            trials_data = {
-                "trials": trials,
-                "hyper_choices": hyper_choices,
-                "feature_name": self.feature_name,
-            }
-            with open(self.trials_fp, "wb") as fp:
-                pickle.dump(trials_data, fp)
-            if trials.best_trial['tid'] == len(trials.trials)-1:
-                copy_tree(os.path.join(self.trials_dir, "current"),
-                          os.path.join(self.trials_dir, "best"))
-
 
 def loss_from_files(data_fps, labels_fp):
     with open(labels_fp, "r") as fp:
@@ -0,0 +1,233 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Index and compare all trials files in an output directory."""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+from os.path import getmtime, getsize, join, relpath
+
+import numpy as np
+
+from asreview.entry_points.base import BaseEntryPoint
+
+from asreviewcontrib.hyperopt.trials_summary import load_trials_summary
+
+
+INDEX_FILE = "trials_index.json"
+MODEL_KEYS = ["model_name", "query_name", "balance_name", "feature_name"]
+
+
+def find_trials_files(output_dir):
+    trials_files = []
+    for root, _, files in os.walk(output_dir):
+        if "trials.pkl" in files:
+            trials_files.append(join(root, "trials.pkl"))
+    return sorted(trials_files)
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def index_entry(trials_fp, output_dir):
+    """Summarize a single trials file: its settings and best trial."""
+    summary = load_trials_summary(trials_fp)
+    values = summary["values"]
+    rel_dir = os.path.dirname(relpath(trials_fp, output_dir))
+    path_parts = rel_dir.split(os.sep)
+
+    # Older trials files do not store the names of the models and datasets;
+    # these are taken from the directory structure <type>/<models>/<data>.
+    combination = "_".join(summary[key] for key in MODEL_KEYS
+                           if key in summary)
+    if not combination:
+        combination = path_parts[-2] if len(path_parts) >= 2 else ""
+    datasets = summary.get("datasets", path_parts[-1])
+
+    loss = values["loss"]
+    entry = {
+        "path": rel_dir,
+        "hyper_type": path_parts[0] if len(path_parts) >= 3 else "",
+        "combination": combination,
+        "datasets": ",".join(sorted(datasets.split(","))),
+        "n_evals": int(len(loss)),
+        "n_ok": int(np.sum(~np.isnan(loss))),
+        "best_loss": None,
+        "best_param": {},
+        "mtime": getmtime(trials_fp),
+        "size": getsize(trials_fp),
+    }
+    if entry["n_ok"]:
+        best_idx = int(np.nanargmin(loss))
+        entry["best_loss"] = float(loss[best_idx])
+        entry["best_param"] = {key: _to_python(arr[best_idx])
+                               for key, arr in values.items()
+                               if key != "loss"}
+    return entry
+
+
+def _index_entry(args):
+    trials_fp, output_dir = args
+    try:
+        return index_entry(trials_fp, output_dir)
+    except Exception as err:
+        return {"path": os.path.dirname(relpath(trials_fp, output_dir)),
+                "error": f"{type(err).__name__}: {err}"}
+
+
+def build_index(output_dir, n_jobs=None):
+    """Create or update the index of all trials files in a directory.
+
+    The index is stored in the output directory; files that did not change
+    since the last update are not read again. Other files are read in
+    parallel, from their columnar summaries when available.
+    """
+    index_fp = join(output_dir, INDEX_FILE)
+    try:
+        with open(index_fp, "r") as fp:
+            old_index = {entry["path"]: entry for entry in json.load(fp)}
+    except (FileNotFoundError, ValueError):
+        old_index = {}
+
+    index = []
+    todo = []
+    for trials_fp in find_trials_files(output_dir):
+        path = os.path.dirname(relpath(trials_fp, output_dir))
+        old_entry = old_index.get(path)
+        if (old_entry is not None and "error" not in old_entry
+                and old_entry["mtime"] == getmtime(trials_fp)
+                and old_entry["size"] == getsize(trials_fp)):
+            index.append(old_entry)
+        else:
+            todo.append((trials_fp, output_dir))
+
+    if len(todo) > 1 and n_jobs != 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            index.extend(pool.map(_index_entry, todo))
+    else:
+        index.extend(_index_entry(args) for args in todo)
+    index.sort(key=lambda entry: entry["path"])
+
+    try:
+        tmp_fp = index_fp + ".tmp"
+        with open(tmp_fp, "w") as fp:
+            json.dump(index, fp, indent=1)
+        os.replace(tmp_fp, index_fp)
+    except OSError:
+        pass
+    return index
+
+
+def best_per_dataset_set(index):
+    """Entry with the lowest loss for every set of datasets."""
+    best = {}
+    for entry in index:
+        if entry.get("best_loss") is None:
+            continue
+        datasets = entry["datasets"]
+        if (datasets not in best
+                or entry["best_loss"] < best[datasets]["best_loss"]):
+            best[datasets] = entry
+    return [best[datasets] for datasets in sorted(best)]
+
+
+class CompareTrialsEntryPoint(BaseEntryPoint):
+    description = "Compare the trials files in an output directory."
+
+    def __init__(self):
+        super(CompareTrialsEntryPoint, self).__init__()
+        from asreviewcontrib.hyperopt.__init__ import __version__
+        from asreviewcontrib.hyperopt.__init__ import __extension_name__
+
+        self.extension_name = __extension_name__
+        self.version = __version__
+
+    def execute(self, argv):
+        import pandas as pd
+
+        parser = _parse_arguments()
+        args = vars(parser.parse_args(argv))
+        index = build_index(args["output_dir"], n_jobs=args["n_jobs"])
+
+        for entry in index:
+            if "error" in entry:
+                print(f"Could not read {entry['path']}: {entry['error']}")
+        index = [entry for entry in index if "error" not in entry]
+        if args["hyper_type"] is not None:
+            index = [entry for entry in index
+                     if entry["hyper_type"] == args["hyper_type"]]
+        if args["datasets"] is not None:
+            datasets = ",".join(sorted(args["datasets"].split(",")))
+            index = [entry for entry in index
+                     if entry["datasets"] == datasets]
+
+        pd.options.display.max_rows = 999
+        pd.options.display.width = 0
+        columns = ["datasets", "hyper_type", "combination", "best_loss",
+                   "n_evals"]
+        if args["best"]:
+            best = best_per_dataset_set(index)
+            param_names = sorted(set(
+                key for entry in best for key in entry["best_param"]))
+            print(pd.DataFrame(
+                [{**{key: entry[key] for key in columns},
+                  **entry["best_param"]} for entry in best],
+                columns=columns + param_names))
+        else:
+            df = pd.DataFrame([{key: entry[key] for key in columns}
+                               for entry in index], columns=columns)
+            print(df.sort_values(["datasets", "best_loss"]).reset_index(
+                drop=True))
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="compare")
+    parser.add_argument(
+        "output_dir",
+        type=str,
+        nargs="?",
+        default="output",
+        help="Directory to search for trials files."
+    )
+    parser.add_argument(
+        "--best",
+        action="store_true",
+        help="Only show the best combination for each set of datasets,"
+        " including its hyper parameters."
+    )
+    parser.add_argument(
+        "-d", "--datasets",
+        type=str,
+        default=None,
+        help="Only show trials files for this (comma separated) set of"
+        " datasets."
+    )
+    parser.add_argument(
+        "-t", "--hyper_type",
+        type=str,
+        default=None,
+        help="Only show trials files of this type, e.g. active_learning,"
+        " passive or cluster."
+    )
+    parser.add_argument(
+        "-j", "--n_jobs",
+        type=int,
+        default=None,
+        help="Number of processes to read trials files with "
+        "[default: number of cores]."
+    )
+    return parser
@@ -0,0 +1,160 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cost-aware variant of the TPE algorithm.
+
+TPE proposes the configuration with the highest expected improvement,
+regardless of how long it takes to evaluate. Here, TPE is asked for several
+candidates (with different seeds), and the candidate with the highest
+expected improvement per second is chosen. Both the loss and the run time of
+a candidate are estimated from its nearest neighbours in the finished trials.
+"""
+
+from math import erf, exp, pi, sqrt
+
+from hyperopt import STATUS_OK, tpe
+import numpy as np
+
+
+def cost_aware_suggest(new_ids, domain, trials, seed, n_candidates=10,
+                       n_neighbours=5, cost_exponent=1.0, n_startup_jobs=20):
+    """Suggest a new configuration, taking run time into account.
+
+    Drop-in replacement for tpe.suggest.
+
+    Arguments
+    ---------
+    n_candidates: int
+        Number of TPE suggestions to choose from.
+    n_neighbours: int
+        Number of finished trials used to estimate the loss and cost.
+    cost_exponent: float
+        Importance of the run time; 0 ignores it, 1 maximizes the expected
+        improvement per second.
+    n_startup_jobs: int
+        Number of trials (of which TPE makes random ones) before the
+        run time is taken into account.
+    """
+    history = _get_history(trials)
+    if len(history["loss"]) < max(n_startup_jobs, n_neighbours):
+        return tpe.suggest(new_ids, domain, trials, seed,
+                           n_startup_jobs=n_startup_jobs)
+
+    rng = np.random.RandomState(seed)
+    candidates = []
+    for _ in range(n_candidates):
+        candidates.extend(tpe.suggest(
+            new_ids, domain, trials, rng.randint(2**31 - 1),
+            n_startup_jobs=n_startup_jobs))
+
+    scale = _get_scale(domain, history["vals"])
+    best_loss = np.min(history["loss"])
+    scores = []
+    for candidate in candidates:
+        dist = _distance(candidate["misc"]["vals"], history["vals"], scale)
+        idx = np.argsort(dist)[:n_neighbours]
+        weights = 1/(dist[idx] + 1e-3)
+        mu = np.average(history["loss"][idx], weights=weights)
+        sigma = sqrt(np.average((history["loss"][idx] - mu)**2,
+                                weights=weights)) + 1e-9
+        cost = np.average(history["cost"][idx], weights=weights)
+        ei = expected_improvement(best_loss, mu, sigma)
+        scores.append(ei/max(cost, 1e-3)**cost_exponent)
+    return [candidates[int(np.argmax(scores))]]
+
+
+def expected_improvement(best_loss, mu, sigma):
+    z = (best_loss - mu)/sigma
+    cdf = 0.5*(1 + erf(z/sqrt(2)))
+    pdf = exp(-0.5*z**2)/sqrt(2*pi)
+    return (best_loss - mu)*cdf + sigma*pdf
+
+
+def _get_history(trials):
+    vals = []
+    losses = []
+    costs = []
+    for trial in trials.trials:
+        result = trial["result"]
+        if result.get("status") != STATUS_OK or "loss" not in result:
+            continue
+        # Datasets answered from the loss memo take no time, so the wall
+        # time of such a trial is not the cost of its configuration. The
+        # configuration itself is in the history with its first trial.
+        if result.get("n_memo", 0) > 0:
+            continue
+        cost = result.get("wall_time")
+        if cost is None:
+            if trial["book_time"] is None or trial["refresh_time"] is None:
+                continue
+            cost = (trial["refresh_time"] - trial["book_time"]).total_seconds()
+        vals.append(trial["misc"]["vals"])
+        losses.append(result["loss"])
+        costs.append(cost)
+    return {"vals": vals, "loss": np.array(losses),
+            "cost": np.array(costs, dtype=float)}
+
+
+def _transform(value, kind):
+    if kind == "log":
+        return np.log(max(value, 1e-12))
+    return value
+
+
+def _param_kind(domain, label):
+    name = domain.params[label].name
+    if name == "randint":
+        return "categorical"
+    if name.startswith(("log", "qlog")):
+        return "log"
+    return "numeric"
+
+
+def _get_scale(domain, history_vals):
+    """Kind and range of all parameters, used to normalize distances."""
+    scale = {}
+    for label in domain.params:
+        kind = _param_kind(domain, label)
+        values = [_transform(vals[label][0], kind)
+                  for vals in history_vals if len(vals.get(label, []))]
+        if kind == "categorical" or not len(values):
+            scale[label] = (kind, 1.0)
+        else:
+            scale[label] = (kind, max(np.ptp(values), 1e-12))
+    return scale
+
+
+def _distance(candidate_vals, history_vals, scale):
+    """Normalized Euclidean distance of a candidate to all trials.
+
+    Categorical parameters contribute 0 or 1, numeric parameters their
+    difference relative to the range explored so far. Parameters that are
+    active in only one of two configurations count as maximally different.
+    """
+    dist = np.zeros(len(history_vals))
+    for label, (kind, width) in scale.items():
+        cand = candidate_vals.get(label, [])
+        for i, vals in enumerate(history_vals):
+            hist = vals.get(label, [])
+            if not len(cand) and not len(hist):
+                continue
+            if not len(cand) or not len(hist):
+                dist[i] += 1
+            elif kind == "categorical":
+                dist[i] += float(cand[0] != hist[0])
+            else:
+                diff = (_transform(cand[0], kind)
+                        - _transform(hist[0], kind))/width
+                dist[i] += min(diff**2, 1)
+    return np.sqrt(dist)
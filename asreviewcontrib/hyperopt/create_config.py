@@ -19,7 +19,7 @@ import numpy as np
 
 from asreview.entry_points.base import BaseEntryPoint
 import argparse
-from asreviewcontrib.hyperopt.show_trials import load_trials
+from asreviewcontrib.hyperopt.trials_summary import load_trials_summary
 
 
 PREFIX_VALUES = {
@@ -52,7 +52,7 @@ class CreateConfigEntryPoint(BaseEntryPoint):
         parser = _parse_arguments()
         args = vars(parser.parse_args(argv))
         trials_fp = args["trials_fp"]
-        trials_data = load_trials(trials_fp)
+        trials_data = load_trials_summary(trials_fp)
 
         values = trials_data["values"]
         with_config = args["with_config"]
@@ -63,7 +63,7 @@ class CreateConfigEntryPoint(BaseEntryPoint):
             config.read(with_config)
         else:
             config["global_settings"] = DEFAULT_CONFIG_GLOBALS
-        min_idx = np.argmin(values["loss"])
+        min_idx = np.nanargmin(values["loss"])
 
         if "global_settings" not in config:
             config["global_settings"] = {}
@@ -0,0 +1,64 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+import threading
+
+
+# Feature extraction methods whose output only depends on their parameters
+# and the data (and not on the random state).
+DETERMINISTIC_FEATURES = ["tfidf"]
+
+
+class FeatureCache():
+    """Least recently used cache of feature matrices.
+
+    The cache can be used by several threads at the same time. A feature
+    matrix that is being computed by one thread is not computed again by the
+    others; they wait for it instead.
+
+    Arguments
+    ---------
+    max_size: int
+        Maximum number of feature matrices to keep in memory.
+    """
+
+    def __init__(self, max_size=4):
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.n_hit = 0
+        self.n_miss = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key, compute):
+        """Get a feature matrix, calling compute() if it is not cached."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                X = self._cache.pop(key, None)
+            is_hit = X is not None
+            if not is_hit:
+                X = compute()
+            with self._lock:
+                if is_hit:
+                    self.n_hit += 1
+                else:
+                    self.n_miss += 1
+                self._cache[key] = X
+                while len(self._cache) > self.max_size:
+                    old_key, _ = self._cache.popitem(last=False)
+                    self._key_locks.pop(old_key, None)
+        return X
@@ -0,0 +1,108 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Evaluate configurations on subsamples of the records first.
+
+Each trial is first evaluated on a small, stratified subsample of the records
+of every dataset. Only if its loss is among the best 1/eta of the losses at
+that fidelity, it is evaluated on the next (larger) subsample, up to the full
+datasets. The subsamples are nested and do not depend on the trial, so that
+losses at the same fidelity can be compared.
+"""
+
+import numpy as np
+
+
+def parse_fidelities(fidelity_str):
+    """Parse a comma separated list of fractions, e.g. "0.1,0.3"."""
+    fidelities = sorted(set(float(val) for val in fidelity_str.split(",")))
+    if fidelities[0] <= 0 or fidelities[-1] > 1:
+        raise ValueError(f"Fidelities should be in (0, 1], got "
+                         f"{fidelity_str}.")
+    if fidelities[-1] != 1.0:
+        fidelities.append(1.0)
+    return fidelities
+
+
+def compute_subsample_idx(y, fraction, seed=0):
+    """Stratified subsample of the records.
+
+    The subsample only depends on the seed and the fraction, and a
+    subsample with a smaller fraction is part of the subsamples with larger
+    fractions. At least two records of each class are included, so that
+    they can be split into a train and test set.
+    """
+    if fraction >= 1:
+        return np.arange(len(y))
+
+    random_state = np.random.RandomState(seed)
+    subsample_idx = []
+    for label in [0, 1]:
+        label_idx = random_state.permutation(np.where(y == label)[0])
+        n_sample = max(min(2, len(label_idx)),
+                       int(round(fraction*len(label_idx))))
+        subsample_idx.append(label_idx[:n_sample])
+    return np.sort(np.concatenate(subsample_idx))
+
+
+class FidelitySchedule():
+    """Decide which trials are evaluated at the next fidelity.
+
+    Arguments
+    ---------
+    fidelities: list
+        Increasing fractions of the records to use, the last being 1.0.
+    eta: float
+        Only the best 1/eta of the trials at a fidelity are promoted to the
+        next fidelity.
+    """
+
+    def __init__(self, fidelities, eta=3):
+        self.fidelities = fidelities
+        self.eta = eta
+        self.history = {fidelity: [] for fidelity in fidelities}
+
+    def promote(self, fidelity, loss):
+        """Record a loss and decide whether to go to the next fidelity.
+
+        Until there are eta losses at a fidelity, all trials are promoted.
+        """
+        history = self.history[fidelity]
+        history.append(loss)
+        if fidelity == self.fidelities[-1]:
+            return False
+        if len(history) < self.eta:
+            return True
+        return loss <= np.quantile(history, 1/self.eta)
+
+    def comparable_loss(self, fidelity, loss):
+        """Loss of a trial that was stopped at a fidelity below 1.
+
+        Losses on subsamples are not on the same scale as losses on the
+        full datasets. The loss is mapped to the full fidelity losses with
+        the same rank, so that the optimizer can compare all trials.
+        """
+        full_history = self.history[self.fidelities[-1]]
+        if fidelity == self.fidelities[-1] or not len(full_history):
+            return loss
+        rank = np.mean(np.array(self.history[fidelity]) <= loss)
+        return float(np.quantile(full_history, rank))
+
+    def restore(self, trials):
+        """Restore the history from the results of previous trials."""
+        for trial in trials.trials:
+            fidelity_loss = trial["result"].get("fidelity_loss", {})
+            for fidelity, loss in fidelity_loss.items():
+                if fidelity in self.history:
+                    self.history[fidelity].append(loss)
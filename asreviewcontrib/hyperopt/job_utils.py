@@ -18,6 +18,11 @@ import os
 from os.path import join, splitext
 
 
+class JobFailedError(Exception):
+    """Raised by an executor when a job keeps failing after retries."""
+    pass
+
+
 def empty_shared():
     return {
         "query_src": {},
@@ -30,8 +35,17 @@ def _base_parse_arguments(prog="hyper-?"):
     parser.add_argument(
         "-n", "--n_iter",
         type=int,
-        default=1,
-        help="Number of iterations of Bayesian Optimization."
+        default=None,
+        help="Number of iterations of Bayesian Optimization. [default: 1, or"
+        " unlimited if --time_budget is set]"
+    )
+    parser.add_argument(
+        "--time_budget",
+        type=parse_time,
+        default=None,
+        help="Stop the optimization before this amount of time has passed."
+        " Trials are not started if they are expected to exceed the budget."
+        " Accepts seconds, or a number followed by s, m, h or d, e.g. 10h."
     )
     parser.add_argument(
         "-r", "--n_run",
@@ -67,13 +81,146 @@ def _base_parse_arguments(prog="hyper-?"):
         "--server_job",
         dest='server_job',
         action='store_true',
-        help='Run job on the server. It will incur less overhead of used CPUs,'
-        ' but more latency of workers waiting for the server to finish its own'
-        ' job. Only makes sense in combination with the flag --mpi.'
+        help='Run jobs on the server as well. The server computes its jobs in'
+        ' a separate thread, so that it keeps sending jobs to the workers.'
+        ' Only makes sense in combination with the flag --mpi.'
+    )
+    parser.add_argument(
+        "--cost_aware",
+        action="store_true",
+        help="Take the run time of configurations into account, and prefer"
+        " those with the largest expected improvement per second."
+    )
+    parser.add_argument(
+        "--warm_start",
+        type=str,
+        default=None,
+        help="Comma separated list of trials files of related runs (e.g."
+        " with other datasets). Their best configurations are evaluated"
+        " first, after which the optimization continues from them."
+    )
+    parser.add_argument(
+        "--n_warm_start",
+        type=int,
+        default=10,
+        help="Number of configurations to take from the --warm_start files."
+    )
+    parser.add_argument(
+        "--profile",
+        type=parse_profile,
+        default=None,
+        help="Profile jobs with cProfile. Either a fraction of the jobs to "
+        "profile (e.g. 0.05), or a comma separated list of data_name:i_run. "
+        "Profiles are stored in the 'profiles' directory next to the trials "
+        "file, together with a merged summary (profile_summary.txt)."
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Periodically append throughput, worker utilization, queue "
+        "depth and trial latency metrics to metrics.jsonl next to the trials "
+        "file."
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        type=float,
+        default=10.0,
+        help="Minimum number of seconds between two metrics snapshots."
+    )
+    parser.add_argument(
+        "--prometheus_file",
+        type=str,
+        default=None,
+        help="Also write the latest metrics to this file in the Prometheus "
+        "textfile format (e.g. for the node exporter). Implies --metrics."
+    )
+    parser.add_argument(
+        "--scratch_dir",
+        type=str,
+        default=None,
+        help="Node-local scratch directory (e.g. $TMPDIR) for the result"
+        " files of the jobs. The files are copied to the output directory"
+        " in the background, see --scratch_flush."
+    )
+    parser.add_argument(
+        "--scratch_flush",
+        type=str,
+        default="all",
+        choices=["all", "best"],
+        help="Copy the result files of all trials to the output directory,"
+        " or only those of the best trial. Only with --scratch_dir."
+    )
+    parser.add_argument(
+        "--job_timeout",
+        type=float,
+        default=None,
+        help="Maximum time in seconds that a worker can spend on a single job."
+        " Workers that exceed it are considered lost, and their jobs are"
+        " moved to other workers. Only used in combination with --mpi."
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=2,
+        help="Number of times a failed job is retried, before the trial is"
+        " marked as failed. Only used in combination with --mpi."
+    )
+    parser.add_argument(
+        "--n_threads",
+        type=int,
+        default=1,
+        help="Number of threads to compute the jobs with. Only jobs that do"
+        " not use the global random state of NumPy can run in threads (e.g."
+        " the nb and logistic models with tfidf features); other jobs run"
+        " one at a time. Cannot be combined with --mpi."
     )
     return parser
 
 
+def parse_time(time_str):
+    """Convert a string such as '3600', '90m' or '10h' to seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    time_str = time_str.strip().lower()
+    try:
+        if time_str[-1] in units:
+            return float(time_str[:-1])*units[time_str[-1]]
+        return float(time_str)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"Invalid time: '{time_str}'.")
+
+
+def parse_profile(selection):
+    """Check a job selection such as '0.05' or 'ptsd:0,ace:1'."""
+    try:
+        fraction = float(selection)
+    except ValueError:
+        pass
+    else:
+        if not 0 < fraction <= 1:
+            raise argparse.ArgumentTypeError(
+                f"Invalid fraction of jobs to profile: '{selection}'.")
+        return selection
+
+    for job in selection.split(","):
+        data_name, _, i_run = job.rpartition(":")
+        if not data_name or not i_run.isdigit():
+            raise argparse.ArgumentTypeError(
+                f"Invalid job to profile: '{job}', expected data_name:i_run.")
+    return selection
+
+
+def parse_size(size_str):
+    """Convert a string such as '512M' or '16G' to a number of bytes."""
+    units = {"k": 2**10, "m": 2**20, "g": 2**30, "t": 2**40}
+    size_str = size_str.strip().lower().rstrip("b")
+    try:
+        if size_str[-1] in units:
+            return int(float(size_str[:-1])*units[size_str[-1]])
+        return int(size_str)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"Invalid size: '{size_str}'.")
+
+
 def quality(result_list, alpha=1):
     q = 0
     for _, rank in result_list:
@@ -134,6 +281,25 @@ def get_split_param(raw_param):
     return split_param
 
 
+def canonical_param(param):
+    """Hashable representation of a parameter dictionary.
+
+    Numbers are converted to floats, so that e.g. 3 and 3.0 (hp.quniform)
+    result in the same key.
+    """
+    if isinstance(param, dict):
+        return tuple(sorted((key, canonical_param(value))
+                            for key, value in param.items()))
+    if isinstance(param, (list, tuple)):
+        return tuple(canonical_param(value) for value in param)
+    if isinstance(param, bool) or param is None:
+        return param
+    try:
+        return float(param)
+    except (TypeError, ValueError):
+        return str(param)
+
+
 def data_fp_from_name(data_dir, data_name):
     file_list = os.listdir(data_dir)
     file_list = [file_name for file_name in file_list
@@ -148,10 +314,17 @@ def get_out_dir(trials_dir, data_name):
     return out_dir
 
 
-def get_out_fp(trials_dir, data_name, i_run):
+def _fidelity_suffix(fidelity):
+    if fidelity >= 1:
+        return ""
+    return f"_f{fidelity:g}"
+
+
+def get_out_fp(trials_dir, data_name, i_run, fidelity=1.0):
     return join(get_out_dir(trials_dir, data_name),
-                f"results_{i_run}.json")
+                f"results_{i_run}{_fidelity_suffix(fidelity)}.json")
 
 
-def get_label_fp(trials_dir, data_name):
-    return join(get_out_dir(trials_dir, data_name), "labels.json")
+def get_label_fp(trials_dir, data_name, fidelity=1.0):
+    return join(get_out_dir(trials_dir, data_name),
+                f"labels{_fidelity_suffix(fidelity)}.json")
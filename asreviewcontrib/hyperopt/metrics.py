@@ -0,0 +1,178 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import time
+
+import numpy as np
+
+
+LATENCY_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class MetricsRecorder():
+    """Keep track of the throughput and utilization of the workers.
+
+    The executors report when jobs start and finish on which worker (the MPI
+    rank, or 0 for jobs on the server/main process) and how many jobs are
+    waiting. A snapshot of the metrics is appended to a JSONL file at most
+    every interval seconds, and optionally written to a Prometheus textfile.
+
+    Arguments
+    ---------
+    metrics_fp: str
+        JSONL file to append the snapshots to.
+    prometheus_fp: str
+        If not None, textfile to write the latest snapshot to in the
+        Prometheus exposition format.
+    interval: float
+        Minimum number of seconds between two snapshots.
+    workers: list
+        Ids of the workers that compute jobs (see get_worker_ids), so that
+        workers that did not start a job yet are reported as idle.
+    """
+
+    def __init__(self, metrics_fp, prometheus_fp=None, interval=10.0,
+                 workers=(0,)):
+        self.metrics_fp = metrics_fp
+        self.prometheus_fp = prometheus_fp
+        self.interval = interval
+        self.workers = list(workers)
+        self.start()
+
+    def start(self):
+        """(Re)start measuring, e.g. after loading the data."""
+        self.start_time = time.time()
+        self.n_jobs = 0
+        self.n_failed = 0
+        self.queue_depth = 0
+        self.busy_time = {worker: 0.0 for worker in self.workers}
+        self.job_start = {}
+        self.trial_latencies = []
+        self._last_time = self.start_time
+        self._last_n_jobs = 0
+
+    def job_started(self, worker):
+        self.busy_time.setdefault(worker, 0.0)
+        self.job_start[worker] = time.time()
+
+    def job_finished(self, worker, success=True):
+        start_time = self.job_start.pop(worker, None)
+        if start_time is not None:
+            self.busy_time[worker] += time.time() - start_time
+        if success:
+            self.n_jobs += 1
+        else:
+            self.n_failed += 1
+
+    def set_queue_depth(self, queue_depth):
+        self.queue_depth = queue_depth
+
+    def trial_finished(self, latency):
+        self.trial_latencies.append(latency)
+
+    def snapshot(self):
+        now = time.time()
+        elapsed = max(now - self.start_time, 1e-9)
+        workers = {}
+        for worker, busy_time in sorted(self.busy_time.items()):
+            if worker in self.job_start:
+                busy_time += now - self.job_start[worker]
+            busy = min(busy_time/elapsed, 1.0)
+            workers[str(worker)] = {"busy": busy, "idle": 1 - busy}
+
+        if len(self.trial_latencies):
+            latency = dict(zip(
+                [f"p{round(100*q)}" for q in LATENCY_QUANTILES],
+                np.quantile(self.trial_latencies, LATENCY_QUANTILES).tolist()
+            ))
+        else:
+            latency = {}
+
+        return {
+            "time": now,
+            "elapsed": elapsed,
+            "n_jobs": self.n_jobs,
+            "n_failed": self.n_failed,
+            "n_trials": len(self.trial_latencies),
+            "jobs_per_second": self.n_jobs/elapsed,
+            "recent_jobs_per_second": (self.n_jobs - self._last_n_jobs)
+            / max(now - self._last_time, 1e-9),
+            "queue_depth": self.queue_depth,
+            "workers": workers,
+            "trial_latency": latency,
+        }
+
+    def maybe_write(self):
+        """Write a snapshot if the last one is older than the interval."""
+        if time.time() - self._last_time >= self.interval:
+            self.write()
+
+    def write(self):
+        snapshot = self.snapshot()
+        with open(self.metrics_fp, "a") as fp:
+            fp.write(json.dumps(snapshot) + "\n")
+        if self.prometheus_fp is not None:
+            write_prometheus(snapshot, self.prometheus_fp)
+        self._last_time = snapshot["time"]
+        self._last_n_jobs = snapshot["n_jobs"]
+
+
+def get_worker_ids(use_mpi=False, server_job=False, n_threads=1):
+    """Ids of the workers that compute jobs with the chosen executor."""
+    if use_mpi:
+        from mpi4py import MPI
+        return list(range(0 if server_job else 1, MPI.COMM_WORLD.Get_size()))
+    return list(range(n_threads))
+
+
+def write_prometheus(snapshot, prometheus_fp):
+    """Write a snapshot in the Prometheus textfile format.
+
+    The file is replaced atomically, so that collectors never read a
+    partially written file.
+    """
+    lines = []
+
+    def add_metric(name, metric_type, help_text, values):
+        lines.append(f"# HELP asreview_hyperopt_{name} {help_text}")
+        lines.append(f"# TYPE asreview_hyperopt_{name} {metric_type}")
+        for labels, value in values:
+            lines.append(f"asreview_hyperopt_{name}{labels} {value}")
+
+    add_metric("jobs_total", "counter", "Number of finished jobs.",
+               [("", snapshot["n_jobs"])])
+    add_metric("failed_jobs_total", "counter", "Number of failed jobs.",
+               [("", snapshot["n_failed"])])
+    add_metric("trials_total", "counter", "Number of finished trials.",
+               [("", snapshot["n_trials"])])
+    add_metric("jobs_per_second", "gauge",
+               "Jobs per second since the last snapshot.",
+               [("", snapshot["recent_jobs_per_second"])])
+    add_metric("queue_depth", "gauge", "Number of jobs waiting for a worker.",
+               [("", snapshot["queue_depth"])])
+    add_metric("worker_busy_fraction", "gauge",
+               "Fraction of the time a worker was computing jobs.",
+               [(f'{{worker="{worker}"}}', values["busy"])
+                for worker, values in snapshot["workers"].items()])
+    add_metric("trial_latency_seconds", "gauge",
+               "Quantiles of the wall clock time of the trials.",
+               [(f'{{quantile="{int(name[1:])/100}"}}', value)
+                for name, value in snapshot["trial_latency"].items()])
+
+    tmp_fp = prometheus_fp + ".tmp"
+    with open(tmp_fp, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+    os.replace(tmp_fp, prometheus_fp)
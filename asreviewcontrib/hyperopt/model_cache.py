@@ -0,0 +1,120 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Load large pretrained models once per process.
+
+Some asreview feature extraction methods load a pretrained model or a word
+embedding file every time they transform texts: sbert loads its weights,
+and embedding-idf and embedding-lstm read an embedding file of several GB.
+These loader functions are replaced by versions that keep the loaded
+models in a cache that lives as long as the (worker) process, so that the
+jobs of all trials share them.
+
+Doc2vec is not cached: it trains a new model on the data of each job.
+"""
+
+from functools import wraps
+import importlib
+import threading
+
+
+def _embedding_key(fp, word_index=None, n_jobs=None):
+    # A word index only loads part of the embedding.
+    if word_index is not None:
+        return None
+    return ("embedding", str(fp))
+
+
+def _sbert_key(model_name_or_path=None, *args, **kwargs):
+    if len(args) or len(kwargs):
+        return None
+    return ("sbert", model_name_or_path)
+
+
+# Feature extraction method -> [(module, loader, function to get the key)].
+MODEL_LOADERS = {
+    "embedding-idf": [
+        ("asreview.feature_extraction.embedding_idf", "load_embedding",
+         _embedding_key),
+    ],
+    "embedding-lstm": [
+        ("asreview.feature_extraction.embedding_lstm", "load_embedding",
+         _embedding_key),
+    ],
+    "sbert": [
+        ("asreview.feature_extraction.sbert", "SentenceTransformer",
+         _sbert_key),
+    ],
+}
+
+
+class ModelCache():
+    """Loaded models of the current process, by key.
+
+    Models are loaded by one thread at a time, so that threads that need
+    the same model wait for it instead of loading it again.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self.n_hit = 0
+        self.n_miss = 0
+        self._lock = threading.RLock()
+
+    def get(self, key, load):
+        """Get a model, calling load() if it is not cached."""
+        with self._lock:
+            try:
+                model = self._cache[key]
+                self.n_hit += 1
+            except KeyError:
+                model = load()
+                self._cache[key] = model
+                self.n_miss += 1
+        return model
+
+    def wrap_loader(self, loader, get_key):
+        """Cached version of a loader function."""
+        if getattr(loader, "_model_cache", None) is self:
+            return loader
+
+        @wraps(loader, updated=())
+        def cached_loader(*args, **kwargs):
+            key = get_key(*args, **kwargs)
+            if key is None:
+                return loader(*args, **kwargs)
+            return self.get(key, lambda: loader(*args, **kwargs))
+        cached_loader._model_cache = self
+        return cached_loader
+
+
+MODEL_CACHE = ModelCache()
+
+
+def cache_model_loaders(feature_name, model_cache=MODEL_CACHE):
+    """Cache the models that a feature extraction method loads.
+
+    Does nothing for feature extraction methods that do not load models, or
+    if the modules of the method cannot be imported.
+    """
+    for module_name, loader_name, get_key in MODEL_LOADERS.get(
+            feature_name, []):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        loader = getattr(module, loader_name, None)
+        if loader is not None:
+            setattr(module, loader_name,
+                    model_cache.wrap_loader(loader, get_key))
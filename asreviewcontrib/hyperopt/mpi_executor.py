@@ -12,69 +12,316 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import Counter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+import traceback
+
 from mpi4py import MPI
+import numpy as np
+
+from asreviewcontrib.hyperopt.job_utils import JobFailedError
+
+
+TAG_JOB = 1
+TAG_DONE = 2
+TAG_ERROR = 3
+TAG_TRIAL = 4
+TAG_STOP = 5
+
+POLL_INTERVAL = 0.01
+
+# Workers that did not finish their job in time, with the job they were
+# computing. They get no new jobs until they reply; the late result is then
+# discarded.
+_lost_workers = {}
+
+_next_trial_id = 0
 
 
 def mpi_worker(job_runner):
     comm = MPI.COMM_WORLD
+    job_buf = np.empty(3, dtype=np.int64)
+    trials = {}
     while True:
-        job = comm.recv(source=0)
-        if job is None:
+        status = MPI.Status()
+        comm.Probe(source=0, tag=MPI.ANY_TAG, status=status)
+        if status.tag == TAG_STOP:
+            comm.recv(source=0, tag=TAG_STOP)
             break
+        if status.tag == TAG_TRIAL:
+            reset, new_trials = comm.recv(source=0, tag=TAG_TRIAL)
+            if reset:
+                trials = {}
+            trials.update(new_trials)
+            continue
 
-        job_runner.execute(**job)
-        comm.send(None, dest=0)
+        comm.Recv(job_buf, source=0, tag=TAG_JOB)
+        trial_id, data_idx, i_run = job_buf.tolist()
+        try:
+            report = job_runner.execute_job(
+                data_name=job_runner.data_names[data_idx], i_run=i_run,
+                **trials[trial_id])
+        except Exception:
+            comm.send(traceback.format_exc(), dest=0, tag=TAG_ERROR)
+        else:
+            comm.send(report, dest=0, tag=TAG_DONE)
     return None, None
 
 
+def split_jobs(all_jobs, data_names):
+    """Split jobs into trials and an array of (trial_id, data_idx, i_run).
+
+    Jobs that share the same parameters belong to the same trial. The trial
+    parameters are sent only once to each worker, while the jobs themselves
+    are sent as small integer arrays, using pre-allocated buffers on the
+    workers.
+    """
+    global _next_trial_id
+
+    data_idx = {data_name: i for i, data_name in enumerate(data_names)}
+    trials = {}
+    trial_ids = {}
+    job_array = np.empty((len(all_jobs), 3), dtype=np.int64)
+    for i_job, job in enumerate(all_jobs):
+        trial = {key: value for key, value in job.items()
+                 if key not in ["data_name", "i_run"]}
+        trial_key = tuple((key, id(value))
+                          for key, value in sorted(trial.items()))
+        if trial_key not in trial_ids:
+            trial_ids[trial_key] = _next_trial_id
+            trials[_next_trial_id] = trial
+            _next_trial_id += 1
+        job_array[i_job] = (trial_ids[trial_key], data_idx[job["data_name"]],
+                            job["i_run"])
+    return trials, job_array
+
+
 def mpi_executor(all_jobs, job_runner=None, server_job=False,
-                 stop_workers=True):
+                 stop_workers=True, job_timeout=None, max_retries=2,
+                 on_done=None):
+    """Distribute jobs over the MPI workers.
+
+    Jobs that raise an error are retried up to max_retries times. If a
+    worker does not return within job_timeout seconds, it is considered lost
+    and its job is moved to another worker. When a job keeps failing, the
+    remaining jobs are cancelled and a JobFailedError is raised. With
+    on_done (see serial_executor), only the failing job is given up, and
+    its error is passed to on_done.
+    """
     comm = MPI.COMM_WORLD
     n_proc = comm.Get_size()
 
-    for i_proc in range(1, n_proc):
-        try:
-            job = all_jobs.pop()
-        except IndexError:
-            break
+    all_jobs = list(all_jobs)
+    trials, job_array = split_jobs(all_jobs, job_runner.data_names)
+    # Number of unfinished jobs of each trial. Finished trials are dropped,
+    # here and on the workers, so that they do not pile up when on_done
+    # keeps adding jobs.
+    jobs_left = Counter(job_array[:, 0].tolist())
+    # Trial ids known by each worker.
+    informed = {}
+    reports = [None]*len(all_jobs)
 
-        comm.send(job, dest=i_proc)
+    pending = deque(range(len(all_jobs)))
+    n_failed = [0]*len(all_jobs)
+    running = {}
+    idle = deque(pid for pid in range(1, n_proc) if pid not in _lost_workers)
+    error = None
 
-    if server_job:
-        try:
-            job = all_jobs.pop()
-            job_runner.execute(**job)
-        except IndexError:
-            pass
-
-    n_jobs_sent = 0
-    while len(all_jobs) > 0:
-        job = all_jobs.pop()
-        if server_job and (n_jobs_sent % n_proc) == n_proc - 1:
-            job_runner.execute(**job)
-            n_jobs_sent += 1
-            continue
+    def add_jobs(new_jobs):
+        nonlocal job_array
+        if not len(new_jobs):
+            return
+        new_trials, new_array = split_jobs(new_jobs, job_runner.data_names)
+        trials.update(new_trials)
+        jobs_left.update(new_array[:, 0].tolist())
+        n_jobs = len(all_jobs)
+        if n_jobs + len(new_jobs) > len(job_array):
+            # Grow the array geometrically, so that adding the jobs of one
+            # trial at a time does not copy it every time.
+            grown = np.empty((max(2*len(job_array), n_jobs + len(new_jobs)),
+                              3), dtype=np.int64)
+            grown[:n_jobs] = job_array[:n_jobs]
+            job_array = grown
+        job_array[n_jobs:n_jobs + len(new_jobs)] = new_array
+        pending.extend(range(len(all_jobs), len(all_jobs) + len(new_jobs)))
+        all_jobs.extend(new_jobs)
+        reports.extend([None]*len(new_jobs))
+        n_failed.extend([0]*len(new_jobs))
 
-        status = MPI.Status()
-        comm.recv(source=MPI.ANY_SOURCE, status=status)
-        pid = status.source
-        comm.send(job, dest=pid)
-        n_jobs_sent += 1
+    def job_done(i_job, report, msg=None):
+        reports[i_job] = report
+        trial_id = int(job_array[i_job, 0])
+        jobs_left[trial_id] -= 1
+        if not jobs_left[trial_id]:
+            del jobs_left[trial_id]
+            del trials[trial_id]
+        if on_done is not None:
+            add_jobs(on_done(i_job, report, msg))
 
-    for i_proc in range(1, n_proc):
-        status = MPI.Status()
-        comm.recv(source=MPI.ANY_SOURCE, status=status)
-        pid = status.source
-        if stop_workers:
-            comm.send(None, dest=pid)
+    def job_failed(i_job, msg):
+        nonlocal error
+        n_failed[i_job] += 1
+        logging.warning(f"Job {all_jobs[i_job]['data_name']}/"
+                        f"{all_jobs[i_job]['i_run']} failed "
+                        f"({n_failed[i_job]}x): {msg}")
+        if n_failed[i_job] <= max_retries:
+            pending.append(i_job)
+            return
+        msg = (f"job {all_jobs[i_job]['data_name']}/"
+               f"{all_jobs[i_job]['i_run']} failed "
+               f"{n_failed[i_job]} times: {msg}")
+        if on_done is not None:
+            job_done(i_job, None, msg)
+        else:
+            error = msg
+            pending.clear()
+
+    def recover_worker(pid):
+        stale_job = _lost_workers.pop(pid)
+        idle.append(pid)
+        logging.warning(f"Worker {pid} replied after its timeout, its result "
+                        "is discarded.")
+        # The late job may have overwritten the result files of a finished
+        # job of another trial with the same dataset and run.
+        stale_key = {key: value for key, value in stale_job.items()
+                     if key != "param"}
+        for i_job, job in enumerate(all_jobs):
+            if (reports[i_job] is None
+                    or job["param"] is stale_job["param"]
+                    or {key: value for key, value in job.items()
+                        if key != "param"} != stale_key):
+                continue
+            if on_done is None:
+                reports[i_job] = None
+                trial_id = int(job_array[i_job, 0])
+                if trial_id not in trials:
+                    trials[trial_id] = {
+                        key: value for key, value in job.items()
+                        if key not in ["data_name", "i_run"]}
+                jobs_left[trial_id] += 1
+                pending.append(i_job)
+            else:
+                logging.warning(f"Results of job {job['data_name']}/"
+                                f"{job['i_run']} may have been overwritten "
+                                f"by worker {pid}.")
+
+    def send_job(pid, i_job):
+        trial_id = int(job_array[i_job, 0])
+        # The trials of a worker are replaced on its first job, and when it
+        # still keeps trials that are finished.
+        if pid not in informed or not informed[pid] <= trials.keys():
+            comm.send((True, trials), dest=pid, tag=TAG_TRIAL)
+            informed[pid] = set(trials)
+        elif trial_id not in informed[pid]:
+            new_trials = {key: value for key, value in trials.items()
+                          if key not in informed[pid]}
+            comm.send((False, new_trials), dest=pid, tag=TAG_TRIAL)
+            informed[pid].update(new_trials)
+        comm.Send(job_array[i_job], dest=pid, tag=TAG_JOB)
+
+    metrics = job_runner.metrics
+    server_task = None
+    with ThreadPoolExecutor(max_workers=1) as server_pool:
+        while len(pending) or len(running) or server_task is not None:
+            if metrics is not None:
+                metrics.set_queue_depth(len(pending))
+                metrics.maybe_write()
+            while len(pending) and len(idle):
+                pid = idle.popleft()
+                i_job = pending.popleft()
+                send_job(pid, i_job)
+                running[pid] = (i_job, time.time())
+                if metrics is not None:
+                    metrics.job_started(pid)
 
+            # The server computes its own jobs in a separate thread, so that
+            # it can keep sending jobs to workers that are finished. If all
+            # workers are lost, the server thread does all the work.
+            if (server_task is None and len(pending)
+                    and (server_job or not len(running))):
+                i_job = pending.popleft()
+                server_task = (i_job, server_pool.submit(
+                    job_runner.execute_job, **all_jobs[i_job]))
+                if metrics is not None:
+                    metrics.job_started(0)
 
-def mpi_hyper_optimize(job_runner, n_iter):
+            if server_task is not None and server_task[1].done():
+                i_job, future = server_task
+                server_task = None
+                exc = future.exception()
+                if metrics is not None:
+                    metrics.job_finished(0, success=exc is None)
+                if exc is not None:
+                    job_failed(i_job, "".join(traceback.format_exception(
+                        type(exc), exc, exc.__traceback__)))
+                else:
+                    job_done(i_job, future.result())
+                continue
+
+            # Lost workers are probed as well, so that they can be used
+            # again when they reply.
+            status = MPI.Status()
+            if not (len(running) or len(_lost_workers)) or not comm.Iprobe(
+                    source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status):
+                if job_timeout is not None:
+                    for pid, (i_job, start_time) in list(running.items()):
+                        if time.time() - start_time > job_timeout:
+                            del running[pid]
+                            _lost_workers[pid] = all_jobs[i_job]
+                            if metrics is not None:
+                                metrics.job_finished(pid, success=False)
+                            job_failed(i_job, f"timeout on worker {pid}")
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            pid = status.source
+            msg = comm.recv(source=pid, tag=status.tag)
+            if pid in _lost_workers:
+                recover_worker(pid)
+                continue
+            i_job, _ = running.pop(pid)
+            idle.append(pid)
+            if metrics is not None:
+                metrics.job_finished(pid, success=status.tag != TAG_ERROR)
+            if status.tag == TAG_ERROR:
+                job_failed(i_job, msg)
+            else:
+                job_done(i_job, msg)
+
+    if stop_workers:
+        for pid in idle:
+            comm.send(None, dest=pid, tag=TAG_STOP)
+
+    if error is not None:
+        raise JobFailedError(error)
+    return reports
+
+
+def mpi_hyper_optimize(job_runner, n_iter, **kwargs):
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
+
+    # All ranks that compute jobs load their data at the same time, before
+    # the first trial is started.
+    if rank != 0 or job_runner.server_job:
+        job_runner.prewarm()
+    comm.Barrier()
+
     if rank == 0:
-        job_runner.hyper_optimize(n_iter)
+        job_runner.hyper_optimize(n_iter, **kwargs)
+        for pid in list(_lost_workers):
+            if comm.Iprobe(source=pid, tag=MPI.ANY_TAG):
+                comm.recv(source=pid, tag=MPI.ANY_TAG)
+                del _lost_workers[pid]
         for pid in range(1, comm.Get_size()):
-            comm.send(None, dest=pid)
+            if pid not in _lost_workers:
+                comm.send(None, dest=pid, tag=TAG_STOP)
+        if len(_lost_workers):
+            logging.error(f"Workers {sorted(_lost_workers)} did not respond, "
+                          "aborting.")
+            comm.Abort(1)
     else:
         mpi_worker(job_runner)
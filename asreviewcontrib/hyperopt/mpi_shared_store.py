@@ -0,0 +1,235 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Share feature matrices between the MPI ranks of a node.
+
+All ranks on a node attach to one MPI-3 shared memory window, allocated by
+the first rank of the node. Arrays are stored in this window, so that
+every matrix is computed by only one rank per node, and the other ranks of
+the node read it directly from the window, without copies. It has the same
+interface as the SharedFileStore.
+
+A second, small window holds the table of contents: the next free offset,
+and for each array the hash of its key, its state and its location. It is
+only modified while holding an exclusive lock on the window.
+"""
+
+import hashlib
+import json
+import time
+
+from mpi4py import MPI
+import numpy as np
+
+from asreviewcontrib.hyperopt.shared_store import pack_array
+from asreviewcontrib.hyperopt.shared_store import unpack_array
+
+
+STATE_EMPTY = 0
+STATE_COMPUTING = 1
+STATE_READY = 2
+# Computing the array failed, or it did not fit in the window.
+STATE_FAILED = 3
+
+# Hash (2), state, offset and number of bytes of each entry.
+ENTRY_SIZE = 5
+HEADER_SIZE = 2
+ALIGNMENT = 64
+
+
+def _key_hash(key):
+    return np.frombuffer(hashlib.md5(repr(key).encode()).digest(),
+                         dtype=np.int64)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT)*ALIGNMENT
+
+
+def supports_threads():
+    """Whether the store can be used by the server thread (--server_job).
+
+    The store makes MPI calls, so the server thread can only use it if the
+    MPI library supports calls from multiple threads at the same time.
+    """
+    return MPI.Query_thread() == MPI.THREAD_MULTIPLE
+
+
+class MPIWindowStore():
+    """Arrays shared through an MPI shared memory window.
+
+    The constructor is collective: all ranks should create the store at
+    the same time.
+
+    Arguments
+    ---------
+    pool_size: int
+        Number of bytes per node for the arrays. Arrays that do not fit
+        are computed by every rank that needs them.
+    max_entries: int
+        Maximum number of arrays in the window.
+    timeout: float
+        Maximum number of seconds to wait for another rank to compute an
+        array. After that, the array is computed by this rank.
+    comm: MPI.Comm
+        Communicator of all ranks that use the store.
+    """
+
+    def __init__(self, pool_size, max_entries=1024, timeout=3600,
+                 comm=MPI.COMM_WORLD):
+        self.pool_size = pool_size
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._attached = {}
+
+        self.node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+        is_leader = self.node_comm.Get_rank() == 0
+        toc_size = (HEADER_SIZE + ENTRY_SIZE*max_entries)*8
+        self._toc_win = MPI.Win.Allocate_shared(
+            toc_size if is_leader else 0, 8, comm=self.node_comm)
+        self._pool_win = MPI.Win.Allocate_shared(
+            pool_size if is_leader else 0, 1, comm=self.node_comm)
+
+        toc_buf, _ = self._toc_win.Shared_query(0)
+        self._toc = np.ndarray(buffer=toc_buf, dtype=np.int64,
+                               shape=(toc_size//8,))
+        self._pool_buf, _ = self._pool_win.Shared_query(0)
+        self._pool = np.ndarray(buffer=self._pool_buf, dtype=np.uint8,
+                                shape=(pool_size,))
+        if is_leader:
+            self._toc[:] = 0
+        self.node_comm.Barrier()
+
+    def _entries(self):
+        return self._toc[HEADER_SIZE:].reshape(-1, ENTRY_SIZE)
+
+    def _lock(self):
+        self._toc_win.Lock(0, MPI.LOCK_EXCLUSIVE)
+        self._toc_win.Sync()
+
+    def _unlock(self):
+        self._toc_win.Sync()
+        self._toc_win.Unlock(0)
+
+    def _find(self, key_hash):
+        """Index of the entry with a hash, or None (must hold the lock)."""
+        entries = self._entries()[:self._toc[1]]
+        idx = np.where(np.all(entries[:, :2] == key_hash, axis=1))[0]
+        return idx[0] if len(idx) else None
+
+    def get(self, key, compute):
+        """Get an array from the window, calling compute() if needed."""
+        key_hash = _key_hash(key)
+        hash_key = tuple(key_hash.tolist())
+        try:
+            return self._attached[hash_key]
+        except KeyError:
+            pass
+
+        self._lock()
+        i_entry = self._find(key_hash)
+        if i_entry is None and self._toc[1] < self.max_entries:
+            i_entry = self._toc[1]
+            self._toc[1] += 1
+            self._entries()[i_entry] = [*key_hash, STATE_COMPUTING, 0, 0]
+            self._unlock()
+            return self._compute_and_publish(hash_key, i_entry, compute)
+        self._unlock()
+
+        if i_entry is None or not self._wait(i_entry):
+            return compute()
+        X = self._attach(i_entry)
+        self._attached[hash_key] = X
+        return X
+
+    def _compute_and_publish(self, hash_key, i_entry, compute):
+        try:
+            X = compute()
+        except BaseException:
+            self._set_state(i_entry, STATE_FAILED)
+            raise
+
+        meta, arrays = pack_array(X)
+        meta["arrays"] = {}
+        nbytes = 0
+        for name, arr in arrays.items():
+            meta["arrays"][name] = [nbytes, arr.dtype.str, list(arr.shape)]
+            nbytes = _align(nbytes + arr.nbytes)
+        header = json.dumps(meta).encode()
+        data_offset = _align(8 + len(header))
+
+        self._lock()
+        offset = self._toc[0]
+        fits = offset + data_offset + nbytes <= self.pool_size
+        if fits:
+            self._toc[0] = _align(offset + data_offset + nbytes)
+        self._unlock()
+        if not fits:
+            self._set_state(i_entry, STATE_FAILED)
+            return X
+
+        pool = self._pool[offset:offset + data_offset + nbytes]
+        pool[:8] = np.frombuffer(np.int64(len(header)).tobytes(),
+                                 dtype=np.uint8)
+        pool[8:8 + len(header)] = np.frombuffer(header, dtype=np.uint8)
+        for name, arr in arrays.items():
+            start = data_offset + meta["arrays"][name][0]
+            pool[start:start + arr.nbytes] = np.frombuffer(
+                np.ascontiguousarray(arr).tobytes(), dtype=np.uint8)
+
+        self._lock()
+        self._entries()[i_entry, 3:] = [offset, data_offset + nbytes]
+        self._entries()[i_entry, 2] = STATE_READY
+        self._unlock()
+
+        X = self._attach(i_entry)
+        self._attached[hash_key] = X
+        return X
+
+    def _set_state(self, i_entry, state):
+        self._lock()
+        self._entries()[i_entry, 2] = state
+        self._unlock()
+
+    def _wait(self, i_entry):
+        """Wait until an entry is ready; False if it failed or timed out."""
+        start_time = time.time()
+        while time.time() - start_time < self.timeout:
+            self._lock()
+            state = self._entries()[i_entry, 2]
+            self._unlock()
+            if state == STATE_READY:
+                return True
+            if state == STATE_FAILED:
+                return False
+            time.sleep(0.05)
+        return False
+
+    def _attach(self, i_entry):
+        offset, nbytes = self._entries()[i_entry, 3:].tolist()
+        pool = self._pool[offset:offset + nbytes]
+        header_len = int(pool[:8].view(np.int64)[0])
+        meta = json.loads(pool[8:8 + header_len].tobytes())
+        data_offset = _align(8 + header_len)
+
+        # Arrays are created directly on the buffer, not as views of the
+        # pool: scipy copies small views of large arrays.
+        arrays = {}
+        for name, (start, dtype, shape) in meta["arrays"].items():
+            arr = np.frombuffer(
+                self._pool_buf, dtype=dtype, count=int(np.prod(shape)),
+                offset=offset + data_offset + start).reshape(shape)
+            arr.flags.writeable = False
+            arrays[name] = arr
+        return unpack_array(meta, arrays)
@@ -13,16 +13,20 @@
 # limitations under the License.
 
 import sys
+import time
 import argparse
 import logging
+import os
+from functools import partial
+from itertools import product
 
 from asreview.entry_points.base import BaseEntryPoint
 
 from asreviewcontrib.hyperopt.serial_executor import serial_executor
 from asreviewcontrib.hyperopt.serial_executor import serial_hyper_optimize
-from asreviewcontrib.hyperopt.passive_job import PassiveJobRunner
 from asreviewcontrib.hyperopt.job_utils import get_data_names,\
     _base_parse_arguments
+from asreviewcontrib.hyperopt.job_utils import parse_size
 
 
 class HyperPassiveEntryPoint(BaseEntryPoint):
@@ -48,22 +52,84 @@ def _parse_arguments():
         type=str,
         default="dense_nn",
         help="Prediction model for active learning."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time."
     )
     parser.add_argument(
         "-b", "--balance_strategy",
         type=str,
         default="simple",
         help="Balance strategy for active learning."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time."
     )
     parser.add_argument(
         "-e", "--feature_extraction",
         type=str,
         default="doc2vec",
-        help="Feature extraction method.")
+        help="Feature extraction method."
+        " Separate by commas to optimize multiple combinations at the"
+        " same time.")
+    parser.add_argument(
+        "--fidelities",
+        type=str,
+        default=None,
+        help="Comma separated list of fractions of the records (e.g."
+        " 0.1,0.3). Trials are first evaluated on subsamples of this size,"
+        " and only the most promising ones on the full datasets."
+    )
+    parser.add_argument(
+        "--eta",
+        type=float,
+        default=3,
+        help="Only the best 1/eta of the trials at each fidelity are"
+        " evaluated at the next fidelity."
+    )
+    parser.add_argument(
+        "--shared_dir",
+        type=str,
+        default=None,
+        help="Node-local directory (e.g. /dev/shm/hyperopt) to share the"
+        " labels and TF-IDF feature matrices between the processes of a"
+        " node through memory-mapped files."
+    )
+    parser.add_argument(
+        "--shared_memory",
+        type=parse_size,
+        default=None,
+        help="Size of an MPI shared memory window per node (e.g. 16G). One"
+        " rank per node computes the labels and TF-IDF feature matrices in"
+        " this window, and the other ranks of the node read them without"
+        " copies. Only with --mpi."
+    )
+    parser.add_argument(
+        "--shared_timeout",
+        type=float,
+        default=3600,
+        help="Maximum number of seconds to wait for another process that is"
+        " computing a shared matrix (--shared_dir or --shared_memory). After"
+        " that, the process computes the matrix itself."
+    )
     return parser
 
 
 def main(argv=sys.argv[1:]):
+    # The time budget includes the start up and the final flush of results.
+    start_time = time.time()
+    # Import the job runner here, so that the asreview CLI starts quickly.
+    from asreviewcontrib.hyperopt.passive_job import PassiveJobRunner
+    from asreviewcontrib.hyperopt.sweep import SweepJobRunner
+    from asreviewcontrib.hyperopt.sweep import parse_names
+    from asreviewcontrib.hyperopt.feature_cache import FeatureCache
+    from asreviewcontrib.hyperopt.metrics import MetricsRecorder
+    from asreviewcontrib.hyperopt.metrics import get_worker_ids
+    from asreviewcontrib.hyperopt.profiling import JobProfiler
+    from asreviewcontrib.hyperopt.scratch import ScratchStaging
+    from asreviewcontrib.hyperopt.shared_store import create_shared_store
+    from asreviewcontrib.hyperopt.warm_start import WarmStart
+    from asreviewcontrib.hyperopt.fidelity import FidelitySchedule
+    from asreviewcontrib.hyperopt.fidelity import parse_fidelities
+
     parser = _parse_arguments()
     args = vars(parser.parse_args(argv))
     datasets = args["datasets"].split(",")
@@ -71,27 +137,97 @@ def main(argv=sys.argv[1:]):
     feature_name = args["feature_extraction"]
     balance_name = args["balance_strategy"]
     n_iter = args["n_iter"]
+    deadline = None
+    if args["time_budget"] is not None:
+        deadline = start_time + args["time_budget"]
+    cost_aware = args["cost_aware"]
     use_mpi = args["use_mpi"]
     n_run = args["n_run"]
     server_job = args["server_job"]
     data_dir = args["data_dir"]
     output_dir = args["output_dir"]
+    job_timeout = args["job_timeout"]
+    max_retries = args["max_retries"]
 
     data_names = get_data_names(datasets, data_dir=data_dir)
+    if use_mpi and args["n_threads"] > 1:
+        parser.error("--n_threads cannot be used with --mpi.")
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_executor
-        executor = mpi_executor
+        executor = partial(mpi_executor, job_timeout=job_timeout,
+                           max_retries=max_retries)
+    elif args["n_threads"] > 1:
+        from asreviewcontrib.hyperopt.thread_executor import thread_executor
+        executor = partial(thread_executor, n_threads=args["n_threads"])
     else:
         executor = serial_executor
 
-    job_runner = PassiveJobRunner(
-        data_names, model_name, balance_name,
-        feature_name, executor=executor, n_run=n_run,
-        server_job=server_job, data_dir=data_dir,
-        output_dir=output_dir)
+    # Comma separated lists of models give a sweep over all combinations.
+    combinations = list(product(parse_names(model_name),
+                                parse_names(balance_name),
+                                parse_names(feature_name)))
+    if args["fidelities"] is not None and len(combinations) > 1:
+        parser.error("--fidelities cannot be used with multiple models.")
+
+    if args["shared_memory"] is not None and not use_mpi:
+        parser.error("--shared_memory can only be used with --mpi.")
+    if args["shared_memory"] is not None and server_job:
+        from asreviewcontrib.hyperopt.mpi_shared_store import \
+            supports_threads
+        if not supports_threads():
+            parser.error("--shared_memory with --server_job requires an MPI"
+                         " library with MPI_THREAD_MULTIPLE support.")
+    shared_store = create_shared_store(args["shared_dir"],
+                                       args["shared_memory"],
+                                       args["shared_timeout"])
+
+    job_runners = []
+    for model, balance, feature in combinations:
+        runner_output_dir = output_dir
+        if output_dir is not None and len(combinations) > 1:
+            runner_output_dir = os.path.join(
+                output_dir, "_".join([model, balance, feature]))
+        job_runner = PassiveJobRunner(
+            data_names, model, balance,
+            feature, executor=executor, n_run=n_run,
+            server_job=server_job, data_dir=data_dir,
+            output_dir=runner_output_dir)
+        job_runner.shared_store = shared_store
+        if args["fidelities"] is not None:
+            job_runner.fidelity_schedule = FidelitySchedule(
+                parse_fidelities(args["fidelities"]), eta=args["eta"])
+        if args["warm_start"] is not None:
+            job_runner.warm_start = WarmStart(
+                args["warm_start"].split(","), args["n_warm_start"])
+        if args["profile"] is not None:
+            job_runner.profiler = JobProfiler(
+                args["profile"],
+                os.path.join(job_runner.trials_dir, "profiles"))
+        if args["scratch_dir"] is not None:
+            job_runner.scratch = ScratchStaging(
+                args["scratch_dir"], job_runner.trials_dir,
+                flush=args["scratch_flush"])
+        if args["n_threads"] > 1:
+            job_runner.feature_cache = FeatureCache()
+        job_runners.append(job_runner)
+
+    if len(job_runners) > 1:
+        job_runner = SweepJobRunner(job_runners, executor=executor,
+                                    server_job=server_job)
+    metrics_dir = os.path.commonpath([runner.trials_dir
+                                      for runner in job_runners])
+
+    if args["metrics"] or args["prometheus_file"] is not None:
+        job_runner.metrics = MetricsRecorder(
+            os.path.join(metrics_dir, "metrics.jsonl"),
+            prometheus_fp=args["prometheus_file"],
+            interval=args["metrics_interval"],
+            workers=get_worker_ids(use_mpi, server_job, args["n_threads"]))
 
     if use_mpi:
         from asreviewcontrib.hyperopt.mpi_executor import mpi_hyper_optimize
-        mpi_hyper_optimize(job_runner, n_iter)
+        mpi_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                           cost_aware=cost_aware)
     else:
-        serial_hyper_optimize(job_runner, n_iter)
+        serial_hyper_optimize(job_runner, n_iter, deadline=deadline,
+                              cost_aware=cost_aware)
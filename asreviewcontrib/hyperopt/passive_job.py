@@ -12,35 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 from os.path import isfile
 import json
-import pickle
-from distutils.dir_util import copy_tree
+import time
 
-from hyperopt import STATUS_OK, Trials, fmin, tpe
+from hyperopt import STATUS_OK
 import numpy as np
-from tqdm import tqdm
 
 from asreview.balance_strategies.utils import get_balance_class
 from asreview.feature_extraction.utils import get_feature_class
 from asreview.models.utils import get_model_class
-from asreview import ASReviewData
 
+from asreviewcontrib.hyperopt.base_job import BaseJobRunner
 from asreviewcontrib.hyperopt.job_utils import get_trial_fp
 from asreviewcontrib.hyperopt.job_utils import get_split_param
 from asreviewcontrib.hyperopt.job_utils import empty_shared
-from asreviewcontrib.hyperopt.job_utils import data_fp_from_name
 from asreviewcontrib.hyperopt.job_utils import quality
 from asreviewcontrib.hyperopt.job_utils import get_out_fp
 from asreviewcontrib.hyperopt.job_utils import get_label_fp
+from asreviewcontrib.hyperopt.model_cache import cache_model_loaders
+from asreviewcontrib.hyperopt.random_state import get_random_state
+from asreviewcontrib.hyperopt.random_state import uses_global_random_state
 from asreviewcontrib.hyperopt.serial_executor import serial_executor
+from asreviewcontrib.hyperopt.timing import PhaseTimer
+from asreviewcontrib.hyperopt.timing import merge_reports
 
 
-class PassiveJobRunner():
+class PassiveJobRunner(BaseJobRunner):
     def __init__(self, data_names, model_name, balance_name, feature_name,
                  executor=serial_executor, n_run=10, server_job=False,
-                 data_dir="data", output_dir=None):
+                 data_dir="data", output_dir=None, fidelity_schedule=None):
 
         self.trials_dir, self.trials_fp = get_trial_fp(
             data_names, model_name=model_name, balance_name=balance_name,
@@ -53,6 +54,8 @@ class PassiveJobRunner():
 
         self.model_class = get_model_class(model_name)
         self.feature_class = get_feature_class(feature_name)
+        # Load pretrained models only once per process.
+        cache_model_loaders(feature_name)
         self.balance_class = get_balance_class(balance_name)
 
         self.server_job = server_job
@@ -62,72 +65,153 @@ class PassiveJobRunner():
         self.data_dir = data_dir
         self._cache = {data_name: {"train_idx": {}}
                        for data_name in data_names}
+        self._loss_memo = {}
+        self.fidelity_schedule = fidelity_schedule
+        # Fraction of the records that the current jobs use.
+        self.fidelity = 1.0
+
+    def create_jobs(self, param, data_names):
+        jobs = create_jobs(param, data_names, self.n_run)
+        if self.fidelity < 1:
+            for job in jobs:
+                job["fidelity"] = self.fidelity
+        return jobs
+
+    def dataset_loss(self, data_name):
+        label_fp = get_label_fp(self.results_dir, data_name, self.fidelity)
+        res_files = [get_out_fp(self.results_dir, data_name, i_run,
+                                self.fidelity)
+                     for i_run in range(self.n_run)]
+        return loss_from_files(res_files, label_fp)
+
+    def run_settings(self):
+        if self.fidelity < 1:
+            return (self.n_run, self.fidelity)
+        return (self.n_run, )
 
     def create_loss_function(self):
+        """Evaluate trials on increasing subsamples of the datasets.
+
+        Without a fidelity schedule, all trials use the full datasets.
+        """
+        objective_at_fidelity = super().create_loss_function()
+        if self.fidelity_schedule is None:
+            return objective_at_fidelity
+        schedule = self.fidelity_schedule
+
         def objective_func(param):
-            jobs = create_jobs(param, self.data_names, self.n_run)
-
-            self.executor(jobs, self, stop_workers=False,
-                          server_job=self.server_job)
-            losses = []
-            for data_name in self.data_names:
-                label_fp = get_label_fp(self.trials_dir, data_name)
-                res_files = [get_out_fp(self.trials_dir, data_name, i_run)
-                             for i_run in range(self.n_run)]
-                losses.append(loss_from_files(res_files, label_fp))
-            return {"loss": np.average(losses), 'status': STATUS_OK}
+            start_time = time.time()
+            results = []
+            fidelity_loss = {}
+            try:
+                for fidelity in schedule.fidelities:
+                    self.fidelity = fidelity
+                    result = objective_at_fidelity(param)
+                    results.append(result)
+                    if result["status"] != STATUS_OK:
+                        return result
+                    fidelity_loss[fidelity] = result["loss"]
+                    if not schedule.promote(fidelity, result["loss"]):
+                        break
+            finally:
+                self.fidelity = 1.0
+
+            return {
+                **result,
+                "loss": schedule.comparable_loss(fidelity, result["loss"]),
+                "wall_time": time.time() - start_time,
+                "n_memo": sum(res["n_memo"] for res in results),
+                "fidelity": fidelity,
+                "fidelity_loss": fidelity_loss,
+                **merge_reports(results),
+            }
 
         return objective_func
 
-    def execute(self, param, data_name, i_run):
+    def load_trials(self):
+        trials = super().load_trials()
+        if self.fidelity_schedule is not None:
+            self.fidelity_schedule.restore(trials)
+        return trials
+
+    def trials_info(self):
+        return {
+            "model_name": self.model_name,
+            "balance_name": self.balance_name,
+            "feature_name": self.feature_name,
+        }
+
+    def uses_global_random_state(self):
+        return uses_global_random_state(
+            model_name=self.model_name, balance_name=self.balance_name,
+            feature_name=self.feature_name)
+
+    def execute(self, param, data_name, i_run, fidelity=1.0):
+        timer = PhaseTimer()
         split_param = get_split_param(param)
         model = self.model_class(**split_param["model_param"])
         balance_model = self.balance_class(**split_param["balance_param"])
         feature_model = self.feature_class(**split_param["feature_param"])
 
-        as_data = self.get_cached_as_data(data_name)
-        train_idx = self.get_cached_train_idx(data_name, i_run)
-        out_fp = get_out_fp(self.trials_dir, data_name, i_run)
-
-        np.random.seed(i_run)
-        X = feature_model.fit_transform(
-            as_data.texts, as_data.title, as_data.abstract)
-        X_train, y_train = balance_model.sample(
-                X, as_data.labels, train_idx, empty_shared())
-        model.fit(X_train, y_train)
-        proba = model.predict_proba(X)[:, 1]
-
-        with open(out_fp, "w") as fp:
-            json.dump(
-                {"proba": proba.tolist(), "train_idx": train_idx.tolist()},
-                fp)
-
-        label_fp = get_label_fp(self.trials_dir, data_name)
-        if i_run == 0 and not isfile(label_fp):
-            with open(label_fp, "w") as fp:
-                json.dump(as_data.labels.tolist(), fp)
-
-    def get_cached_as_data(self, data_name):
-        try:
-            return self._cache[data_name]["as_data"]
-        except KeyError:
-            pass
-        data_fp = data_fp_from_name(self.data_dir, data_name)
-        as_data = ASReviewData.from_file(data_fp)
-        self._cache[data_name]["as_data"] = as_data
-        return as_data
-
-    def get_cached_train_idx(self, data_name, i_run):
+        with timer.phase("data"):
+            labels = self.get_cached_labels(data_name, fidelity)
+            train_idx = self.get_cached_train_idx(data_name, i_run, fidelity)
+        out_fp = get_out_fp(self.results_dir, data_name, i_run, fidelity)
+
+        # For the asreview models and strategies that use the global state.
+        if self.uses_global_random_state():
+            np.random.seed(i_run)
+        with timer.phase("features"):
+            X = self.get_features(feature_model, split_param["feature_param"],
+                                  data_name, fidelity)
+        with timer.phase("balance"):
+            X_train, y_train = balance_model.sample(
+                    X, labels, train_idx, empty_shared())
+        with timer.phase("fit"):
+            model.fit(X_train, y_train)
+        with timer.phase("predict"):
+            proba = model.predict_proba(X)[:, 1]
+
+        with timer.phase("io"):
+            with open(out_fp, "w") as fp:
+                json.dump(
+                    {"proba": proba.tolist(), "train_idx": train_idx.tolist()},
+                    fp)
+
+            label_fp = get_label_fp(self.results_dir, data_name, fidelity)
+            if i_run == 0 and not isfile(label_fp):
+                with open(label_fp, "w") as fp:
+                    json.dump(labels.tolist(), fp)
+        return timer.report()
+
+    def get_cached_labels(self, data_name, fidelity=1.0):
+        labels = super().get_cached_labels(data_name)
+        if fidelity < 1:
+            return labels[self.get_cached_subsample_idx(data_name, fidelity)]
+        return labels
+
+    def get_cached_train_idx(self, data_name, i_run, fidelity=1.0):
+        # Keep the keys of the full datasets the same as before.
+        key = i_run if fidelity >= 1 else (i_run, fidelity)
         try:
-            return self._cache[data_name]["train_idx"][i_run]
+            return self._cache[data_name]["train_idx"][key]
         except KeyError:
             pass
 
-        as_data = self.get_cached_as_data(data_name)
-        train_idx = compute_train_idx(as_data.labels, i_run)
-        self._cache[data_name]["train_idx"][i_run] = train_idx
+        labels = self.get_cached_labels(data_name, fidelity)
+        train_idx = compute_train_idx(labels, i_run)
+        self._cache[data_name]["train_idx"][key] = train_idx
         return train_idx
 
+    def prewarm(self):
+        fidelities = [1.0]
+        if self.fidelity_schedule is not None:
+            fidelities = self.fidelity_schedule.fidelities
+        for data_name in self.data_names:
+            for fidelity in fidelities:
+                for i_run in range(self.n_run):
+                    self.get_cached_train_idx(data_name, i_run, fidelity)
+
     def get_hyper_space(self):
         model_hs, model_hc = self.model_class().hyper_space()
         balance_hs, balance_hc = self.balance_class().hyper_space()
@@ -136,45 +220,6 @@ class PassiveJobRunner():
         hyper_choices = {**model_hc, **balance_hc, **feature_hc}
         return hyper_space, hyper_choices
 
-    def hyper_optimize(self, n_iter):
-        obj_function = self.create_loss_function()
-        hyper_space, hyper_choices = self.get_hyper_space()
-
-        try:
-            with open(self.trials_fp, "rb") as fp:
-                trials_data = pickle.load(fp)
-            trials = trials_data["trials"]
-        except FileNotFoundError:
-            trials = None
-            print(f"Creating new hyper parameter optimization run: "
-                  f"{self.trials_fp}")
-
-        if trials is None:
-            trials = Trials()
-            n_start_evals = 0
-        else:
-            n_start_evals = len(trials.trials)
-
-        for i in tqdm(range(n_iter)):
-            fmin(fn=obj_function,
-                 space=hyper_space,
-                 algo=tpe.suggest,
-                 max_evals=i+n_start_evals+1,
-                 trials=trials,
-                 show_progressbar=False)
-            trials_data = {
-                "trials": trials,
-                "hyper_choices": hyper_choices,
-                "model_name": self.model_name,
-                "balance_name": self.balance_name,
-                "feature_name": self.feature_name,
-            }
-            with open(self.trials_fp, "wb") as fp:
-                pickle.dump(trials_data, fp)
-            if trials.best_trial['tid'] == len(trials.trials)-1:
-                copy_tree(os.path.join(self.trials_dir, "current"),
-                          os.path.join(self.trials_dir, "best"))
-
 
 def loss_from_files(data_fps, labels_fp):
     with open(labels_fp, "r") as fp:
@@ -220,14 +265,15 @@ def create_jobs(param, data_names, n_run):
 
 
 def compute_train_idx(y, seed):
-    np.random.seed(seed)
+    random_state = get_random_state(seed)
     one_idx = np.where(y == 1)[0]
     zero_idx = np.where(y == 0)[0]
 
     n_zero_train = min(len(zero_idx)-1, max(1, round(0.75*len(zero_idx))))
     n_one_train = min(len(one_idx)-1, max(1, round(0.75*len(one_idx))))
 
-    train_one_idx = np.random.choice(one_idx, n_one_train, replace=False)
-    train_zero_idx = np.random.choice(zero_idx, n_zero_train, replace=False)
+    train_one_idx = random_state.choice(one_idx, n_one_train, replace=False)
+    train_zero_idx = random_state.choice(zero_idx, n_zero_train,
+                                         replace=False)
     train_idx = np.append(train_one_idx, train_zero_idx)
     return train_idx
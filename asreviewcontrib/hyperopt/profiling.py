@@ -0,0 +1,94 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+from glob import glob
+import hashlib
+import io
+import os
+from os.path import join
+import pstats
+
+from asreviewcontrib.hyperopt.job_utils import _fidelity_suffix
+from asreviewcontrib.hyperopt.job_utils import canonical_param
+
+
+def param_hash(param):
+    """Short hash of a parameter dictionary, stable between processes."""
+    return hashlib.md5(
+        repr(canonical_param(param)).encode()).hexdigest()[:10]
+
+
+class JobProfiler():
+    """Profile the execution of selected jobs with cProfile.
+
+    Arguments
+    ---------
+    selection: str
+        Either a fraction of jobs to profile (e.g. "0.05"), or a comma
+        separated list of jobs to profile as data_name:i_run (e.g.
+        "ptsd:0,ace:1"), see parse_profile. Selected jobs are profiled in
+        every trial.
+    profile_dir: str
+        Directory to write the profile of each job to.
+    """
+
+    def __init__(self, selection, profile_dir):
+        self.profile_dir = profile_dir
+        self.fraction = None
+        self.jobs = set()
+        try:
+            self.fraction = float(selection)
+        except ValueError:
+            for job in selection.split(","):
+                data_name, i_run = job.rsplit(":", 1)
+                self.jobs.add((data_name, int(i_run)))
+
+    def is_selected(self, param, data_name, i_run):
+        if self.fraction is None:
+            return (data_name, i_run) in self.jobs
+        # Deterministic sampling: all processes make the same decision.
+        job_hash = hashlib.md5(
+            f"{param_hash(param)}/{data_name}/{i_run}".encode()).hexdigest()
+        return int(job_hash[:8], 16)/16**8 < self.fraction
+
+    def profile_fp(self, param, data_name, i_run, fidelity=1.0):
+        return join(self.profile_dir,
+                    f"{param_hash(param)}_{data_name}_{i_run}"
+                    f"{_fidelity_suffix(fidelity)}.prof")
+
+    def run(self, func, param, data_name, i_run, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, param=param, data_name=data_name,
+                                    i_run=i_run, **kwargs)
+        finally:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(self.profile_fp(
+                param, data_name, i_run, kwargs.get("fidelity", 1.0)))
+
+
+def write_profile_summary(profile_dir, summary_fp, n_functions=50):
+    """Merge all job profiles and write the most expensive functions."""
+    profile_files = sorted(glob(join(profile_dir, "*.prof")))
+    if not len(profile_files):
+        return
+
+    out = io.StringIO()
+    stats = pstats.Stats(*profile_files, stream=out)
+    out.write(f"Merged profile of {len(profile_files)} jobs.\n\n")
+    stats.sort_stats("cumulative").print_stats(n_functions)
+    stats.sort_stats("tottime").print_stats(n_functions)
+    with open(summary_fp, "w") as fp:
+        fp.write(out.getvalue())
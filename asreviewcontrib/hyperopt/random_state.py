@@ -0,0 +1,62 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Random number generators of the jobs.
+
+Jobs used to seed NumPy's global random state with their run number. Since
+the global state is shared by all threads of a process, jobs that do so
+cannot run in threads. Instead, each job draws from its own generator,
+seeded with its run number.
+
+The generators are np.random.RandomState objects rather than the newer
+np.random.Generator: they draw the same numbers as the global random state
+did after seeding, so that the training sets and prior knowledge of the
+runs (and thus existing trials files) stay the same, and sklearn estimators
+accept them as their random_state.
+
+Some asreview models, strategies and feature extraction methods draw from
+the global random state themselves; jobs that use them still seed it, and
+can only run in separate processes.
+"""
+
+import numpy as np
+
+from asreviewcontrib.hyperopt.feature_cache import DETERMINISTIC_FEATURES
+
+
+# Models, query and balance strategies that do not draw from the global
+# random state (or whose results do not depend on it).
+DETERMINISTIC_MODELS = ["nb", "logistic"]
+DETERMINISTIC_QUERIES = ["max"]
+DETERMINISTIC_BALANCERS = ["simple"]
+
+
+def get_random_state(i_run):
+    """Random number generator of a run."""
+    return np.random.RandomState(i_run)
+
+
+def uses_global_random_state(model_name=None, query_name=None,
+                             balance_name=None, feature_name=None):
+    """Check whether a combination draws from the global random state.
+
+    Components that are not used (None) are ignored.
+    """
+    for name, deterministic in [(model_name, DETERMINISTIC_MODELS),
+                                (query_name, DETERMINISTIC_QUERIES),
+                                (balance_name, DETERMINISTIC_BALANCERS),
+                                (feature_name, DETERMINISTIC_FEATURES)]:
+        if name is not None and name not in deterministic:
+            return True
+    return False
@@ -0,0 +1,153 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stage result files on node-local scratch instead of the output directory.
+
+Normally, every job writes its result files to trials_dir/current on the
+(shared) output filesystem, and the loss is computed from there. With many
+workers, this puts a heavy load on the metadata server of the filesystem.
+
+With scratch staging, each job writes its files to a temporary directory
+on the local scratch disk of its node. The contents of these files are
+sent back with the report of the job, and the main process writes them to
+a local mirror of trials_dir, from which the loss is computed. A
+background thread copies the files to the output directory in batches:
+all of them, or only those of the best trial.
+"""
+
+import hashlib
+import os
+from os.path import abspath, dirname, join, relpath
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+
+class ScratchStaging():
+    """Result files on node-local scratch, flushed in the background.
+
+    Arguments
+    ---------
+    scratch_dir: str
+        Node-local directory for the result files, e.g. $TMPDIR.
+    trials_dir: str
+        Output directory of the job runner.
+    flush: str
+        Which result files to copy to the output directory: "all" copies
+        trials_dir/current and trials_dir/best, "best" only copies the
+        files of the best trial to trials_dir/best.
+    flush_interval: float
+        Number of seconds between two batches of copies.
+    """
+
+    def __init__(self, scratch_dir, trials_dir, flush="all",
+                 flush_interval=10.0):
+        self.scratch_dir = scratch_dir
+        self.trials_dir = trials_dir
+        self.flush_all = flush == "all"
+        self.flush_interval = flush_interval
+        run_hash = hashlib.md5(abspath(trials_dir).encode()).hexdigest()
+        self.local_dir = join(scratch_dir, run_hash[:12])
+        self._queue = queue.Queue()
+        self._wake = threading.Event()
+        self._thread = None
+        # Longest time it took to copy a batch of files, as an estimate of
+        # the time flush() takes at the end of the run.
+        self.max_batch_time = 0.0
+
+    def job_dir(self):
+        """New temporary directory to write the result files of a job to."""
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        return tempfile.mkdtemp(prefix="job_", dir=self.scratch_dir)
+
+    def collect(self, job_dir):
+        """Read and remove the files that a job wrote."""
+        files = {}
+        for root, _, file_names in os.walk(job_dir):
+            for file_name in file_names:
+                fp = join(root, file_name)
+                with open(fp, "rb") as f:
+                    files[relpath(fp, job_dir)] = f.read()
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return files
+
+    def store(self, files):
+        """Write the files of a job to the local mirror of trials_dir."""
+        for rel_fp, content in files.items():
+            fp = join(self.local_dir, rel_fp)
+            os.makedirs(dirname(fp), exist_ok=True)
+            with open(fp, "wb") as f:
+                f.write(content)
+            if self.flush_all:
+                self._submit(rel_fp)
+
+    def copy_best(self):
+        """Copy the current results to best, locally and in the background.
+
+        The local copy is a snapshot, since the next trial overwrites the
+        current results.
+        """
+        current_dir = join(self.local_dir, "current")
+        best_dir = join(self.local_dir, "best")
+        for root, _, file_names in os.walk(current_dir):
+            for file_name in file_names:
+                rel_fp = relpath(join(root, file_name), current_dir)
+                os.makedirs(dirname(join(best_dir, rel_fp)), exist_ok=True)
+                shutil.copyfile(join(current_dir, rel_fp),
+                                join(best_dir, rel_fp))
+                self._submit(join("best", rel_fp))
+
+    def flush(self):
+        """Wait until all files are copied to the output directory."""
+        self._wake.set()
+        self._queue.join()
+
+    def _submit(self, rel_fp):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop,
+                                            daemon=True)
+            self._thread.start()
+        self._queue.put(rel_fp)
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Files that were written multiple times are copied once.
+            batch_start = time.time()
+            for rel_fp in dict.fromkeys(batch):
+                try:
+                    self._copy(rel_fp)
+                except OSError as err:
+                    print(f"Failed to copy {rel_fp} to the output "
+                          f"directory: {err}")
+            self.max_batch_time = max(self.max_batch_time,
+                                      time.time() - batch_start)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _copy(self, rel_fp):
+        out_fp = join(self.trials_dir, rel_fp)
+        os.makedirs(dirname(out_fp), exist_ok=True)
+        tmp_fp = out_fp + ".tmp"
+        shutil.copyfile(join(self.local_dir, rel_fp), tmp_fp)
+        os.replace(tmp_fp, out_fp)
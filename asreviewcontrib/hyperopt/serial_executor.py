@@ -12,11 +12,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import traceback
 
-def serial_executor(jobs, job_runner, stop_workers=False, server_job=True):
-    for job in jobs:
-        job_runner.execute(**job)
 
+def serial_executor(jobs, job_runner, stop_workers=False, server_job=True,
+                    on_done=None):
+    """Compute the jobs one by one in the current process.
 
-def serial_hyper_optimize(job_runner, n_iter):
-    job_runner.hyper_optimize(n_iter)
+    If on_done is given, it is called as on_done(i_job, report, error) after
+    each job, with error None or the traceback of a failed job (which then
+    does not raise). It returns a list of new jobs to compute, which get the
+    next indices. The same holds for the other executors.
+    """
+    metrics = job_runner.metrics
+    jobs = list(jobs)
+    reports = []
+    while len(reports) < len(jobs):
+        i_job = len(reports)
+        if metrics is not None:
+            metrics.set_queue_depth(len(jobs) - i_job - 1)
+            metrics.job_started(0)
+        report, error = None, None
+        if on_done is None:
+            report = job_runner.execute_job(**jobs[i_job])
+        else:
+            try:
+                report = job_runner.execute_job(**jobs[i_job])
+            except Exception:
+                error = traceback.format_exc()
+        reports.append(report)
+        if metrics is not None:
+            metrics.job_finished(0, success=error is None)
+            metrics.maybe_write()
+        if on_done is not None:
+            jobs.extend(on_done(i_job, report, error))
+    return reports
+
+
+def serial_hyper_optimize(job_runner, n_iter, **kwargs):
+    job_runner.prewarm()
+    job_runner.hyper_optimize(n_iter, **kwargs)
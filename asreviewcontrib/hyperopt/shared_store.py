@@ -0,0 +1,184 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Share feature matrices and labels between the processes of a node.
+
+Each worker process normally holds its own copy of the datasets and
+feature matrices, so that memory use grows with the number of workers per
+node. A SharedFileStore publishes each array once as memory-mapped .npy
+files in a node-local directory (e.g. /dev/shm). The first process that
+needs an array computes and publishes it; the others wait for it and map
+the files read-only, so all processes share the same pages of memory.
+
+Sparse matrices are stored as their CSR component arrays (data, indices
+and indptr), dense arrays as a single array.
+
+The process that computes an array holds an flock on a lock file next to
+it. The lock is released by the operating system when the process dies, so
+that a killed process never leaves the other processes waiting.
+"""
+
+import fcntl
+from glob import glob
+import hashlib
+import json
+import os
+from os.path import isdir, join
+import shutil
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+
+CSR_ARRAYS = ["data", "indices", "indptr"]
+
+
+def key_hash(key):
+    """Hash of a (nested) tuple key, stable between processes."""
+    return hashlib.md5(repr(key).encode()).hexdigest()
+
+
+def pack_array(X):
+    """Split a dense or sparse matrix into its meta data and arrays."""
+    if issparse(X):
+        # The shared arrays are read-only, so the matrix is brought in
+        # canonical form here; otherwise sklearn sorts the indices in place.
+        X = csr_matrix(X, copy=True)
+        X.sum_duplicates()
+        X.sort_indices()
+        meta = {"format": "csr", "shape": list(X.shape)}
+        return meta, {name: getattr(X, name) for name in CSR_ARRAYS}
+    return {"format": "dense"}, {"array": np.asarray(X)}
+
+
+def unpack_array(meta, arrays):
+    """Inverse of pack_array, without copying the arrays."""
+    if meta["format"] == "csr":
+        return csr_matrix(tuple(arrays[name] for name in CSR_ARRAYS),
+                          shape=tuple(meta["shape"]), copy=False)
+    return arrays["array"]
+
+
+class SharedFileStore():
+    """Arrays shared through memory-mapped files in a directory.
+
+    Arguments
+    ---------
+    store_dir: str
+        Directory to store the arrays in. It should be on a node-local
+        (preferably memory backed) filesystem, such as /dev/shm.
+    timeout: float
+        Maximum number of seconds to wait for another process that is
+        computing an array. After that, the array is computed by this
+        process.
+    """
+
+    def __init__(self, store_dir, timeout=3600):
+        self.store_dir = store_dir
+        self.timeout = timeout
+        self._attached = {}
+        os.makedirs(store_dir, exist_ok=True)
+
+    def get(self, key, compute):
+        """Get an array from the store, calling compute() if needed."""
+        item_dir = join(self.store_dir, key_hash(key))
+        try:
+            return self._attached[item_dir]
+        except KeyError:
+            pass
+
+        if not isdir(item_dir):
+            lock_fd = os.open(item_dir + ".lock", os.O_CREAT | os.O_RDWR)
+            try:
+                # Wait while another process is computing the array.
+                if not self._lock(lock_fd, item_dir):
+                    return compute()
+                if not isdir(item_dir):
+                    self._publish(item_dir, compute())
+            finally:
+                # Closing the file releases the lock.
+                os.close(lock_fd)
+
+        X = self._attach(item_dir)
+        self._attached[item_dir] = X
+        return X
+
+    def _lock(self, lock_fd, item_dir):
+        """Lock the array, or wait until it is published.
+
+        Returns False if the timeout expired.
+        """
+        start_time = time.time()
+        while True:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            if isdir(item_dir):
+                return True
+            if time.time() - start_time > self.timeout:
+                return False
+            time.sleep(0.1)
+
+    def _publish(self, item_dir, X):
+        # Temporary directories of processes that were killed while
+        # publishing; the lock guarantees no one else is writing them.
+        for stale_dir in glob(item_dir + ".tmp*"):
+            shutil.rmtree(stale_dir, ignore_errors=True)
+
+        # Write to a temporary directory, and rename it when it is complete.
+        tmp_dir = f"{item_dir}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        meta, arrays = pack_array(X)
+        for name, arr in arrays.items():
+            np.save(join(tmp_dir, name + ".npy"), arr)
+        with open(join(tmp_dir, "meta.json"), "w") as fp:
+            json.dump(meta, fp)
+        try:
+            os.rename(tmp_dir, item_dir)
+        except OSError:
+            # Published by another process in the meantime.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _attach(self, item_dir):
+        with open(join(item_dir, "meta.json"), "r") as fp:
+            meta = json.load(fp)
+        names = CSR_ARRAYS if meta["format"] == "csr" else ["array"]
+        arrays = {name: _load_mmap(join(item_dir, name + ".npy"))
+                  for name in names}
+        return unpack_array(meta, arrays)
+
+
+def _load_mmap(fp):
+    try:
+        return np.load(fp, mmap_mode="r")
+    except ValueError:
+        # Empty arrays cannot be memory-mapped.
+        return np.load(fp)
+
+
+def create_shared_store(shared_dir=None, shared_memory=None, timeout=3600):
+    """Store for the --shared_dir or --shared_memory option, or None.
+
+    With shared_memory (a number of bytes), arrays are shared through an
+    MPI shared memory window; this is collective over all MPI ranks.
+    """
+    if shared_memory is not None:
+        from asreviewcontrib.hyperopt.mpi_shared_store import MPIWindowStore
+        return MPIWindowStore(shared_memory, timeout=timeout)
+    if shared_dir is not None:
+        return SharedFileStore(shared_dir, timeout=timeout)
+    return None
@@ -12,14 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
 from copy import deepcopy
 import pickle
 
-import pandas as pd
 import numpy as np
 
 from asreview.entry_points.base import BaseEntryPoint
 
+from asreviewcontrib.hyperopt.trials_summary import get_timings
+from asreviewcontrib.hyperopt.trials_summary import load_trials_summary
+from asreviewcontrib.hyperopt.trials_summary import top_k
+
 
 def load_trials(trials_fp):
     with open(trials_fp, "rb") as fp:
@@ -34,18 +38,38 @@ def load_trials(trials_fp):
             for i in range(len(values[key])):
                 values[key][i] = hyper_choices[key][values[key][i]]
 
-    values.update({"loss": trials.losses()})
+    # Failed trials have no loss.
+    values.update({"loss": [np.nan if loss is None else loss
+                            for loss in trials.losses()]})
 
     for key, arr in values.items():
-        if not isinstance(arr[0], float):
+        if not isinstance(arr[0], float) or np.any(np.isnan(arr)):
             continue
         if np.all(arr-np.array(arr, dtype=int) == 0.0):
             values[key] = [int(val) for val in arr]
 
     trials_data["values"] = values
+    trials_data["timings"] = get_timings(trials)
     return trials_data
 
 
+def timing_summary(timings):
+    """Aggregate the phase timings over all trials."""
+    import pandas as pd
+
+    summary = {}
+    for key, arr in timings.items():
+        if not key.startswith("time_"):
+            continue
+        summary[key[5:]] = {
+            "mean (s)": np.nanmean(arr),
+            "total (s)": np.nansum(arr),
+        }
+    summary = pd.DataFrame(summary).T
+    summary["fraction"] = summary["total (s)"]/summary["total (s)"].sum()
+    return summary.sort_values("total (s)", ascending=False)
+
+
 class ShowTrialsEntryPoint(BaseEntryPoint):
     description = "List trials for hyper parameter optimization."
 
@@ -58,11 +82,44 @@ class ShowTrialsEntryPoint(BaseEntryPoint):
         self.version = __version__
 
     def execute(self, argv):
-        try:
-            trials_fp = argv[0]
-        except IndexError:
-            print("Error: need argument path to trials.pkl file.")
-        values = load_trials(trials_fp)["values"]
+        import pandas as pd
+
+        parser = _parse_arguments()
+        args = vars(parser.parse_args(argv))
+        trials_data = load_trials_summary(args["trials_fp"],
+                                          timings=args["timings"])
+        values = trials_data["values"]
+        if args["timings"]:
+            values.update(trials_data["timings"])
+
+        idx = top_k(values["loss"], args["top"])
         pd.options.display.max_rows = 999
         pd.options.display.width = 0
-        print(pd.DataFrame(values).sort_values("loss"))
+        print(pd.DataFrame({key: arr[idx] for key, arr in values.items()},
+                           index=idx))
+
+        if args["timings"] and len(trials_data["timings"]) > 1:
+            print("\nTime per phase, summed over jobs:")
+            print(timing_summary(trials_data["timings"]))
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="show")
+    parser.add_argument(
+        "trials_fp",
+        type=str,
+        help="Trials file to show."
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Show the time spent per phase and the peak memory for each"
+        " trial, and a summary over all trials."
+    )
+    parser.add_argument(
+        "-k", "--top",
+        type=int,
+        default=None,
+        help="Only show the k trials with the lowest loss."
+    )
+    return parser
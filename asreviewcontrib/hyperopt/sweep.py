@@ -0,0 +1,247 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Optimize several model combinations at the same time.
+
+Each combination (e.g. nb + double balancing, svm + simple balancing) has its
+own job runner and trials file. Each job runner has one trial running at a
+time, and the jobs of all these trials are sent to the same executor. As
+soon as the last job of a trial is done, the job runner starts its next
+trial, so that fast combinations do not wait for the slow ones. A failing
+job only fails the trial it belongs to.
+The job runners share their data caches and (deterministic) feature
+matrices.
+"""
+
+import logging
+import os
+import time
+
+from hyperopt import JOB_STATE_DONE, JOB_STATE_RUNNING, STATUS_FAIL
+from hyperopt import space_eval, tpe
+from hyperopt.base import Domain
+from hyperopt.utils import coarse_utcnow
+import numpy as np
+from tqdm import tqdm
+
+from asreviewcontrib.hyperopt.base_job import estimate_trial_time
+from asreviewcontrib.hyperopt.base_job import is_best_trial
+from asreviewcontrib.hyperopt.cost_aware import cost_aware_suggest
+from asreviewcontrib.hyperopt.feature_cache import FeatureCache
+from asreviewcontrib.hyperopt.profiling import write_profile_summary
+from asreviewcontrib.hyperopt.serial_executor import serial_executor
+
+
+class SweepJobRunner():
+    """Run the trials of several job runners on the same executor.
+
+    Arguments
+    ---------
+    job_runners: list
+        Job runners of the same type (all passive or all active), with the
+        same datasets.
+    executor: function
+        Executor to compute the jobs of all job runners.
+    server_job: bool
+        Run jobs on the server as well.
+    feature_cache_size: int
+        Number of feature matrices to keep in the shared feature cache.
+    """
+
+    def __init__(self, job_runners, executor=serial_executor,
+                 server_job=False, feature_cache_size=4):
+        self.job_runners = job_runners
+        self.executor = executor
+        self.server_job = server_job
+        self.data_names = job_runners[0].data_names
+        self.metrics = None
+
+        feature_cache = FeatureCache(feature_cache_size)
+        for job_runner in job_runners:
+            job_runner._cache = job_runners[0]._cache
+            job_runner.feature_cache = feature_cache
+
+    def execute_job(self, param, data_name, i_run, runner_idx):
+        return self.job_runners[runner_idx].execute_job(
+            param=param, data_name=data_name, i_run=i_run)
+
+    def prewarm(self):
+        for job_runner in self.job_runners:
+            job_runner.prewarm()
+
+    def uses_global_random_state(self):
+        return any(job_runner.uses_global_random_state()
+                   for job_runner in self.job_runners)
+
+    def hyper_optimize(self, n_iter=None, deadline=None, cost_aware=False):
+        """Optimize the hyper parameters of all job runners.
+
+        The arguments are the same as for BaseJobRunner.hyper_optimize,
+        where n_iter is the number of trials per job runner.
+        """
+        algo = cost_aware_suggest if cost_aware else tpe.suggest
+        rstate = np.random.RandomState()
+
+        states = []
+        for job_runner in self.job_runners:
+            hyper_space, hyper_choices = job_runner.get_hyper_space()
+            trials = job_runner.load_trials()
+            runner_algo = algo
+            if job_runner.warm_start is not None:
+                runner_algo = job_runner.warm_start.wrap_algo(
+                    algo, trials, hyper_choices)
+            states.append({
+                "hyper_space": hyper_space,
+                "hyper_choices": hyper_choices,
+                "domain": Domain(job_runner.create_loss_function(),
+                                 hyper_space),
+                "trials": trials,
+                "algo": runner_algo,
+            })
+            job_runner.clear_current()
+
+        if n_iter is None and deadline is None:
+            n_iter = 1
+        if self.metrics is not None:
+            self.metrics.start()
+        n_runners = len(self.job_runners)
+        progress = tqdm(total=n_iter*n_runners if n_iter is not None
+                        else None)
+
+        n_started = [0]*n_runners
+        job_trials = []
+
+        def can_start(runner_idx):
+            if n_iter is not None and n_started[runner_idx] >= n_iter:
+                return False
+            if deadline is None:
+                return True
+            time_left = deadline - time.time() - sum(
+                job_runner.estimate_flush_time()
+                for job_runner in self.job_runners)
+            if estimate_trial_time(states[runner_idx]["trials"]) > time_left:
+                print(f"Stopping after {n_started[runner_idx]} trials of "
+                      f"{self.job_runners[runner_idx].trials_fp}: time "
+                      "budget is (nearly) used up.")
+                return False
+            return True
+
+        def start_trial(runner_idx):
+            """Start the next trial of a job runner and return its jobs."""
+            job_runner = self.job_runners[runner_idx]
+            while can_start(runner_idx):
+                n_started[runner_idx] += 1
+                trial, param = ask(states[runner_idx],
+                                   rstate.randint(2**31 - 1))
+                current = {"runner_idx": runner_idx, "trial": trial,
+                           "param": param, "start_time": time.time(),
+                           "reports": {}, "error": None}
+                jobs = job_runner.create_jobs(
+                    param, job_runner.missing_data_names(param))
+                current["n_left"] = len(jobs)
+                if not len(jobs):
+                    finish_trial(current)
+                    continue
+                job_trials.extend([current]*len(jobs))
+                return [{**job, "runner_idx": runner_idx} for job in jobs]
+            return []
+
+        def finish_trial(current):
+            job_runner = self.job_runners[current["runner_idx"]]
+            state = states[current["runner_idx"]]
+            if current["error"] is not None:
+                result = {"status": STATUS_FAIL, "error": current["error"]}
+            else:
+                reports = [current["reports"][i_job]
+                           for i_job in sorted(current["reports"])]
+                result = job_runner.trial_result(
+                    current["param"], reports, current["start_time"])
+            tell(state, current["trial"], result)
+
+            job_runner.save_trials(state["trials"], state["hyper_choices"])
+            if is_best_trial(state["trials"]):
+                job_runner.copy_best()
+            if self.metrics is not None:
+                self.metrics.trial_finished(
+                    time.time() - current["start_time"])
+                self.metrics.maybe_write()
+            progress.update()
+
+        def on_done(i_job, report, error):
+            # A trial is finished when all of its jobs are, even if one of
+            # them failed: the other jobs still write to the result files of
+            # the job runner, which the next trial reuses.
+            current = job_trials[i_job]
+            if error is not None:
+                logging.error(f"Trial failed: {error}")
+                current["error"] = error
+            else:
+                current["reports"][i_job] = report
+            current["n_left"] -= 1
+            if current["n_left"]:
+                return []
+            finish_trial(current)
+            return start_trial(current["runner_idx"])
+
+        jobs = []
+        for runner_idx in range(n_runners):
+            jobs.extend(start_trial(runner_idx))
+        if len(jobs):
+            self.executor(jobs, self, stop_workers=False,
+                          server_job=self.server_job, on_done=on_done)
+        progress.close()
+
+        if self.metrics is not None:
+            self.metrics.write()
+        for job_runner in self.job_runners:
+            if job_runner.scratch is not None:
+                job_runner.scratch.flush()
+            if job_runner.profiler is not None:
+                write_profile_summary(
+                    job_runner.profiler.profile_dir,
+                    os.path.join(job_runner.trials_dir, "profile_summary.txt"))
+
+
+def ask(state, seed):
+    """Let the algorithm suggest a new trial, without evaluating it.
+
+    Returns the trial document and the parameters for the objective.
+    """
+    trials = state["trials"]
+    new_ids = trials.new_trial_ids(1)
+    trials.refresh()
+    trials.insert_trial_docs(
+        state["algo"](new_ids, state["domain"], trials, seed))
+    trials.refresh()
+
+    trial = trials._dynamic_trials[-1]
+    trial["state"] = JOB_STATE_RUNNING
+    trial["book_time"] = coarse_utcnow()
+    trial["refresh_time"] = trial["book_time"]
+    vals = {key: val[0] for key, val in trial["misc"]["vals"].items()
+            if len(val)}
+    return trial, space_eval(state["hyper_space"], vals)
+
+
+def tell(state, trial, result):
+    """Store the result of a trial that was created with ask."""
+    trial["state"] = JOB_STATE_DONE
+    trial["result"] = result
+    trial["refresh_time"] = coarse_utcnow()
+    state["trials"].refresh()
+
+
+def parse_names(names):
+    """Split a comma separated list of model names."""
+    return [name for name in names.split(",") if len(name)]
@@ -0,0 +1,183 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generate synthetic labelled datasets for scaling tests.
+
+Texts are sampled from a Zipf-distributed vocabulary. Included records
+have part of their words replaced by a small set of topic words, so that
+models can (partially) separate them from the excluded records.
+
+Usage:
+
+    python -m asreviewcontrib.hyperopt.synthetic data/synth_100k.csv \
+        --n_records 100000 --prevalence 0.01
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_labels(n_records, prevalence=0.02, seed=0):
+    """Labels with a fixed number of inclusions (at least 2)."""
+    random_state = np.random.RandomState(seed)
+    n_included = min(n_records - 1,
+                     max(2, int(round(prevalence*n_records))))
+    labels = np.zeros(n_records, dtype=int)
+    labels[random_state.choice(n_records, n_included, replace=False)] = 1
+    return labels
+
+
+def make_vocabulary(n_vocab, seed=0):
+    """Pseudo words of 3 to 10 lowercase letters."""
+    random_state = np.random.RandomState(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    vocab = set()
+    while len(vocab) < n_vocab:
+        length = random_state.randint(3, 11)
+        vocab.add("".join(random_state.choice(letters, length)))
+    return np.array(sorted(vocab))
+
+
+def generate_texts(labels, vocab, topic_idx, n_words=100, n_title_words=10,
+                   zipf_exponent=1.0, topic_fraction=0.1, random_state=None):
+    """Generate titles and abstracts for the given labels.
+
+    Arguments
+    ---------
+    labels: np.array
+        Inclusion labels (0/1) of the records.
+    vocab: np.array
+        Words to sample from, the first ones being the most frequent.
+    topic_idx: np.array
+        Indices of the topic words, used more often by included records.
+    n_words: int
+        Average number of words per record (title and abstract).
+    n_title_words: int
+        Number of words of each record that make up the title.
+    zipf_exponent: float
+        Exponent of the word frequency distribution.
+    topic_fraction: float
+        Fraction of the words of included records that are topic words.
+    random_state: np.random.RandomState
+        Random number generator to use.
+    """
+    if random_state is None:
+        random_state = np.random.RandomState()
+    word_prob = 1/np.arange(1, len(vocab)+1)**zipf_exponent
+    word_prob /= word_prob.sum()
+
+    lengths = np.maximum(n_title_words + 1,
+                         random_state.poisson(n_words, size=len(labels)))
+    word_idx = random_state.choice(len(vocab), lengths.sum(), p=word_prob)
+    is_topic = (np.repeat(labels, lengths) == 1) & \
+        (random_state.rand(lengths.sum()) < topic_fraction)
+    word_idx[is_topic] = random_state.choice(topic_idx, is_topic.sum())
+    words = vocab[word_idx]
+
+    titles = []
+    abstracts = []
+    start = 0
+    for length in lengths:
+        titles.append(" ".join(words[start:start+n_title_words]))
+        abstracts.append(" ".join(words[start+n_title_words:start+length]))
+        start += length
+    return titles, abstracts
+
+
+def write_synthetic_csv(fp, n_records=1000, prevalence=0.02, n_words=100,
+                        n_vocab=10000, n_topic_words=50, chunk_size=10000,
+                        seed=0, **kwargs):
+    """Write an ASReview compatible labelled dataset to a CSV file.
+
+    Records are generated in chunks, so that datasets with millions of
+    records can be created with limited memory. Other keyword arguments
+    are passed to generate_texts.
+    """
+    random_state = np.random.RandomState(seed)
+    labels = synthetic_labels(n_records, prevalence, seed=seed)
+    vocab = make_vocabulary(n_vocab, seed=seed)
+    topic_idx = random_state.choice(n_vocab, min(n_topic_words, n_vocab),
+                                    replace=False)
+
+    for i_chunk, start in enumerate(range(0, n_records, chunk_size)):
+        chunk_labels = labels[start:start+chunk_size]
+        titles, abstracts = generate_texts(
+            chunk_labels, vocab, topic_idx, n_words=n_words,
+            random_state=random_state, **kwargs)
+        pd.DataFrame({
+            "record_id": np.arange(start, start+len(chunk_labels)),
+            "title": titles,
+            "abstract": abstracts,
+            "label_included": chunk_labels,
+        }).to_csv(fp, index=False, mode="w" if i_chunk == 0 else "a",
+                  header=i_chunk == 0)
+    return labels
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="synthetic")
+    parser.add_argument(
+        "output",
+        type=str,
+        help="CSV file to write the dataset to."
+    )
+    parser.add_argument(
+        "-n", "--n_records",
+        type=int,
+        default=1000,
+        help="Number of records."
+    )
+    parser.add_argument(
+        "-p", "--prevalence",
+        type=float,
+        default=0.02,
+        help="Fraction of included records."
+    )
+    parser.add_argument(
+        "--n_words",
+        type=int,
+        default=100,
+        help="Average number of words per record."
+    )
+    parser.add_argument(
+        "--n_vocab",
+        type=int,
+        default=10000,
+        help="Size of the vocabulary."
+    )
+    parser.add_argument(
+        "--n_topic_words",
+        type=int,
+        default=50,
+        help="Number of words that are more common in included records."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the random number generator."
+    )
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = vars(_parse_arguments().parse_args(argv))
+    write_synthetic_csv(args.pop("output"), **args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from itertools import count
+import threading
+import traceback
+
+from asreviewcontrib.hyperopt.serial_executor import serial_executor
+from asreviewcontrib.hyperopt.timing import mark_job_thread
+
+
+# Job runners for which the fall back to serial execution was reported.
+_serial_runners = set()
+
+
+def thread_executor(jobs, job_runner, stop_workers=False, server_job=True,
+                    n_threads=None, on_done=None):
+    """Compute the jobs in a pool of threads of the current process.
+
+    The threads share the caches of the job runner (datasets, feature
+    matrices and pretrained models), and run in parallel in the parts of
+    the jobs that release the GIL, such as sparse matrix products, BLAS and
+    most sklearn fitting code. Jobs that seed the global random state are
+    computed one by one instead (see random_state.py). See serial_executor
+    for on_done.
+    """
+    if job_runner.uses_global_random_state():
+        if id(job_runner) not in _serial_runners:
+            print("The jobs use the global random state of NumPy; they are "
+                  "computed one at a time.")
+            _serial_runners.add(id(job_runner))
+        return serial_executor(jobs, job_runner, stop_workers=stop_workers,
+                               server_job=server_job, on_done=on_done)
+
+    metrics = job_runner.metrics
+    metrics_lock = threading.Lock()
+    thread_state = threading.local()
+    worker_ids = count()
+    jobs = list(jobs)
+    n_waiting = len(jobs)
+
+    def init_worker():
+        thread_state.worker = next(worker_ids)
+        mark_job_thread()
+
+    def run_job(job):
+        nonlocal n_waiting
+        if metrics is not None:
+            with metrics_lock:
+                n_waiting -= 1
+                metrics.set_queue_depth(n_waiting)
+                metrics.job_started(thread_state.worker)
+        success = False
+        try:
+            report = job_runner.execute_job(**job)
+            success = True
+            return report
+        finally:
+            if metrics is not None:
+                with metrics_lock:
+                    metrics.job_finished(thread_state.worker, success)
+                    metrics.maybe_write()
+
+    with ThreadPoolExecutor(max_workers=n_threads,
+                            initializer=init_worker) as pool:
+        if on_done is None:
+            return list(pool.map(run_job, jobs))
+
+        reports = [None]*len(jobs)
+        futures = {pool.submit(run_job, job): i_job
+                   for i_job, job in enumerate(jobs)}
+        while len(futures):
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                i_job = futures.pop(future)
+                exc = future.exception()
+                error = None
+                if exc is None:
+                    reports[i_job] = future.result()
+                else:
+                    error = "".join(traceback.format_exception(
+                        type(exc), exc, exc.__traceback__))
+                for job in on_done(i_job, reports[i_job], error):
+                    with metrics_lock:
+                        n_waiting += 1
+                    jobs.append(job)
+                    reports.append(None)
+                    futures[pool.submit(run_job, job)] = len(jobs) - 1
+        return reports
@@ -0,0 +1,122 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Threads that compute jobs next to other job threads of the same process.
+_job_threads = threading.local()
+
+
+def mark_job_thread():
+    """Mark the current thread as one of several threads computing jobs.
+
+    The peak memory is a property of the process, so it is not reported for
+    the jobs of these threads.
+    """
+    _job_threads.shared = True
+
+
+class PhaseTimer():
+    """Measure the time spent in the different phases of a job.
+
+    Usage:
+
+        timer = PhaseTimer()
+        with timer.phase("fit"):
+            model.fit(X, y)
+        return timer.report()
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._shared = getattr(_job_threads, "shared", False)
+        self._peak_reset = not self._shared and reset_peak_memory()
+
+    @contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + \
+                time.perf_counter() - start_time
+
+    def report(self):
+        if self._shared:
+            return {"timings": dict(self.timings), "peak_memory": None}
+        return {"timings": dict(self.timings),
+                "peak_memory": peak_memory(self._peak_reset)}
+
+
+def reset_peak_memory():
+    """Reset the peak resident memory of the current process.
+
+    This is only possible on Linux. Returns False if it failed.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory(since_reset=False):
+    """Peak resident memory of the current process in MB.
+
+    If since_reset, this is the peak since the last reset_peak_memory(),
+    otherwise over the lifetime of the process. Returns None on platforms
+    without the resource module.
+    """
+    if since_reset:
+        with open("/proc/self/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])/2**10
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    if sys.platform == "darwin":
+        return max_rss/2**20
+    return max_rss/2**10
+
+
+def merge_reports(reports):
+    """Combine the reports of all jobs of a trial.
+
+    Timings are summed over jobs, the peak memory is the maximum over
+    the processes that ran them.
+    """
+    timings = {}
+    peak_memories = []
+    for report in reports:
+        if report is None:
+            continue
+        for name, value in report.get("timings", {}).items():
+            timings[name] = timings.get(name, 0.0) + value
+        if report.get("peak_memory") is not None:
+            peak_memories.append(report["peak_memory"])
+    return {
+        "timings": timings,
+        "peak_memory": max(peak_memories) if peak_memories else None,
+    }
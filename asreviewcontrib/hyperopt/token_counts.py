@@ -0,0 +1,104 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Derive TF-IDF feature matrices from cached token counts.
+
+Tokenizing the texts is the most expensive part of the TF-IDF feature
+extraction, and it does not depend on the hyper parameters. The n-gram
+counts of a dataset are computed once, for the largest n-gram range that
+was requested so far. The counts for a smaller n-gram range are a subset of
+the columns, since the vocabulary is sorted and contains all shorter
+n-grams. The TF-IDF matrix is then computed from these counts, which gives
+exactly the same result as fitting the asreview Tfidf model on the texts.
+"""
+
+import numpy as np
+from scipy.sparse import hstack
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.pipeline import Pipeline
+
+
+def supports_token_counts(feature_model):
+    """Check whether a feature model is a plain count + TF-IDF pipeline.
+
+    Other models, or versions of asreview that use other settings for the
+    vectorizer, are computed from the texts.
+    """
+    model = getattr(feature_model, "_model", None)
+    if not isinstance(model, Pipeline) or len(model.steps) != 2:
+        return False
+    vectorizer, transformer = [step for _, step in model.steps]
+    if (type(vectorizer) is not CountVectorizer
+            or type(transformer) is not TfidfTransformer):
+        return False
+    default_vectorizer = CountVectorizer(ngram_range=vectorizer.ngram_range)
+    return (vectorizer.ngram_range[0] == 1
+            and vectorizer.get_params() == default_vectorizer.get_params()
+            and transformer.get_params() == TfidfTransformer().get_params())
+
+
+class TokenCounts():
+    """N-gram counts of the texts of a dataset.
+
+    Arguments
+    ---------
+    texts: np.array
+        Texts (title and abstract) of the records.
+    title: np.array
+        Titles of the records.
+    abstract: np.array
+        Abstracts of the records.
+    ngram_max: int
+        Maximum length of the n-grams to count.
+    """
+
+    def __init__(self, texts, title, abstract, ngram_max=1):
+        self.title = title
+        self.abstract = abstract
+        self.ngram_max = ngram_max
+        self._vectorizer = CountVectorizer(ngram_range=(1, ngram_max))
+        self.counts = {"texts": self._vectorizer.fit_transform(texts)}
+
+        self.ngram_len = np.zeros(len(self._vectorizer.vocabulary_),
+                                  dtype=int)
+        for ngram, idx in self._vectorizer.vocabulary_.items():
+            self.ngram_len[idx] = ngram.count(" ") + 1
+
+    def get_counts(self, name, columns):
+        # Titles and abstracts are only counted if they are needed.
+        if name not in self.counts:
+            self.counts[name] = self._vectorizer.transform(
+                getattr(self, name))
+        counts = self.counts[name]
+        if columns is None:
+            return counts
+        return counts[:, columns]
+
+    def tfidf(self, ngram_max=1, split_ta=0):
+        """Same as fit_transform of the asreview Tfidf feature model."""
+        if ngram_max > self.ngram_max:
+            raise ValueError(f"Counts are available up to {self.ngram_max}"
+                             f"-grams, not {ngram_max}-grams.")
+        columns = None
+        if ngram_max < self.ngram_max:
+            columns = np.where(self.ngram_len <= ngram_max)[0]
+
+        tfidf = TfidfTransformer().fit(self.get_counts("texts", columns))
+        if split_ta > 0:
+            return hstack([
+                tfidf.transform(self.get_counts("title", columns)),
+                tfidf.transform(self.get_counts("abstract", columns)),
+            ]).tocsr()
+        return tfidf.transform(self.get_counts("texts", columns)).tocsr()
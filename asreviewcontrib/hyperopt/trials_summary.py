@@ -0,0 +1,184 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Columnar summary of a trials file.
+
+Unpickling a trials file with thousands of trials is slow, since it
+restores the complete hyperopt Trials object. Next to each trials file, a
+numpy .npz file is stored with one array per column: the loss, the
+(decoded) hyper parameters and the timings of each trial. Arrays in .npz
+files are only read when accessed, so show and create-config read just the
+columns they need.
+"""
+
+import json
+from numbers import Number
+import os
+from os.path import getmtime, splitext
+import pickle
+
+import numpy as np
+
+
+INFO_KEY = "__info__"
+
+
+def summary_fp_from_trials(trials_fp):
+    return splitext(trials_fp)[0] + "_summary.npz"
+
+
+def get_timings(trials):
+    """Time per phase (summed over jobs) and peak memory of each trial."""
+    results = [trial["result"] for trial in trials.trials]
+    phases = sorted(set(
+        phase for result in results for phase in result.get("timings", {})))
+
+    timings = {}
+    for phase in phases:
+        timings[f"time_{phase}"] = [
+            result.get("timings", {}).get(phase, np.nan)
+            for result in results]
+    timings["peak_memory"] = [
+        np.nan if result.get("peak_memory") is None
+        else result["peak_memory"] for result in results]
+    return timings
+
+
+def _to_array(values):
+    """Convert a column to the most specific numpy type.
+
+    Numeric columns become integer arrays if all values are whole numbers,
+    otherwise float arrays, with nan for missing values. Other columns are
+    stored as strings.
+    """
+    present = [val for val in values if val is not None]
+    if len(present) == len(values) and all(
+            isinstance(val, (bool, np.bool_)) for val in present):
+        return np.array(values, dtype=bool)
+    if all(isinstance(val, Number) for val in present):
+        arr = np.array([np.nan if val is None else val for val in values],
+                       dtype=float)
+        if (len(present) == len(values) and np.all(np.isfinite(arr))
+                and np.all(arr == np.round(arr))):
+            return arr.astype(np.int64)
+        return arr
+    return np.array(["" if val is None else str(val) for val in values])
+
+
+def trials_to_columns(trials_data):
+    """Create the summary columns from the contents of a trials file."""
+    trials = trials_data["trials"]
+    hyper_choices = trials_data["hyper_choices"]
+
+    param_names = sorted(set(
+        key for trial in trials.trials for key in trial["misc"]["vals"]))
+    columns = {}
+    for key in param_names:
+        values = []
+        for trial in trials.trials:
+            val = trial["misc"]["vals"].get(key, [])
+            if not len(val):
+                values.append(None)
+            elif key in hyper_choices:
+                values.append(hyper_choices[key][val[0]])
+            else:
+                values.append(val[0])
+        columns[key] = _to_array(values)
+
+    # Failed trials have no loss.
+    columns["loss"] = np.array(
+        [np.nan if loss is None else loss for loss in trials.losses()],
+        dtype=float)
+
+    value_names = param_names + ["loss"]
+    # Fraction of the records the loss was computed on (see fidelity.py).
+    if any("fidelity" in trial["result"] for trial in trials.trials):
+        columns["fidelity"] = np.array(
+            [trial["result"].get("fidelity", np.nan)
+             for trial in trials.trials], dtype=float)
+        value_names.append("fidelity")
+
+    timings = get_timings(trials)
+    for key, values in timings.items():
+        columns[key] = np.array(values, dtype=float)
+
+    info = {key: value for key, value in trials_data.items()
+            if isinstance(value, str)}
+    info["values"] = value_names
+    info["timings"] = list(timings)
+    columns[INFO_KEY] = np.array(json.dumps(info))
+    return columns
+
+
+def write_trials_summary(trials_fp, trials_data):
+    """Write the summary of a trials file, replacing it atomically."""
+    summary_fp = summary_fp_from_trials(trials_fp)
+    tmp_fp = summary_fp + ".tmp"
+    with open(tmp_fp, "wb") as fp:
+        np.savez(fp, **trials_to_columns(trials_data))
+    os.replace(tmp_fp, summary_fp)
+
+
+def load_trials_summary(trials_fp, timings=False):
+    """Load the loss and hyper parameters (and optionally timings).
+
+    The summary is (re)created from the trials file if it is missing or
+    older than the trials file.
+
+    Returns
+    -------
+    dict:
+        Dictionary with the settings of the run (e.g. model_name), and
+        "values" (and "timings"): dictionaries of column name -> array.
+    """
+    summary_fp = summary_fp_from_trials(trials_fp)
+    try:
+        is_stale = getmtime(summary_fp) < getmtime(trials_fp)
+    except FileNotFoundError:
+        is_stale = True
+
+    if is_stale:
+        with open(trials_fp, "rb") as fp:
+            trials_data = pickle.load(fp)
+        try:
+            write_trials_summary(trials_fp, trials_data)
+        except OSError:
+            # Read-only output directory: use the summary from memory.
+            columns = trials_to_columns(trials_data)
+            return _select_columns(columns, timings)
+
+    with np.load(summary_fp) as columns:
+        return _select_columns(columns, timings)
+
+
+def _select_columns(columns, timings):
+    info = json.loads(str(columns[INFO_KEY]))
+    summary = {key: value for key, value in info.items()
+               if key not in ["values", "timings"]}
+    summary["values"] = {key: columns[key] for key in info["values"]}
+    if timings:
+        summary["timings"] = {key: columns[key] for key in info["timings"]}
+    return summary
+
+
+def top_k(loss, k=None):
+    """Indices of the k trials with the lowest loss, sorted by loss.
+
+    Failed trials (nan) come last. If k is None, all trials are returned.
+    """
+    loss = np.where(np.isnan(loss), np.inf, loss)
+    if k is None or k >= len(loss):
+        return np.argsort(loss, kind="stable")
+    idx = np.argpartition(loss, k)[:k]
+    return idx[np.argsort(loss[idx], kind="stable")]
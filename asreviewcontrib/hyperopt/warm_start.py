@@ -0,0 +1,155 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Start an optimization from the best configurations of other runs.
+
+The best configurations of related trials files (e.g. with a different set
+of datasets) are the first trials of the new optimization. They are
+evaluated again on the current datasets, after which TPE continues from
+these configurations instead of from random search.
+"""
+
+import logging
+import pickle
+
+from hyperopt import STATUS_OK
+from hyperopt.base import miscs_update_idxs_vals
+
+from asreviewcontrib.hyperopt.job_utils import canonical_param
+
+
+class WarmStart():
+    """Seed new trials with the best configurations from trials files.
+
+    Arguments
+    ---------
+    trials_fps: list
+        Trials files to take the configurations from.
+    n_points: int
+        Maximum number of configurations to take.
+    """
+
+    def __init__(self, trials_fps, n_points=10):
+        self.trials_fps = trials_fps
+        self.n_points = n_points
+
+    def wrap_algo(self, algo, trials, hyper_choices):
+        """Wrap a suggest algorithm to propose the warm start points first.
+
+        Points are only added to optimizations that have not started yet (or
+        that have only evaluated warm start points), so that resuming a run
+        does not add them again.
+        """
+        n_warm = count_warm_start(trials)
+        if len(trials.trials) > n_warm:
+            return algo if n_warm == 0 else WarmStartSuggest(algo, [], n_warm)
+        points = load_best_points(self.trials_fps, hyper_choices,
+                                  self.n_points)
+        if not len(points):
+            logging.warning("No configurations found to warm start from.")
+            return algo
+        return WarmStartSuggest(algo, points[n_warm:], len(points))
+
+
+class WarmStartSuggest():
+    """Suggest the warm start points, then continue with the algorithm.
+
+    With warm start points, the algorithm (TPE) uses its model after
+    n_startup_jobs trials, instead of first doing 20 random trials.
+    """
+
+    def __init__(self, algo, points, n_startup_jobs):
+        self.algo = algo
+        self.points = list(points)
+        self.n_startup_jobs = n_startup_jobs
+
+    def __call__(self, new_ids, domain, trials, seed):
+        while len(self.points):
+            point = self.points.pop(0)
+            if set(point) == set(domain.params):
+                return new_trial_docs(new_ids[:1], domain, trials, point)
+        return self.algo(new_ids, domain, trials, seed,
+                         n_startup_jobs=self.n_startup_jobs)
+
+
+def new_trial_docs(new_ids, domain, trials, point):
+    """Trial documents for a given point (label -> value/choice index)."""
+    new_misc = dict(tid=new_ids[0], cmd=domain.cmd, workdir=domain.workdir,
+                    warm_start=True)
+    miscs_update_idxs_vals(
+        [new_misc], {label: [new_ids[0]] for label in point},
+        {label: [value] for label, value in point.items()})
+    return trials.new_trial_docs(new_ids[:1], [None], [domain.new_result()],
+                                 [new_misc])
+
+
+def count_warm_start(trials):
+    return sum(trial["misc"].get("warm_start", False)
+               for trial in trials.trials)
+
+
+def load_best_points(trials_fps, hyper_choices, n_points):
+    """Best configurations over a number of trials files.
+
+    Choices are stored as indices; they are converted to the indices of the
+    current hyper parameter space. Duplicate configurations are removed.
+
+    Returns
+    -------
+    list:
+        Points (dictionaries label -> value), sorted by loss.
+    """
+    candidates = []
+    for trials_fp in trials_fps:
+        with open(trials_fp, "rb") as fp:
+            trials_data = pickle.load(fp)
+        old_choices = trials_data["hyper_choices"]
+        for trial in trials_data["trials"].trials:
+            result = trial["result"]
+            if result.get("status") != STATUS_OK:
+                continue
+            point = _convert_point(trial["misc"]["vals"], old_choices,
+                                   hyper_choices)
+            if point is not None:
+                candidates.append((result["loss"], point))
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    points = []
+    seen = set()
+    for _, point in candidates:
+        key = canonical_param(point)
+        if key in seen:
+            continue
+        seen.add(key)
+        points.append(point)
+        if len(points) >= n_points:
+            break
+    return points
+
+
+def _convert_point(vals, old_choices, hyper_choices):
+    point = {}
+    for label, value in vals.items():
+        if not len(value):
+            continue
+        value = value[0]
+        if label in old_choices:
+            value = old_choices[label][value]
+        if label in hyper_choices:
+            try:
+                value = hyper_choices[label].index(value)
+            except ValueError:
+                return None
+        point[label] = value
+    return point
@@ -0,0 +1,81 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput of the executors, with jobs of a fixed amount of work.
+
+The MPI executor is only benchmarked when the benchmarks are started with
+more than one MPI process, e.g. mpirun -n 4 python run_benchmarks.py.
+"""
+
+import numpy as np
+
+from asreviewcontrib.hyperopt.serial_executor import serial_executor
+from asreviewcontrib.hyperopt.timing import PhaseTimer
+
+from benchmark import benchmark
+
+
+class DummyJobRunner():
+    """Job runner that multiplies matrices instead of fitting models."""
+
+    metrics = None
+
+    def __init__(self, n_dim=200):
+        self.data_names = ["dummy"]
+        self.n_dim = n_dim
+
+    def execute_job(self, param, data_name, i_run):
+        timer = PhaseTimer()
+        with timer.phase("compute"):
+            np.random.seed(i_run)
+            X = np.random.rand(self.n_dim, self.n_dim)
+            for _ in range(10):
+                X = X.dot(X)/self.n_dim
+        return timer.report()
+
+
+def create_jobs(n_jobs):
+    return [{"param": {}, "data_name": "dummy", "i_run": i_run}
+            for i_run in range(n_jobs)]
+
+
+def get_mpi_size():
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        return 1
+    return MPI.COMM_WORLD.Get_size()
+
+
+@benchmark("executor.serial", sizes=[16, 64])
+def bench_serial(size, tmp_dir):
+    job_runner = DummyJobRunner()
+    return lambda: serial_executor(create_jobs(size), job_runner), size
+
+
+if get_mpi_size() > 1:
+    from asreviewcontrib.hyperopt.mpi_executor import mpi_executor
+
+    @benchmark("executor.mpi", sizes=[16, 64])
+    def bench_mpi(size, tmp_dir):
+        job_runner = DummyJobRunner()
+        return (lambda: mpi_executor(create_jobs(size), job_runner,
+                                     stop_workers=False), size)
+
+    @benchmark("executor.mpi_server_job", sizes=[16, 64])
+    def bench_mpi_server(size, tmp_dir):
+        job_runner = DummyJobRunner()
+        return (lambda: mpi_executor(create_jobs(size), job_runner,
+                                     stop_workers=False, server_job=True),
+                size)
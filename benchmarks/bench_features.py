@@ -0,0 +1,64 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""TF-IDF features from the texts and from cached token counts."""
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.pipeline import Pipeline
+
+from asreviewcontrib.hyperopt.synthetic import generate_texts
+from asreviewcontrib.hyperopt.synthetic import make_vocabulary
+from asreviewcontrib.hyperopt.synthetic import synthetic_labels
+from asreviewcontrib.hyperopt.token_counts import TokenCounts
+
+from benchmark import benchmark
+
+
+NGRAM_MAX = [1, 2, 3]
+
+
+def _texts(size):
+    labels = synthetic_labels(size)
+    vocab = make_vocabulary(10000)
+    titles, abstracts = generate_texts(
+        labels, vocab, np.arange(50), n_words=50,
+        random_state=np.random.RandomState(0))
+    return np.array([title + " " + abstract
+                     for title, abstract in zip(titles, abstracts)])
+
+
+@benchmark("features.tfidf_texts", sizes=[1000, 10000, 100000], repeat=1)
+def bench_tfidf_texts(size, tmp_dir):
+    texts = _texts(size)
+
+    def run():
+        for ngram_max in NGRAM_MAX:
+            Pipeline([
+                ("vect", CountVectorizer(ngram_range=(1, ngram_max))),
+                ("tfidf", TfidfTransformer())]).fit(texts).transform(texts)
+    return run, size*len(NGRAM_MAX)
+
+
+@benchmark("features.tfidf_token_counts", sizes=[1000, 10000, 100000],
+           repeat=1)
+def bench_tfidf_token_counts(size, tmp_dir):
+    texts = _texts(size)
+    token_counts = TokenCounts(texts, None, None, max(NGRAM_MAX))
+
+    def run():
+        for ngram_max in NGRAM_MAX:
+            token_counts.tfidf(ngram_max)
+    return run, size*len(NGRAM_MAX)
@@ -0,0 +1,57 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import numpy as np
+
+from asreviewcontrib.hyperopt import cluster_job
+from asreviewcontrib.hyperopt import passive_job
+from asreviewcontrib.hyperopt.cluster_utils import normalized_cluster_score
+from asreviewcontrib.hyperopt.synthetic import synthetic_labels
+
+from benchmark import benchmark
+from data import write_cluster_results
+from data import write_passive_results
+
+
+@benchmark("passive.loss_from_files", sizes=[1000, 10000, 100000])
+def bench_passive_loss(size, tmp_dir):
+    labels = synthetic_labels(size)
+    res_files, label_fp = write_passive_results(
+        os.path.join(tmp_dir, "passive_loss"), labels, n_run=4)
+    return lambda: passive_job.loss_from_files(res_files, label_fp), 4*size
+
+
+@benchmark("cluster.loss_from_files", sizes=[1000, 5000], repeat=1)
+def bench_cluster_loss(size, tmp_dir):
+    labels = synthetic_labels(size)
+    res_files, label_fp = write_cluster_results(
+        os.path.join(tmp_dir, "cluster_loss"), labels, n_run=1,
+        n_cluster_run=2)
+    return lambda: cluster_job.loss_from_files(res_files, label_fp), 2*size
+
+
+@benchmark("cluster.normalized_cluster_score", sizes=[1000, 10000], repeat=1)
+def bench_cluster_score(size, tmp_dir):
+    labels = synthetic_labels(size)
+    np.random.seed(0)
+    prediction = np.random.randint(max(2, int(size/200)), size=size)
+    return lambda: normalized_cluster_score(prediction, labels), size
+
+
+@benchmark("passive.compute_train_idx", sizes=[1000, 100000, 1000000])
+def bench_train_idx(size, tmp_dir):
+    labels = synthetic_labels(size)
+    return lambda: passive_job.compute_train_idx(labels, 0), size
@@ -0,0 +1,102 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""One full objective call per job runner, on synthetic datasets."""
+
+import os
+
+import numpy as np
+from hyperopt.pyll.stochastic import sample
+
+from asreviewcontrib.hyperopt.active_job import ActiveJobRunner
+from asreviewcontrib.hyperopt.cluster_job import ClusterJobRunner
+from asreviewcontrib.hyperopt.passive_job import PassiveJobRunner
+from asreviewcontrib.hyperopt.synthetic import write_synthetic_csv
+
+from benchmark import benchmark
+
+
+def _to_builtin(value):
+    """Convert the 0-d arrays of a sampled configuration, as fmin does."""
+    if isinstance(value, dict):
+        return {key: _to_builtin(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_builtin(val) for val in value)
+    if isinstance(value, (np.ndarray, np.generic)) and np.ndim(value) == 0:
+        return value.item()
+    return value
+
+
+def _objective(job_runner):
+    hyper_space, _ = job_runner.get_hyper_space()
+    param = _to_builtin(sample(hyper_space, rng=np.random.RandomState(0)))
+    objective_func = job_runner.create_loss_function()
+
+    def run():
+        # Clear the memo, otherwise only the first call does any work.
+        job_runner._loss_memo.clear()
+        objective_func(param)
+    return run
+
+
+def _data_dir(tmp_dir, size):
+    data_dir = os.path.join(tmp_dir, f"data_{size}")
+    data_fp = os.path.join(data_dir, f"synthetic_{size}.csv")
+    if not os.path.isfile(data_fp):
+        os.makedirs(data_dir, exist_ok=True)
+        write_synthetic_csv(data_fp, size, n_words=50)
+    return data_dir, f"synthetic_{size}"
+
+
+@benchmark("passive.prewarm", sizes=[1000, 10000, 100000, 1000000],
+           repeat=1)
+def bench_prewarm(size, tmp_dir):
+    data_dir, data_name = _data_dir(tmp_dir, size)
+
+    def prewarm():
+        job_runner = PassiveJobRunner(
+            [data_name], "nb", "simple", "tfidf", n_run=2, data_dir=data_dir,
+            output_dir=os.path.join(tmp_dir, f"passive_{size}"))
+        job_runner.prewarm()
+    return prewarm, size
+
+
+@benchmark("passive.objective", sizes=[1000, 5000, 20000], repeat=1)
+def bench_passive(size, tmp_dir):
+    data_dir, data_name = _data_dir(tmp_dir, size)
+    job_runner = PassiveJobRunner(
+        [data_name], "nb", "simple", "tfidf", n_run=2, data_dir=data_dir,
+        output_dir=os.path.join(tmp_dir, f"passive_{size}"))
+    job_runner.prewarm()
+    return _objective(job_runner), 2*size
+
+
+@benchmark("active.objective", sizes=[1000, 5000], repeat=1)
+def bench_active(size, tmp_dir):
+    data_dir, data_name = _data_dir(tmp_dir, size)
+    job_runner = ActiveJobRunner(
+        [data_name], "nb", "max", "simple", "tfidf", n_run=2, n_papers=200,
+        data_dir=data_dir, output_dir=os.path.join(tmp_dir, f"active_{size}"))
+    job_runner.prewarm()
+    return _objective(job_runner), 2*size
+
+
+@benchmark("cluster.objective", sizes=[1000, 5000], repeat=1)
+def bench_cluster(size, tmp_dir):
+    data_dir, data_name = _data_dir(tmp_dir, size)
+    job_runner = ClusterJobRunner(
+        [data_name], "tfidf", n_cluster_run=2, data_dir=data_dir,
+        output_dir=os.path.join(tmp_dir, f"cluster_{size}"))
+    job_runner.prewarm()
+    return _objective(job_runner), 2*size
@@ -0,0 +1,75 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Active learning simulations of naive Bayes, run by run and in lock-step."""
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from asreviewcontrib.hyperopt.batch_simulate import BatchNaiveBayes
+from asreviewcontrib.hyperopt.batch_simulate import batch_simulate
+from asreviewcontrib.hyperopt.synthetic import generate_texts
+from asreviewcontrib.hyperopt.synthetic import make_vocabulary
+from asreviewcontrib.hyperopt.synthetic import synthetic_labels
+
+from benchmark import benchmark
+
+
+N_RUN = 8
+N_PAPERS = 502
+N_INSTANCES = 50
+
+
+def _dataset(size):
+    labels = synthetic_labels(size)
+    titles, abstracts = generate_texts(
+        labels, make_vocabulary(10000), np.arange(50), n_words=50,
+        random_state=np.random.RandomState(0))
+    texts = [title + " " + abstract
+             for title, abstract in zip(titles, abstracts)]
+    random_state = np.random.RandomState(0)
+    prior_idx = np.array([
+        [random_state.choice(np.where(labels == 1)[0]),
+         random_state.choice(np.where(labels == 0)[0])]
+        for _ in range(N_RUN)])
+    return TfidfVectorizer().fit_transform(texts), labels, prior_idx
+
+
+@benchmark("simulate.nb_run_by_run", sizes=[1000, 10000], repeat=1)
+def bench_nb_run_by_run(size, tmp_dir):
+    X, y, prior_idx = _dataset(size)
+
+    def run():
+        for i_run in range(N_RUN):
+            model = MultinomialNB()
+            train_idx = prior_idx[i_run]
+            while len(train_idx) < N_PAPERS:
+                model.fit(X[train_idx], y[train_idx])
+                proba = model.predict_proba(X)
+                pool_idx = np.delete(np.arange(X.shape[0]), train_idx)
+                query_idx = pool_idx[np.argsort(proba[pool_idx, 0])[
+                    :min(N_INSTANCES, N_PAPERS - len(train_idx))]]
+                train_idx = np.append(train_idx, query_idx)
+    return run, N_RUN
+
+
+@benchmark("simulate.nb_lock_step", sizes=[1000, 10000], repeat=1)
+def bench_nb_lock_step(size, tmp_dir):
+    X, y, prior_idx = _dataset(size)
+
+    def run():
+        batch_simulate(X, y, prior_idx, BatchNaiveBayes(),
+                       n_instances=N_INSTANCES, n_papers=N_PAPERS)
+    return run, N_RUN
@@ -0,0 +1,42 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+from benchmark import benchmark
+
+
+# Modules that are imported when the asreview CLI discovers the extension.
+STARTUP_MODULES = {
+    "package": "asreviewcontrib.hyperopt",
+    "hyper-active": "asreviewcontrib.hyperopt.active",
+    "hyper-passive": "asreviewcontrib.hyperopt.passive",
+    "hyper-cluster": "asreviewcontrib.hyperopt.cluster",
+    "show": "asreviewcontrib.hyperopt.show_trials",
+    "create-config": "asreviewcontrib.hyperopt.create_config",
+    "compare": "asreviewcontrib.hyperopt.compare_trials",
+}
+
+
+def import_in_subprocess(module_name):
+    subprocess.run([sys.executable, "-c", f"import {module_name}"],
+                   check=True)
+
+
+@benchmark("startup.import", sizes=list(STARTUP_MODULES), repeat=5)
+def bench_startup(size, tmp_dir):
+    """Time of a fresh interpreter that imports an entry point."""
+    module_name = STARTUP_MODULES[size]
+    return lambda: import_in_subprocess(module_name), 1
@@ -0,0 +1,71 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+
+from hyperopt import STATUS_OK, Trials, fmin, hp, rand
+
+from asreviewcontrib.hyperopt.show_trials import load_trials
+from asreviewcontrib.hyperopt.trials_summary import load_trials_summary
+from asreviewcontrib.hyperopt.trials_summary import top_k
+from asreviewcontrib.hyperopt.trials_summary import write_trials_summary
+
+from benchmark import benchmark
+
+
+def write_trials(trials_fp, n_trials):
+    """Trials file with results of a typical size."""
+    def objective(param):
+        return {"loss": param["mdl_alpha"], "status": STATUS_OK,
+                "timings": {phase: 1.0 for phase in
+                            ["data", "features", "fit", "predict", "io"]},
+                "peak_memory": 100.0, "wall_time": 10.0}
+
+    hyper_space = {
+        "mdl_alpha": hp.loguniform("mdl_alpha", -5, 2),
+        "mdl_fit_prior": hp.choice("mdl_fit_prior", [True, False]),
+        "fex_ngram_max": hp.quniform("fex_ngram_max", 1, 3, 1),
+        "bal_a": hp.uniform("bal_a", 0, 10),
+    }
+    trials = Trials()
+    fmin(objective, hyper_space, algo=rand.suggest, max_evals=n_trials,
+         trials=trials, show_progressbar=False, return_argmin=False)
+    trials_data = {"trials": trials,
+                   "hyper_choices": {"mdl_fit_prior": [True, False]},
+                   "model_name": "nb"}
+    with open(trials_fp, "wb") as fp:
+        pickle.dump(trials_data, fp)
+    write_trials_summary(trials_fp, trials_data)
+
+
+@benchmark("trials.load_pickle", sizes=[1000, 5000])
+def bench_load_pickle(size, tmp_dir):
+    trials_fp = os.path.join(tmp_dir, f"trials_{size}.pkl")
+    if not os.path.isfile(trials_fp):
+        write_trials(trials_fp, size)
+    return lambda: load_trials(trials_fp), size
+
+
+@benchmark("trials.load_summary_top_k", sizes=[1000, 5000])
+def bench_load_summary(size, tmp_dir):
+    trials_fp = os.path.join(tmp_dir, f"trials_{size}.pkl")
+    if not os.path.isfile(trials_fp):
+        write_trials(trials_fp, size)
+
+    def load():
+        values = load_trials_summary(trials_fp)["values"]
+        idx = top_k(values["loss"], 10)
+        return {key: arr[idx] for key, arr in values.items()}
+    return load, size
@@ -0,0 +1,88 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal framework to register, run and compare benchmarks."""
+
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, sizes, repeat=3):
+    """Register a benchmark.
+
+    The decorated function is called as setup(size, tmp_dir), and should
+    return a tuple (func, n_items): the function to time, and the number of
+    items (records, jobs, ...) it processes, used to compute the throughput.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = {"setup": setup, "sizes": sizes, "repeat": repeat}
+        return setup
+    return decorator
+
+
+def measure(func, n_items, repeat=3):
+    """Time a function and measure its peak (Python/numpy) memory."""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time": float(np.median(times)),
+        "min_time": float(np.min(times)),
+        "throughput": n_items/float(np.median(times)),
+        "peak_memory_mb": peak/2**20,
+    }
+
+
+def save_results(results, fp):
+    with open(fp, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(fp):
+    with open(fp, "r") as f:
+        return json.load(f)
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """Compare results with a baseline.
+
+    Returns a list of (name, size, ratio, is_regression) tuples, where
+    ratio is the current time divided by the baseline time.
+    """
+    comparison = []
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            try:
+                base_time = baseline[name][size]["time"]
+            except KeyError:
+                continue
+            ratio = result["time"]/base_time
+            comparison.append((name, size, ratio, ratio > 1 + tolerance))
+    return comparison
@@ -0,0 +1,58 @@
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import numpy as np
+
+
+def write_passive_results(out_dir, labels, n_run):
+    """Write result files as created by PassiveJobRunner.execute."""
+    os.makedirs(out_dir, exist_ok=True)
+    label_fp = os.path.join(out_dir, "labels.json")
+    with open(label_fp, "w") as fp:
+        json.dump(labels.tolist(), fp)
+
+    res_files = []
+    for i_run in range(n_run):
+        np.random.seed(i_run)
+        train_idx = np.random.choice(
+            len(labels), int(0.75*len(labels)), replace=False)
+        res_fp = os.path.join(out_dir, f"results_{i_run}.json")
+        with open(res_fp, "w") as fp:
+            json.dump({"proba": np.random.rand(len(labels)).tolist(),
+                       "train_idx": train_idx.tolist()}, fp)
+        res_files.append(res_fp)
+    return res_files, label_fp
+
+
+def write_cluster_results(out_dir, labels, n_run, n_cluster_run):
+    """Write result files as created by ClusterJobRunner.execute."""
+    os.makedirs(out_dir, exist_ok=True)
+    label_fp = os.path.join(out_dir, "labels.json")
+    with open(label_fp, "w") as fp:
+        json.dump(labels.tolist(), fp)
+
+    n_clusters = max(2, int(len(labels)/200))
+    res_files = []
+    for i_run in range(n_run):
+        np.random.seed(i_run)
+        predictions = np.random.randint(
+            n_clusters, size=(n_cluster_run, len(labels)))
+        res_fp = os.path.join(out_dir, f"results_{i_run}.json")
+        with open(res_fp, "w") as fp:
+            json.dump({"predictions": predictions.tolist()}, fp)
+        res_files.append(res_fp)
+    return res_files, label_fp
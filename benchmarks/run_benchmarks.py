@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Copyright 2020 The ASReview Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Run the benchmarks and compare them with a baseline.
+
+Examples:
+
+    python benchmarks/run_benchmarks.py --save_baseline baseline.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+
+from benchmark import BENCHMARKS
+from benchmark import compare_results
+from benchmark import load_results
+from benchmark import measure
+from benchmark import save_results
+import bench_executors
+import bench_features  # noqa
+import bench_loss  # noqa
+import bench_runners  # noqa
+import bench_simulate  # noqa
+import bench_startup  # noqa
+import bench_trials  # noqa
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="run_benchmarks")
+    parser.add_argument(
+        "-k", "--filter",
+        type=str,
+        default=None,
+        help="Only run benchmarks that contain this string."
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Only run the smallest size of each benchmark."
+    )
+    parser.add_argument(
+        "-o", "--output",
+        type=str,
+        default=None,
+        help="Store the results in this JSON file."
+    )
+    parser.add_argument(
+        "--save_baseline",
+        type=str,
+        default=None,
+        help="Store the results as a new baseline in this JSON file."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Compare the results with this baseline, exit with an error on"
+        " regressions."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative slowdown that counts as a regression."
+    )
+    return parser
+
+
+def run_benchmarks(name_filter=None, quick=False):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, bench in sorted(BENCHMARKS.items()):
+            if name_filter is not None and name_filter not in name:
+                continue
+            sizes = bench["sizes"][:1] if quick else bench["sizes"]
+            results[name] = {}
+            for size in sizes:
+                func, n_items = bench["setup"](size, tmp_dir)
+                result = measure(func, n_items, repeat=bench["repeat"])
+                results[name][str(size)] = result
+                print(f"{name:40} {size:>8} {result['time']:10.4f}s "
+                      f"{result['throughput']:12.1f}/s "
+                      f"{result['peak_memory_mb']:10.1f}MB")
+    return results
+
+
+def main(argv=sys.argv[1:]):
+    logging.getLogger().setLevel(logging.ERROR)
+    args = _parse_arguments().parse_args(argv)
+
+    if bench_executors.get_mpi_size() > 1:
+        from mpi4py import MPI
+        from asreviewcontrib.hyperopt.mpi_executor import TAG_STOP
+        from asreviewcontrib.hyperopt.mpi_executor import mpi_worker
+        comm = MPI.COMM_WORLD
+        if comm.Get_rank() > 0:
+            mpi_worker(bench_executors.DummyJobRunner())
+            return 0
+        try:
+            results = run_benchmarks(args.filter, args.quick)
+        finally:
+            for pid in range(1, comm.Get_size()):
+                comm.send(None, dest=pid, tag=TAG_STOP)
+    else:
+        results = run_benchmarks(args.filter, args.quick)
+
+    if args.output is not None:
+        save_results(results, args.output)
+    if args.save_baseline is not None:
+        save_results(results, args.save_baseline)
+
+    if args.baseline is not None:
+        n_regression = 0
+        comparison = compare_results(
+            results, load_results(args.baseline), args.tolerance)
+        for name, size, ratio, is_regression in comparison:
+            flag = "REGRESSION" if is_regression else ""
+            print(f"{name:40} {size:>8} {ratio:8.2f}x {flag}")
+            n_regression += is_regression
+        if n_regression:
+            print(f"{n_regression} regression(s) found.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
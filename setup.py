@@ -56,11 +56,12 @@ setup(
 
     entry_points={
         "asreview.entry_points": [
-            "hyper-active = asreviewcontrib.hyperopt:HyperActiveEntryPoint",
-            "hyper-passive = asreviewcontrib.hyperopt:HyperPassiveEntryPoint",  #noqa
-            "hyper-cluster = asreviewcontrib.hyperopt:HyperClusterEntryPoint",  #noqa
-            "show = asreviewcontrib.hyperopt:ShowTrialsEntryPoint",
-            "create-config = asreviewcontrib.hyperopt:CreateConfigEntryPoint",  #noqa
+            "hyper-active = asreviewcontrib.hyperopt.active:HyperActiveEntryPoint",  #noqa
+            "hyper-passive = asreviewcontrib.hyperopt.passive:HyperPassiveEntryPoint",  #noqa
+            "hyper-cluster = asreviewcontrib.hyperopt.cluster:HyperClusterEntryPoint",  #noqa
+            "show = asreviewcontrib.hyperopt.show_trials:ShowTrialsEntryPoint",  #noqa
+            "create-config = asreviewcontrib.hyperopt.create_config:CreateConfigEntryPoint",  #noqa
+            "compare = asreviewcontrib.hyperopt.compare_trials:CompareTrialsEntryPoint",  #noqa
         ]
 
     },
@@ -15,7 +15,11 @@ def remove_dir(output_dir):
         join(output_dir, "best", "embase_labelled", "results_1.h5"),
         join(output_dir, "current", "embase_labelled", "results_0.h5"),
         join(output_dir, "current", "embase_labelled", "results_1.h5"),
-        join(output_dir, "trials.pkl")
+        join(output_dir, "best", "embase_labelled", "results_all_runs.npz"),
+        join(output_dir, "current", "embase_labelled",
+             "results_all_runs.npz"),
+        join(output_dir, "trials.pkl"),
+        join(output_dir, "trials_summary.npz"),
     ]
     dirs = [
         join(output_dir, "best", "embase_labelled"),
@@ -67,3 +71,29 @@ def test_active(request, model, feature_extraction, query_strategy,
     trial_vals = load_trials(join(output_dir, "trials.pkl"))["values"]
     assert np.all(np.array([len(x) for x in trial_vals.values()]) == 2)
     remove_dir(output_dir)
+
+
+@mark.parametrize("model", ["nb", "logistic"])
+def test_active_batch_runs(request, model):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), f"active_batch_{model}")
+    args = ["--model", model,
+            "--feature_extraction", "tfidf",
+            "--query_strategy", "max",
+            "--balance_strategy", "simple",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "2",
+            "--batch_runs",
+            ]
+    remove_dir(output_dir)
+    main(args)
+    trials = load_trials(join(output_dir, "trials.pkl"))
+    assert len(trials["values"]["loss"]) == 2
+    assert np.all(np.isfinite(trials["values"]["loss"]))
+    assert os.path.isfile(join(output_dir, "current", "embase_labelled",
+                               "results_all_runs.npz"))
+    remove_dir(output_dir)
@@ -0,0 +1,112 @@
+import os
+from os.path import join
+from pathlib import Path
+import shutil
+import time
+
+from hyperopt import hp, space_eval
+
+from asreviewcontrib.hyperopt.base_job import BaseJobRunner
+from asreviewcontrib.hyperopt.serial_executor import serial_executor
+
+
+class FakeRunner(BaseJobRunner):
+    """Job runner with a single parameter x and a loss of (x - 0.3)^2."""
+
+    def __init__(self, trials_dir, hyper_space=None, job_time=0.0):
+        self.trials_dir = trials_dir
+        self.trials_fp = join(trials_dir, "trials.pkl")
+        self.data_names = ["data_a", "data_b"]
+        self.executor = serial_executor
+        self.server_job = False
+        self.data_dir = trials_dir
+        self._cache = {data_name: {} for data_name in self.data_names}
+        self._loss_memo = {}
+        if hyper_space is None:
+            hyper_space = {"x": hp.uniform("x", 0, 1)}
+        self.hyper_space = hyper_space
+        self.job_time = job_time
+        self.n_jobs = 0
+
+    def create_jobs(self, param, data_names):
+        return [{"param": param, "data_name": data_name, "i_run": 0}
+                for data_name in data_names]
+
+    def execute(self, param, data_name, i_run):
+        self.n_jobs += 1
+        time.sleep(self.job_time)
+        data_dir = join(self.results_dir, "current", data_name)
+        os.makedirs(data_dir, exist_ok=True)
+        with open(join(data_dir, "x.txt"), "w") as fp:
+            fp.write(str(param["x"]))
+
+    def dataset_loss(self, data_name):
+        with open(join(self.results_dir, "current", data_name,
+                       "x.txt")) as fp:
+            return (float(fp.read()) - 0.3)**2
+
+    def get_hyper_space(self):
+        return self.hyper_space, {}
+
+
+def get_trials_dir(request, name):
+    trials_dir = join(str(Path(request.fspath.dirname, "temp")), name)
+    shutil.rmtree(trials_dir, ignore_errors=True)
+    return trials_dir
+
+
+def test_deadline(request):
+    runner = FakeRunner(get_trials_dir(request, "deadline"), job_time=0.1)
+    deadline = time.time() + 2
+    runner.hyper_optimize(deadline=deadline)
+    n_trials = len(runner.load_trials().trials)
+    assert n_trials >= 3
+    # Small margin for the variation in the trial durations.
+    assert time.time() < deadline + 0.1
+
+    # Time is reserved for the final flush of the result files.
+    shutil.rmtree(runner.trials_dir)
+    runner = FakeRunner(get_trials_dir(request, "deadline_flush"),
+                        job_time=0.1)
+    runner.estimate_flush_time = lambda: 1
+    deadline = time.time() + 2
+    runner.hyper_optimize(deadline=deadline)
+    assert len(runner.load_trials().trials) < n_trials
+    assert time.time() + 1 < deadline + 0.1
+    shutil.rmtree(runner.trials_dir)
+
+
+def test_deadline_passed(request):
+    # The deadline includes the time before the optimization starts.
+    runner = FakeRunner(get_trials_dir(request, "deadline_passed"))
+    runner.hyper_optimize(deadline=time.time() - 1)
+    assert runner.n_jobs == 0
+
+
+def test_loss_memo(request):
+    trials_dir = get_trials_dir(request, "loss_memo")
+    hyper_space = {"x": hp.choice("x", [0.1, 0.5])}
+    runner = FakeRunner(trials_dir, hyper_space)
+    runner.hyper_optimize(n_iter=8)
+    trials = runner.load_trials()
+    results = [trial["result"] for trial in trials.trials]
+
+    # Only the first trial of each configuration runs jobs.
+    n_config = len({trial["misc"]["vals"]["x"][0]
+                    for trial in trials.trials})
+    assert runner.n_jobs == 2*n_config
+    duplicates = [result for result in results if result["n_memo"] == 2]
+    assert len(duplicates) == 8 - n_config
+    for trial in trials.trials:
+        x = space_eval(hyper_space, {"x": trial["misc"]["vals"]["x"][0]})["x"]
+        assert abs(trial["result"]["loss"] - (x - 0.3)**2) < 1e-12
+
+    # The memo is stored in the trials file.
+    runner = FakeRunner(trials_dir, hyper_space)
+    runner.hyper_optimize(n_iter=4)
+    assert runner.n_jobs == 0
+    trials = runner.load_trials()
+    assert len(trials.trials) == 12
+    assert all(trial["result"]["n_memo"] == 2
+               for trial in trials.trials[8:])
+    shutil.rmtree(trials_dir)
@@ -0,0 +1,107 @@
+import numpy as np
+from pytest import mark
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+
+from asreviewcontrib.hyperopt.batch_simulate import avg_time_to_discovery
+from asreviewcontrib.hyperopt.batch_simulate import batch_simulate
+from asreviewcontrib.hyperopt.batch_simulate import get_batch_model
+from asreviewcontrib.hyperopt.batch_simulate import supports_batch_simulation
+from asreviewcontrib.hyperopt.synthetic import generate_texts
+from asreviewcontrib.hyperopt.synthetic import make_vocabulary
+from asreviewcontrib.hyperopt.synthetic import synthetic_labels
+
+
+def get_dataset(n_records=300):
+    labels = synthetic_labels(n_records, prevalence=0.05)
+    titles, abstracts = generate_texts(
+        labels, make_vocabulary(500), np.arange(20), n_words=30,
+        topic_fraction=0.05, random_state=np.random.RandomState(0))
+    texts = [title + " " + abstract
+             for title, abstract in zip(titles, abstracts)]
+    return TfidfVectorizer().fit_transform(texts), labels
+
+
+def simulate_run(X, y, prior_idx, model, n_instances, n_papers):
+    """One run of the asreview simulation (max query, simple balance)."""
+    train_idx = np.array(prior_idx)
+    while True:
+        model.fit(X[train_idx], y[train_idx])
+        proba = model.predict_proba(X)
+        pool_idx = np.delete(np.arange(X.shape[0]), train_idx)
+        n_query = min(n_instances, len(pool_idx), n_papers - len(train_idx))
+        query_idx = pool_idx[np.argsort(proba[pool_idx, 0])[:n_query]]
+        train_idx = np.append(train_idx, query_idx)
+        if len(train_idx) >= n_papers:
+            break
+    proba_order = pool_idx[np.argsort(-proba[pool_idx, 1])]
+    return train_idx, proba_order
+
+
+def reference_time_to_discovery(labels, label_orders, proba_orders,
+                                n_initial):
+    """Average time to discovery as computed by asreview's Analysis."""
+    time_results = {idx: [] for idx in np.where(labels == 1)[0]}
+    for i_file, (label_order, proba_order) in enumerate(
+            zip(label_orders, proba_orders)):
+        for i_time, idx in enumerate(label_order):
+            if labels[idx] == 1:
+                time_results[idx].append(i_time)
+        for i_time, idx in enumerate(proba_order):
+            if labels[idx] == 1 and len(time_results[idx]) <= i_file:
+                time_results[idx].append(i_time + len(label_order))
+        for idx in time_results:
+            if len(time_results[idx]) <= i_file:
+                time_results[idx].append(len(label_order) + len(proba_order))
+
+    results = {}
+    for idx, times in time_results.items():
+        trained_time = [time for time in times if time >= n_initial]
+        results[idx] = np.average(trained_time) if len(trained_time) else 0
+    return results
+
+
+@mark.parametrize("model_name", ["nb", "logistic"])
+def test_batch_simulate(model_name):
+    X, y = get_dataset()
+    n_run = 4
+    random_state = np.random.RandomState(0)
+    prior_idx = np.array([
+        [random_state.choice(np.where(y == 1)[0]),
+         random_state.choice(np.where(y == 0)[0])]
+        for _ in range(n_run)])
+
+    if model_name == "nb":
+        model_param = {"alpha": 2.0}
+        ref_model = MultinomialNB(alpha=2.0)
+    else:
+        model_param = {"C": 3.0, "class_weight": 2.0}
+        ref_model = LogisticRegression(
+            solver="liblinear", C=3.0, class_weight={0: 1.0, 1: 2.0})
+
+    label_order, proba_order = batch_simulate(
+        X, y, prior_idx, get_batch_model(model_name, **model_param),
+        n_instances=20, n_papers=150)
+    assert label_order.shape == (n_run, 150)
+    assert proba_order.shape == (n_run, X.shape[0] - 142)
+
+    for i_run in range(n_run):
+        ref_label_order, ref_proba_order = simulate_run(
+            X, y, prior_idx[i_run], ref_model, n_instances=20, n_papers=150)
+        assert np.array_equal(label_order[i_run], ref_label_order)
+        assert np.array_equal(proba_order[i_run], ref_proba_order)
+
+    results = avg_time_to_discovery(y, label_order, proba_order, 2)
+    ref_results = reference_time_to_discovery(y, label_order, proba_order, 2)
+    assert results.keys() == ref_results.keys()
+    for idx in results:
+        assert np.isclose(results[idx], ref_results[idx])
+
+
+def test_supports_batch_simulation():
+    assert supports_batch_simulation("nb", "max", "simple")
+    assert supports_batch_simulation("logistic", "max", "simple")
+    assert not supports_batch_simulation("svm", "max", "simple")
+    assert not supports_batch_simulation("nb", "max_random", "simple")
+    assert not supports_batch_simulation("nb", "max", "double")
@@ -17,7 +17,8 @@ def remove_dir(output_dir):
         join(output_dir, "current", "embase_labelled", "labels.json"),
         join(output_dir, "current", "embase_labelled", "results_0.json"),
         join(output_dir, "current", "embase_labelled", "results_1.json"),
-        join(output_dir, "trials.pkl")
+        join(output_dir, "trials.pkl"),
+        join(output_dir, "trials_summary.npz"),
     ]
     dirs = [
         join(output_dir, "best", "embase_labelled"),
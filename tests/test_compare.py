@@ -0,0 +1,56 @@
+import os
+from os.path import join
+import pickle
+from pathlib import Path
+import shutil
+
+from hyperopt import STATUS_OK, Trials, fmin, hp, rand
+
+from asreviewcontrib.hyperopt.compare_trials import INDEX_FILE
+from asreviewcontrib.hyperopt.compare_trials import best_per_dataset_set
+from asreviewcontrib.hyperopt.compare_trials import build_index
+
+
+def write_trials(trials_dir, model_name, datasets, offset):
+    trials = Trials()
+    fmin(lambda param: {"loss": param["mdl_alpha"] + offset,
+                        "status": STATUS_OK},
+         {"mdl_alpha": hp.uniform("mdl_alpha", 0, 1)}, algo=rand.suggest,
+         max_evals=5, trials=trials, show_progressbar=False,
+         return_argmin=False)
+    os.makedirs(trials_dir, exist_ok=True)
+    with open(join(trials_dir, "trials.pkl"), "wb") as fp:
+        pickle.dump({"trials": trials, "hyper_choices": {},
+                     "model_name": model_name, "feature_name": "tfidf",
+                     "datasets": datasets}, fp)
+
+
+def test_compare(request):
+    test_dir = request.fspath.dirname
+    output_dir = join(str(Path(test_dir, "temp")), "compare")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    write_trials(join(output_dir, "passive", "nb_tfidf", "ace_ptsd"),
+                 "nb", "ptsd,ace", 1)
+    write_trials(join(output_dir, "passive", "svm_tfidf", "ace_ptsd"),
+                 "svm", "ace,ptsd", 0)
+    write_trials(join(output_dir, "passive", "nb_tfidf", "ace"),
+                 "nb", "ace", 0)
+
+    index = build_index(output_dir, n_jobs=2)
+    assert os.path.isfile(join(output_dir, INDEX_FILE))
+    assert len(index) == 3
+    assert all(entry["n_evals"] == 5 for entry in index)
+
+    best = best_per_dataset_set(index)
+    assert [entry["datasets"] for entry in best] == ["ace", "ace,ptsd"]
+    assert best[1]["combination"] == "svm_tfidf"
+    assert best[1]["best_loss"] < 1
+    assert 0 <= best[1]["best_param"]["mdl_alpha"] < 1
+
+    # The second time, the index is read instead of the trials files.
+    os.remove(join(output_dir, "passive", "nb_tfidf", "ace",
+                   "trials_summary.npz"))
+    assert build_index(output_dir) == index
+    assert not os.path.isfile(join(output_dir, "passive", "nb_tfidf", "ace",
+                                   "trials_summary.npz"))
+    shutil.rmtree(output_dir)
@@ -0,0 +1,80 @@
+from itertools import cycle
+
+from hyperopt import JOB_STATE_DONE, STATUS_OK, hp, rand, tpe
+from hyperopt.base import Domain
+from hyperopt.fmin import generate_trials_to_calculate
+import numpy as np
+
+from asreviewcontrib.hyperopt.cost_aware import _get_history
+from asreviewcontrib.hyperopt.cost_aware import cost_aware_suggest
+from asreviewcontrib.hyperopt.cost_aware import expected_improvement
+
+
+HYPER_SPACE = {"x": hp.uniform("x", 0, 1)}
+
+
+def objective(param):
+    """Same losses around x=0.3 and x=0.7, but x > 0.5 is 100x slower."""
+    x = param["x"]
+    if x > 0.5:
+        return {"loss": (x - 0.7)**2, "status": STATUS_OK,
+                "wall_time": 100.0, "n_memo": 0}
+    return {"loss": (x - 0.3)**2, "status": STATUS_OK, "wall_time": 1.0,
+            "n_memo": 0}
+
+
+def create_trials(memo_points=[]):
+    """Evaluate a grid of points, and memo_points again from the memo."""
+    points = [round(0.05*i, 2) for i in range(1, 20) if i != 10]
+    points += memo_points
+    evaluated = set()
+    trials = generate_trials_to_calculate([{"x": x} for x in points])
+    for trial in trials._dynamic_trials:
+        x = trial["misc"]["vals"]["x"][0]
+        trial["result"] = objective({"x": x})
+        if x in evaluated:
+            trial["result"].update(wall_time=1e-4, n_memo=1)
+        evaluated.add(x)
+        trial["state"] = JOB_STATE_DONE
+    trials.refresh()
+    return trials
+
+
+def suggest_x(trials, monkeypatch):
+    """Let cost_aware_suggest choose between x=0.3 and x=0.7."""
+    candidates = cycle([0.3, 0.7])
+
+    def fixed_suggest(new_ids, domain, trials, seed, **kwargs):
+        docs = rand.suggest(new_ids, domain, trials, seed)
+        docs[0]["misc"]["vals"]["x"] = [next(candidates)]
+        return docs
+
+    monkeypatch.setattr(tpe, "suggest", fixed_suggest)
+    domain = Domain(objective, HYPER_SPACE)
+    new_ids = trials.new_trial_ids(1)
+    trials.refresh()
+    docs = cost_aware_suggest(new_ids, domain, trials, 0, n_candidates=2,
+                              n_startup_jobs=5)
+    return docs[0]["misc"]["vals"]["x"][0]
+
+
+def test_expected_improvement():
+    assert expected_improvement(1.0, 0.5, 1e-9) == 0.5
+    assert expected_improvement(0.0, 10.0, 1e-9) == 0.0
+    assert expected_improvement(0.0, 0.0, 1.0) > \
+        expected_improvement(0.0, 0.0, 0.1)
+
+
+def test_cost_aware_suggest(monkeypatch):
+    # Both candidates are equally promising, the cheap one is chosen.
+    assert suggest_x(create_trials(), monkeypatch) == 0.3
+
+
+def test_cost_aware_memo(monkeypatch):
+    # Trials answered from the loss memo do not make x=0.7 look cheap.
+    trials = create_trials(memo_points=[0.7]*10)
+    history = _get_history(trials)
+    assert len(trials.trials) == 28
+    assert len(history["loss"]) == 18
+    assert np.all(history["cost"] >= 1.0)
+    assert suggest_x(trials, monkeypatch) == 0.3
@@ -0,0 +1,56 @@
+import numpy as np
+from hyperopt import STATUS_OK, Trials
+
+from asreviewcontrib.hyperopt.fidelity import FidelitySchedule
+from asreviewcontrib.hyperopt.fidelity import compute_subsample_idx
+from asreviewcontrib.hyperopt.fidelity import parse_fidelities
+
+
+def test_parse_fidelities():
+    assert parse_fidelities("0.3,0.1") == [0.1, 0.3, 1.0]
+    assert parse_fidelities("0.5,1") == [0.5, 1.0]
+
+
+def test_subsample_idx():
+    y = np.zeros(1000, dtype=int)
+    y[::50] = 1
+
+    small_idx = compute_subsample_idx(y, 0.1)
+    large_idx = compute_subsample_idx(y, 0.3)
+    assert len(small_idx) == 100
+    assert np.sum(y[small_idx]) == 2
+    assert np.sum(y[large_idx]) == 6
+    # Subsamples are nested and reproducible.
+    assert np.all(np.isin(small_idx, large_idx))
+    assert np.all(small_idx == compute_subsample_idx(y, 0.1))
+    # At least two inclusions, so that there is a train and test inclusion.
+    assert np.sum(y[compute_subsample_idx(y, 0.01)]) == 2
+    assert np.all(compute_subsample_idx(y, 1.0) == np.arange(len(y)))
+
+
+def test_fidelity_schedule():
+    schedule = FidelitySchedule([0.1, 1.0], eta=2)
+    assert schedule.promote(0.1, 0.5)
+    assert schedule.promote(0.1, 0.4)
+    assert not schedule.promote(0.1, 0.6)
+    assert schedule.promote(0.1, 0.1)
+    assert not schedule.promote(1.0, 0.2)
+
+    # Stopped trials get the full fidelity loss with the same rank.
+    assert schedule.comparable_loss(1.0, 0.3) == 0.3
+    schedule.history[1.0] = [0.2, 0.4]
+    assert schedule.comparable_loss(0.1, 0.6) == 0.4
+
+    trials = Trials()
+    trials.insert_trial_docs([{
+        "state": 2, "tid": 0, "spec": None, "owner": None,
+        "book_time": None, "refresh_time": None, "exp_key": None,
+        "misc": {"tid": 0, "cmd": None, "workdir": None,
+                 "idxs": {}, "vals": {}},
+        "result": {"status": STATUS_OK, "loss": 0.3,
+                   "fidelity_loss": {0.1: 0.3, 1.0: 0.3}},
+    }])
+    trials.refresh()
+    new_schedule = FidelitySchedule([0.1, 1.0], eta=2)
+    new_schedule.restore(trials)
+    assert new_schedule.history == {0.1: [0.3], 1.0: [0.3]}
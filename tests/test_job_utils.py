@@ -0,0 +1,39 @@
+from argparse import ArgumentTypeError
+
+from pytest import mark
+from pytest import raises
+
+from asreviewcontrib.hyperopt.job_utils import parse_profile
+from asreviewcontrib.hyperopt.job_utils import parse_time
+
+
+@mark.parametrize("time_str,seconds", [
+    ("3600", 3600),
+    ("2.5", 2.5),
+    ("30s", 30),
+    ("90m", 5400),
+    ("10h", 36000),
+    (" 1D ", 86400),
+    ("0.5h", 1800),
+])
+def test_parse_time(time_str, seconds):
+    assert parse_time(time_str) == seconds
+
+
+@mark.parametrize("time_str", ["", "h", "ten", "10x", "1h30m"])
+def test_parse_time_invalid(time_str):
+    with raises(ArgumentTypeError):
+        parse_time(time_str)
+
+
+@mark.parametrize("selection", ["0.05", "1", "ptsd:0", "ptsd:0,ace:12",
+                                "data:v2:1"])
+def test_parse_profile(selection):
+    assert parse_profile(selection) == selection
+
+
+@mark.parametrize("selection", ["ptsd", "ptsd:x", "ptsd:0,ace", ":1", "0",
+                                "1.5", "-0.1", ""])
+def test_parse_profile_invalid(selection):
+    with raises(ArgumentTypeError):
+        parse_profile(selection)
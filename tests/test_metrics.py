@@ -0,0 +1,119 @@
+import json
+import os
+from os.path import join
+from pathlib import Path
+import shutil
+import time
+
+from asreviewcontrib.hyperopt.metrics import MetricsRecorder
+from asreviewcontrib.hyperopt.metrics import get_worker_ids
+from asreviewcontrib.hyperopt.metrics import write_prometheus
+
+
+def get_metrics_dir(request):
+    test_dir = request.fspath.dirname
+    metrics_dir = join(str(Path(test_dir, "temp")), "metrics")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    return metrics_dir
+
+
+def test_metrics_workers(request):
+    metrics_fp = join(get_metrics_dir(request), "metrics.jsonl")
+    metrics = MetricsRecorder(metrics_fp, workers=get_worker_ids(n_threads=3))
+    snapshot = metrics.snapshot()
+    # Workers are reported before their first job.
+    assert sorted(snapshot["workers"]) == ["0", "1", "2"]
+    assert all(values["idle"] == 1 for values in snapshot["workers"].values())
+
+    metrics.job_started(1)
+    time.sleep(0.05)
+    metrics.job_finished(1)
+    metrics.job_started(2)
+    time.sleep(0.05)
+    workers = metrics.snapshot()["workers"]
+    assert workers["0"]["busy"] == 0
+    assert 0.2 < workers["1"]["busy"] < 0.8
+    assert 0.2 < workers["2"]["busy"] < 0.8
+    metrics.job_finished(2, success=False)
+
+    # A restart keeps the workers, but forgets the jobs.
+    metrics.start()
+    snapshot = metrics.snapshot()
+    assert sorted(snapshot["workers"]) == ["0", "1", "2"]
+    assert snapshot["n_jobs"] == 0
+    shutil.rmtree(os.path.dirname(metrics_fp))
+
+
+def test_metrics_snapshot(request):
+    metrics_fp = join(get_metrics_dir(request), "metrics.jsonl")
+    metrics = MetricsRecorder(metrics_fp, interval=10.0)
+    for i_job in range(4):
+        metrics.job_started(0)
+        metrics.job_finished(0, success=i_job != 3)
+    metrics.set_queue_depth(5)
+    for latency in range(1, 101):
+        metrics.trial_finished(latency)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["n_jobs"] == 3
+    assert snapshot["n_failed"] == 1
+    assert snapshot["n_trials"] == 100
+    assert snapshot["queue_depth"] == 5
+    assert snapshot["jobs_per_second"] > 0
+    assert list(snapshot["trial_latency"]) == ["p50", "p90", "p99"]
+    assert 50 <= snapshot["trial_latency"]["p50"] <= 51
+    assert 99 <= snapshot["trial_latency"]["p99"] <= 100
+
+    # Snapshots are written at most every interval seconds.
+    metrics.maybe_write()
+    assert not os.path.isfile(metrics_fp)
+    metrics.write()
+    metrics.job_started(0)
+    metrics.job_finished(0)
+    metrics.interval = 0
+    metrics.maybe_write()
+    with open(metrics_fp) as fp:
+        snapshots = [json.loads(line) for line in fp]
+    assert [snapshot["n_jobs"] for snapshot in snapshots] == [3, 4]
+    shutil.rmtree(os.path.dirname(metrics_fp))
+
+
+def test_write_prometheus(request):
+    metrics_dir = get_metrics_dir(request)
+    prometheus_fp = join(metrics_dir, "hyperopt.prom")
+    metrics = MetricsRecorder(join(metrics_dir, "metrics.jsonl"),
+                              prometheus_fp=prometheus_fp, workers=[1, 2])
+    metrics.job_started(1)
+    metrics.job_finished(1)
+    metrics.trial_finished(2.0)
+    metrics.write()
+
+    # No temporary file is left behind.
+    assert sorted(os.listdir(metrics_dir)) == ["hyperopt.prom",
+                                               "metrics.jsonl"]
+    with open(prometheus_fp) as fp:
+        lines = fp.read().splitlines()
+    values = {}
+    for line in lines:
+        if line.startswith("# TYPE"):
+            _, _, name, metric_type = line.split()
+            assert metric_type in ["counter", "gauge"]
+        elif not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    assert values["asreview_hyperopt_jobs_total"] == 1
+    assert values["asreview_hyperopt_failed_jobs_total"] == 0
+    assert values["asreview_hyperopt_trials_total"] == 1
+    assert 'asreview_hyperopt_worker_busy_fraction{worker="1"}' in values
+    assert values['asreview_hyperopt_worker_busy_fraction{worker="2"}'] == 0
+    assert values[
+        'asreview_hyperopt_trial_latency_seconds{quantile="0.9"}'] == 2.0
+
+    # The file is replaced on every write.
+    metrics.job_started(2)
+    metrics.job_finished(2)
+    write_prometheus(metrics.snapshot(), prometheus_fp)
+    with open(prometheus_fp) as fp:
+        assert "asreview_hyperopt_jobs_total 2\n" in fp.read()
+    shutil.rmtree(metrics_dir)
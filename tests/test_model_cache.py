@@ -0,0 +1,32 @@
+from asreviewcontrib.hyperopt.model_cache import ModelCache
+from asreviewcontrib.hyperopt.model_cache import _embedding_key
+from asreviewcontrib.hyperopt.model_cache import cache_model_loaders
+
+
+def test_model_cache():
+    n_loads = []
+
+    def load_embedding(fp, word_index=None, n_jobs=None):
+        n_loads.append(fp)
+        return {"word": [0.0, 1.0]}
+
+    model_cache = ModelCache()
+    cached_load = model_cache.wrap_loader(load_embedding, _embedding_key)
+    assert model_cache.wrap_loader(cached_load, _embedding_key) is cached_load
+
+    embedding = cached_load("embedding.vec", n_jobs=4)
+    assert cached_load("embedding.vec", n_jobs=1) is embedding
+    cached_load("other.vec")
+    # Partial embeddings are not cached.
+    cached_load("embedding.vec", word_index={"word": 1})
+    cached_load("embedding.vec", word_index={"word": 1})
+    assert len(n_loads) == 4
+    assert model_cache.n_hit == 1
+    assert model_cache.n_miss == 2
+
+
+def test_no_model_loaders():
+    model_cache = ModelCache()
+    cache_model_loaders("tfidf", model_cache)
+    cache_model_loaders("doc2vec", model_cache)
+    assert model_cache.n_miss == 0
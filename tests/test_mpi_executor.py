@@ -0,0 +1,209 @@
+from collections import deque
+import time
+
+from pytest import importorskip
+from pytest import mark
+from pytest import raises
+
+importorskip("mpi4py")
+
+from asreviewcontrib.hyperopt import mpi_executor as mpi_module  # noqa: E402
+from asreviewcontrib.hyperopt.job_utils import JobFailedError  # noqa: E402
+from asreviewcontrib.hyperopt.mpi_executor import TAG_DONE  # noqa: E402
+from asreviewcontrib.hyperopt.mpi_executor import TAG_ERROR  # noqa: E402
+from asreviewcontrib.hyperopt.mpi_executor import TAG_JOB  # noqa: E402
+from asreviewcontrib.hyperopt.mpi_executor import TAG_TRIAL  # noqa: E402
+from asreviewcontrib.hyperopt.mpi_executor import mpi_executor  # noqa: E402
+
+
+class FakeStatus():
+    source = None
+    tag = None
+
+
+class FakeComm():
+    """Communicator that computes the jobs of the workers when they are sent.
+
+    The replies are queued, and arrive after reply_delay seconds. The reply
+    to the next job of a worker can be delayed further with delays.
+    """
+    def __init__(self, job_runner, n_proc, reply_delay=0):
+        self.job_runner = job_runner
+        self.n_proc = n_proc
+        self.reply_delay = reply_delay
+        self.worker_trials = {pid: {} for pid in range(1, n_proc)}
+        self.max_trials = 0
+        self.delays = {}
+        self.executed = []
+        self._replies = deque()
+
+    def Get_size(self):
+        return self.n_proc
+
+    def send(self, obj, dest, tag):
+        if tag == TAG_TRIAL:
+            reset, new_trials = obj
+            if reset:
+                self.worker_trials[dest] = {}
+            self.worker_trials[dest].update(new_trials)
+            self.max_trials = max(self.max_trials,
+                                  len(self.worker_trials[dest]))
+
+    def Send(self, buf, dest, tag):
+        assert tag == TAG_JOB
+        trial_id, data_idx, i_run = buf.tolist()
+        self.executed.append(dest)
+        try:
+            report = self.job_runner.execute_job(
+                data_name=self.job_runner.data_names[data_idx], i_run=i_run,
+                **self.worker_trials[dest][trial_id])
+        except ValueError as exc:
+            reply_tag, msg = TAG_ERROR, str(exc)
+        else:
+            reply_tag = TAG_DONE
+            msg = dict(report, pid=dest, i_exec=len(self.executed))
+        reply_time = time.time() + self.reply_delay + self.delays.pop(dest, 0)
+        self._replies.append((reply_time, dest, reply_tag, msg))
+
+    def Iprobe(self, source, tag, status):
+        for reply_time, pid, reply_tag, _ in self._replies:
+            if reply_time <= time.time():
+                status.source, status.tag = pid, reply_tag
+                return True
+        return False
+
+    def recv(self, source, tag):
+        for reply in self._replies:
+            if reply[1] == source:
+                self._replies.remove(reply)
+                return reply[3]
+
+
+class FakeMPI():
+    ANY_SOURCE = -1
+    ANY_TAG = -1
+    Status = FakeStatus
+
+    def __init__(self, comm):
+        self.COMM_WORLD = comm
+
+
+class FakeRunner():
+    data_names = ["data_a", "data_b"]
+    metrics = None
+
+    def __init__(self, n_fail=0):
+        # Number of times that the jobs of trial x=0 fail, before they work.
+        self.n_fail = {(data_name, i_run): n_fail
+                       for data_name in self.data_names for i_run in range(2)}
+
+    def execute_job(self, param, data_name, i_run):
+        if param["x"] == 0 and self.n_fail[data_name, i_run] > 0:
+            self.n_fail[data_name, i_run] -= 1
+            raise ValueError(f"job {data_name}/{i_run} failed")
+        return {"x": param["x"], "data_name": data_name, "i_run": i_run}
+
+
+def create_jobs(x):
+    param = {"x": x}
+    return [{"param": param, "data_name": data_name, "i_run": i_run}
+            for data_name in FakeRunner.data_names for i_run in range(2)]
+
+
+def fake_comm(monkeypatch, n_proc=4, n_fail=0, reply_delay=0):
+    comm = FakeComm(FakeRunner(n_fail), n_proc, reply_delay)
+    monkeypatch.setattr(mpi_module, "MPI", FakeMPI(comm))
+    monkeypatch.setattr(mpi_module, "_lost_workers", {})
+    return comm
+
+
+def test_mpi_executor(monkeypatch):
+    comm = fake_comm(monkeypatch)
+    jobs = create_jobs(0) + create_jobs(1)
+    reports = mpi_executor(jobs, FakeRunner(), stop_workers=False)
+    for job, report in zip(jobs, reports):
+        assert report["x"] == job["param"]["x"]
+        assert report["data_name"] == job["data_name"]
+        assert report["i_run"] == job["i_run"]
+    assert set(comm.executed) == {1, 2, 3}
+
+
+def test_mpi_executor_on_done(monkeypatch):
+    comm = fake_comm(monkeypatch)
+    n_trials = 50
+    done = {}
+
+    def on_done(i_job, report, error):
+        assert error is None
+        done[i_job] = report
+        x = report["x"]
+        n_done = sum(report["x"] == x for report in done.values())
+        # One new trial for each finished one.
+        if n_done == 4 and x + 2 < n_trials:
+            return create_jobs(x + 2)
+        return []
+
+    reports = mpi_executor(create_jobs(0) + create_jobs(1), FakeRunner(),
+                           stop_workers=False, on_done=on_done)
+    assert len(reports) == 4*n_trials
+    assert sorted(done) == list(range(4*n_trials))
+    for i_job, report in enumerate(reports):
+        assert report["x"] == i_job // 4
+    # The workers do not keep the finished trials.
+    assert comm.max_trials <= 3
+
+
+@mark.parametrize("n_proc", [1, 4])
+def test_mpi_executor_retry(monkeypatch, n_proc):
+    # Without workers, the server computes the jobs itself.
+    comm = fake_comm(monkeypatch, n_proc, n_fail=2)
+    reports = mpi_executor(create_jobs(0) + create_jobs(1), comm.job_runner,
+                           stop_workers=False, max_retries=2)
+    assert all(report is not None for report in reports)
+    assert all(n_fail == 0 for n_fail in comm.job_runner.n_fail.values())
+
+
+@mark.parametrize("n_proc", [1, 4])
+def test_mpi_executor_failed(monkeypatch, n_proc):
+    comm = fake_comm(monkeypatch, n_proc, n_fail=3)
+    with raises(JobFailedError, match="failed 3 times"):
+        mpi_executor(create_jobs(0) + create_jobs(1), comm.job_runner,
+                     stop_workers=False, max_retries=2)
+
+
+def test_mpi_executor_failed_on_done(monkeypatch):
+    comm = fake_comm(monkeypatch, n_fail=3)
+    errors = {}
+
+    def on_done(i_job, report, error):
+        errors[i_job] = error
+        return []
+
+    reports = mpi_executor(create_jobs(0) + create_jobs(1), comm.job_runner,
+                           stop_workers=False, max_retries=2, on_done=on_done)
+    # Only the jobs of the failing trial are given up.
+    for i_job in range(4):
+        assert reports[i_job] is None
+        assert "failed 3 times" in errors[i_job]
+    for i_job in range(4, 8):
+        assert reports[i_job]["x"] == 1
+        assert errors[i_job] is None
+
+
+def test_mpi_executor_lost_worker(monkeypatch):
+    comm = fake_comm(monkeypatch, n_proc=3, reply_delay=0.01)
+    # The first job of worker 1 replies long after its timeout.
+    comm.delays[1] = 0.2
+    jobs = [job for x in range(20) for job in create_jobs(x)]
+    reports = mpi_executor(jobs, comm.job_runner, stop_workers=False,
+                           job_timeout=0.05)
+
+    assert comm.executed[0] == 1
+    # The late result is discarded, and the worker gets new jobs.
+    assert all(report["i_exec"] != 1 for report in reports)
+    assert comm.executed[1:].count(1) > 0
+    assert len(mpi_module._lost_workers) == 0
+    for job, report in zip(jobs, reports):
+        assert report["x"] == job["param"]["x"]
+        assert report["data_name"] == job["data_name"]
+        assert report["i_run"] == job["i_run"]
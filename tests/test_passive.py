@@ -1,11 +1,15 @@
+import json
 import os
 from os.path import join
+import pickle
+import shutil
 from pytest import mark
 from pathlib import Path
 
 import numpy as np
 
 from asreviewcontrib.hyperopt.passive import main
+from asreviewcontrib.hyperopt.passive_job import compute_train_idx
 from asreviewcontrib.hyperopt.show_trials import load_trials
 
 
@@ -17,8 +21,14 @@ def remove_dir(output_dir):
         join(output_dir, "current", "embase_labelled", "labels.json"),
         join(output_dir, "current", "embase_labelled", "results_0.json"),
         join(output_dir, "current", "embase_labelled", "results_1.json"),
-        join(output_dir, "trials.pkl")
+        join(output_dir, "trials.pkl"),
+        join(output_dir, "trials_summary.npz"),
     ]
+    # Result files of the subsamples (--fidelities 0.5).
+    for sub_dir in ["best", "current"]:
+        for fp in ["labels_f0.5.json", "results_0_f0.5.json",
+                   "results_1_f0.5.json"]:
+            files.append(join(output_dir, sub_dir, "embase_labelled", fp))
     dirs = [
         join(output_dir, "best", "embase_labelled"),
         join(output_dir, "current", "embase_labelled"),
@@ -67,3 +77,141 @@ def test_passive(request, model, feature_extraction, balance_strategy):
     trial_vals = load_trials(join(output_dir, "trials.pkl"))["values"]
     assert np.all(np.array([len(x) for x in trial_vals.values()]) == 2)
     remove_dir(output_dir)
+
+
+def test_passive_sweep(request):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), "passive_sweep")
+    combinations = ["nb_simple_tfidf", "svm_simple_tfidf"]
+    args = ["--model", "nb,svm",
+            "--feature_extraction", "tfidf",
+            "--balance_strategy", "simple",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "2"
+            ]
+    for combination in combinations:
+        remove_dir(join(output_dir, combination))
+    main(args)
+    for combination in combinations:
+        trials_fp = join(output_dir, combination, "trials.pkl")
+        trial_vals = load_trials(trials_fp)["values"]
+        assert np.all(np.array([len(x) for x in trial_vals.values()]) == 2)
+        remove_dir(join(output_dir, combination))
+    os.rmdir(output_dir)
+
+
+@mark.parametrize("model", ["svm", "rf"])
+def test_passive_shared_dir(request, model):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), f"passive_shared_{model}")
+    shared_dir = os.path.join(str(base_output_dir), "shared")
+    args = ["--model", model,
+            "--feature_extraction", "tfidf",
+            "--balance_strategy", "double",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "2",
+            "--shared_dir", shared_dir,
+            ]
+    remove_dir(output_dir)
+    main(args)
+    trial_vals = load_trials(join(output_dir, "trials.pkl"))["values"]
+    assert len(trial_vals["loss"]) == 2
+    assert np.all(np.isfinite(trial_vals["loss"]))
+    remove_dir(output_dir)
+    shutil.rmtree(shared_dir)
+
+
+def test_passive_scratch(request):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), "passive_scratch")
+    scratch_dir = os.path.join(str(base_output_dir), "scratch")
+    args = ["--model", "nb",
+            "--feature_extraction", "tfidf",
+            "--balance_strategy", "simple",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "2",
+            "--scratch_dir", scratch_dir,
+            ]
+    # The output directory does not exist yet.
+    remove_dir(output_dir)
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    main(args)
+    trial_vals = load_trials(join(output_dir, "trials.pkl"))["values"]
+    assert len(trial_vals["loss"]) == 2
+    best_dir = join(output_dir, "best", "embase_labelled")
+    assert sorted(os.listdir(best_dir)) == [
+        "labels.json", "results_0.json", "results_1.json"]
+    remove_dir(output_dir)
+    shutil.rmtree(scratch_dir)
+
+
+def test_passive_fidelity(request):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), "passive_fidelity")
+    args = ["--model", "nb",
+            "--feature_extraction", "tfidf",
+            "--balance_strategy", "simple",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "4",
+            "--fidelities", "0.5",
+            "--eta", "2",
+            ]
+    remove_dir(output_dir)
+    main(args)
+    with open(join(output_dir, "trials.pkl"), "rb") as fp:
+        trials = pickle.load(fp)["trials"]
+    fidelities = [trial["result"]["fidelity"] for trial in trials.trials]
+    assert len(fidelities) == 4
+    assert set(fidelities) <= {0.5, 1.0}
+    # The first trial is always evaluated on the full dataset.
+    assert fidelities[0] == 1.0
+    for trial in trials.trials:
+        assert 0.5 in trial["result"]["fidelity_loss"]
+    remove_dir(output_dir)
+
+
+def test_passive_threads(request):
+    test_dir = request.fspath.dirname
+    data_dir = Path(test_dir, "data")
+    base_output_dir = Path(test_dir, "temp")
+    output_dir = os.path.join(str(base_output_dir), "passive_threads")
+    args = ["--model", "nb",
+            "--feature_extraction", "tfidf",
+            "--balance_strategy", "simple",
+            "--data_dir", str(data_dir),
+            "--n_run", "2",
+            "--output_dir", output_dir,
+            "--n_iter", "2",
+            "--n_threads", "2",
+            ]
+    remove_dir(output_dir)
+    main(args)
+    trial_vals = load_trials(join(output_dir, "trials.pkl"))["values"]
+    assert len(trial_vals["loss"]) == 2
+    assert np.all(np.isfinite(trial_vals["loss"]))
+
+    # The training sets only depend on the run number.
+    data_dir = join(output_dir, "current", "embase_labelled")
+    with open(join(data_dir, "labels.json")) as fp:
+        labels = np.array(json.load(fp))
+    for i_run in range(2):
+        with open(join(data_dir, f"results_{i_run}.json")) as fp:
+            train_idx = json.load(fp)["train_idx"]
+        assert train_idx == compute_train_idx(labels, i_run).tolist()
+    remove_dir(output_dir)
@@ -0,0 +1,61 @@
+import os
+from os.path import join
+from pathlib import Path
+import shutil
+
+from asreviewcontrib.hyperopt.profiling import JobProfiler
+from asreviewcontrib.hyperopt.profiling import write_profile_summary
+
+
+def get_profile_dir(request):
+    test_dir = request.fspath.dirname
+    profile_dir = join(str(Path(test_dir, "temp")), "profiles")
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    return profile_dir
+
+
+def job(param, data_name, i_run, fidelity=1.0):
+    return sum(range(1000))*param["x"]
+
+
+def test_profile_jobs(request):
+    profiler = JobProfiler("ptsd:0,ace:1", get_profile_dir(request))
+    param = {"x": 1}
+    assert profiler.is_selected(param, "ptsd", 0)
+    assert profiler.is_selected(param, "ace", 1)
+    assert not profiler.is_selected(param, "ptsd", 1)
+    assert not profiler.is_selected(param, "ace", 0)
+
+
+def test_profile_fraction(request):
+    profiler = JobProfiler("0.3", get_profile_dir(request))
+    selected = [profiler.is_selected({"x": x}, "ptsd", i_run)
+                for x in range(100) for i_run in range(10)]
+    assert 250 < sum(selected) < 350
+    # All processes select the same jobs.
+    assert selected == [JobProfiler("0.3", "").is_selected(
+        {"x": x}, "ptsd", i_run) for x in range(100) for i_run in range(10)]
+    assert all(JobProfiler("1", "").is_selected({"x": x}, "ptsd", 0)
+               for x in range(100))
+
+
+def test_profile_files(request):
+    profile_dir = get_profile_dir(request)
+    profiler = JobProfiler("ptsd:0", profile_dir)
+    param = {"x": 2}
+    assert profiler.run(job, param, "ptsd", 0) == 2*sum(range(1000))
+    profiler.run(job, param, "ptsd", 0, fidelity=0.1)
+
+    # Each fidelity has its own profile.
+    assert sorted(os.listdir(profile_dir)) == sorted([
+        os.path.basename(profiler.profile_fp(param, "ptsd", 0)),
+        os.path.basename(profiler.profile_fp(param, "ptsd", 0, 0.1))])
+    assert profiler.profile_fp(param, "ptsd", 0, 0.1).endswith("_f0.1.prof")
+
+    summary_fp = join(profile_dir, "profile_summary.txt")
+    write_profile_summary(profile_dir, summary_fp)
+    with open(summary_fp) as fp:
+        summary = fp.read()
+    assert summary.startswith("Merged profile of 2 jobs.")
+    assert "job" in summary
+    shutil.rmtree(profile_dir)
@@ -0,0 +1,49 @@
+import os
+from os.path import isfile, join
+from pathlib import Path
+import shutil
+
+from asreviewcontrib.hyperopt.job_utils import get_out_fp
+from asreviewcontrib.hyperopt.scratch import ScratchStaging
+
+
+def _write_job(scratch, i_run, content):
+    job_dir = scratch.job_dir()
+    with open(get_out_fp(job_dir, "ptsd", i_run), "w") as fp:
+        fp.write(content)
+    files = scratch.collect(job_dir)
+    assert not os.path.exists(job_dir)
+    return files
+
+
+def test_scratch(request):
+    test_dir = request.fspath.dirname
+    base_dir = join(str(Path(test_dir, "temp")), "scratch_test")
+    trials_dir = join(base_dir, "output")
+    shutil.rmtree(base_dir, ignore_errors=True)
+
+    scratch = ScratchStaging(join(base_dir, "scratch"), trials_dir,
+                             flush="best", flush_interval=0.01)
+    files = _write_job(scratch, 0, "first")
+    assert files == {join("current", "ptsd", "results_0.json"): b"first"}
+    scratch.store(files)
+    scratch.copy_best()
+    scratch.store(_write_job(scratch, 0, "second"))
+    scratch.flush()
+
+    # The loss is computed from the local mirror, only best is copied.
+    with open(join(scratch.local_dir, "current", "ptsd",
+                   "results_0.json")) as fp:
+        assert fp.read() == "second"
+    with open(join(trials_dir, "best", "ptsd", "results_0.json")) as fp:
+        assert fp.read() == "first"
+    assert not isfile(join(trials_dir, "current", "ptsd", "results_0.json"))
+
+    scratch.flush_all = True
+    scratch.store(_write_job(scratch, 1, "third"))
+    scratch.flush()
+    with open(join(trials_dir, "current", "ptsd", "results_1.json")) as fp:
+        assert fp.read() == "third"
+    # The copy time is kept to reserve time for the last flush of a run.
+    assert scratch.max_batch_time > 0
+    shutil.rmtree(base_dir)
@@ -0,0 +1,154 @@
+from multiprocessing import Pool
+from multiprocessing import Process
+import os
+from os.path import join
+from pathlib import Path
+import shutil
+import time
+
+import numpy as np
+from pytest import importorskip
+from scipy.sparse import csr_matrix, issparse, random
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import SVC
+
+from asreviewcontrib.hyperopt.shared_store import SharedFileStore
+from asreviewcontrib.hyperopt.shared_store import key_hash
+
+
+def _compute_matrix(count_dir):
+    # Count the number of processes that computed the matrix.
+    os.makedirs(count_dir, exist_ok=True)
+    open(join(count_dir, str(os.getpid())), "w").close()
+    return random(100, 50, density=0.1, format="csr", random_state=0)
+
+
+def _get_matrix(store_dir):
+    store = SharedFileStore(store_dir)
+    X = store.get(("tfidf", "ptsd"),
+                  lambda: _compute_matrix(store_dir + "_count"))
+    return X.toarray().sum()
+
+
+def test_shared_store(request):
+    test_dir = request.fspath.dirname
+    store_dir = join(str(Path(test_dir, "temp")), "shared_store")
+    shutil.rmtree(store_dir, ignore_errors=True)
+    shutil.rmtree(store_dir + "_count", ignore_errors=True)
+
+    X = random(100, 50, density=0.1, format="csr", random_state=0)
+    with Pool(4) as pool:
+        sums = pool.map(_get_matrix, [store_dir]*8)
+    assert np.allclose(sums, X.toarray().sum())
+    assert len(os.listdir(store_dir + "_count")) == 1
+
+    store = SharedFileStore(store_dir)
+    X_shared = store.get(("tfidf", "ptsd"), lambda: None)
+    assert issparse(X_shared)
+    assert not X_shared.data.flags.writeable
+    assert np.allclose(X_shared.toarray(), X.toarray())
+
+    labels = np.array([0, 1, 1, 0])
+    shared_labels = store.get(("labels", "ptsd"), lambda: labels)
+    assert np.all(shared_labels == labels)
+    assert isinstance(shared_labels, np.memmap)
+
+    shutil.rmtree(store_dir)
+    shutil.rmtree(store_dir + "_count")
+
+
+def _compute_forever(store_dir):
+    store = SharedFileStore(store_dir)
+    store.get(("tfidf", "ptsd"), lambda: time.sleep(3600))
+
+
+def test_shared_store_killed(request):
+    test_dir = request.fspath.dirname
+    store_dir = join(str(Path(test_dir, "temp")), "shared_store_killed")
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.makedirs(store_dir)
+    item_dir = join(store_dir, key_hash(("tfidf", "ptsd")))
+
+    # A process that is killed while it computes the matrix.
+    process = Process(target=_compute_forever, args=(store_dir,))
+    process.start()
+    while not os.path.exists(item_dir + ".lock"):
+        time.sleep(0.01)
+    time.sleep(0.2)
+    process.kill()
+    process.join()
+    os.makedirs(item_dir + ".tmp99999999")
+
+    store = SharedFileStore(store_dir, timeout=60)
+    start_time = time.time()
+    X = store.get(("tfidf", "ptsd"), lambda: np.arange(3))
+    assert time.time() - start_time < 10
+    assert np.all(X == np.arange(3))
+    assert not os.path.exists(item_dir + ".tmp99999999")
+
+    shutil.rmtree(store_dir)
+
+
+def test_mpi_window_store():
+    importorskip("mpi4py")
+    from asreviewcontrib.hyperopt.mpi_shared_store import MPIWindowStore
+
+    store = MPIWindowStore(2**16, max_entries=2)
+    X = random(100, 50, density=0.1, format="csr", random_state=0)
+    X_shared = store.get(("tfidf", "ptsd"), lambda: X)
+    assert np.allclose(X_shared.toarray(), X.toarray())
+    assert not X_shared.data.flags.writeable
+    assert store.get(("tfidf", "ptsd"), lambda: None) is X_shared
+
+    # Arrays that do not fit, or do not have an entry, are not shared.
+    large = np.ones(2**14)
+    assert store.get(("large", ), lambda: large) is large
+    small = np.zeros(4)
+    assert store.get(("small", ), lambda: small) is small
+
+
+def _unsorted_matrix():
+    """Sparse matrix with unsorted indices and duplicate entries."""
+    X = random(60, 30, density=0.2, format="csr", random_state=0)
+    indices, data, indptr = [], [], [0]
+    for i_row in range(X.shape[0]):
+        row = slice(X.indptr[i_row], X.indptr[i_row + 1])
+        # Each entry twice (with half the value), in reverse order.
+        indices.extend(np.repeat(X.indices[row][::-1], 2))
+        data.extend(np.repeat(X.data[row][::-1]/2, 2))
+        indptr.append(len(indices))
+    y = np.arange(X.shape[0]) % 2
+    return csr_matrix((data, indices, indptr), shape=X.shape), X, y
+
+
+def _check_fit(X_shared, X, y):
+    assert not X_shared.data.flags.writeable
+    assert np.allclose(X_shared.toarray(), X.toarray())
+    # sklearn sorts the indices of matrices that are not canonical in
+    # place, which fails for read-only arrays.
+    for model in [SVC(), RandomForestClassifier(n_estimators=2)]:
+        model.fit(X_shared, y)
+        model.predict(X_shared)
+
+
+def test_shared_store_unsorted(request):
+    test_dir = request.fspath.dirname
+    store_dir = join(str(Path(test_dir, "temp")), "shared_store_unsorted")
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+    X_unsorted, X, y = _unsorted_matrix()
+    X_shared = SharedFileStore(store_dir).get(("tfidf", "ptsd"),
+                                              lambda: X_unsorted)
+    _check_fit(X_shared, X, y)
+    shutil.rmtree(store_dir)
+
+
+def test_mpi_window_store_unsorted():
+    importorskip("mpi4py")
+    from asreviewcontrib.hyperopt.mpi_shared_store import MPIWindowStore
+
+    X_unsorted, X, y = _unsorted_matrix()
+    store = MPIWindowStore(2**16, max_entries=2)
+    X_shared = store.get(("tfidf", "ptsd"), lambda: X_unsorted)
+    assert X_shared is not X_unsorted
+    _check_fit(X_shared, X, y)
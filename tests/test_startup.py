@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+from pytest import mark
+
+
+@mark.parametrize(
+    "module_name",
+    [
+        "asreviewcontrib.hyperopt",
+        "asreviewcontrib.hyperopt.active",
+        "asreviewcontrib.hyperopt.passive",
+        "asreviewcontrib.hyperopt.cluster",
+        "asreviewcontrib.hyperopt.show_trials",
+        "asreviewcontrib.hyperopt.create_config",
+        "asreviewcontrib.hyperopt.compare_trials",
+    ]
+)
+def test_lazy_imports(module_name):
+    heavy_modules = ["hyperopt", "asreviewcontrib.hyperopt.base_job",
+                     "asreviewcontrib.hyperopt.mpi_executor"]
+    code = (f"import sys; import {module_name}; "
+            f"print([m for m in {heavy_modules!r} if m in sys.modules])")
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            stdout=subprocess.PIPE).stdout
+    assert output.decode().strip() == "[]"
+
+
+def test_entry_point_attribute():
+    import asreviewcontrib.hyperopt as hyperopt_ext
+    from asreviewcontrib.hyperopt.active import HyperActiveEntryPoint
+    if sys.version_info >= (3, 7):
+        assert hyperopt_ext.HyperActiveEntryPoint is HyperActiveEntryPoint
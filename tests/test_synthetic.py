@@ -0,0 +1,32 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pytest import mark
+
+from asreviewcontrib.hyperopt.synthetic import write_synthetic_csv
+
+
+@mark.parametrize(
+    "n_records,prevalence,chunk_size",
+    [
+        (100, 0.1, 10000),
+        (1000, 0.01, 300),
+    ]
+)
+def test_synthetic(request, n_records, prevalence, chunk_size):
+    test_dir = request.fspath.dirname
+    base_output_dir = Path(test_dir, "temp")
+    os.makedirs(base_output_dir, exist_ok=True)
+    data_fp = os.path.join(str(base_output_dir), f"synth_{n_records}.csv")
+
+    labels = write_synthetic_csv(data_fp, n_records, prevalence=prevalence,
+                                 n_words=20, chunk_size=chunk_size)
+    df = pd.read_csv(data_fp)
+    os.remove(data_fp)
+
+    assert len(df) == n_records
+    assert np.all(df["label_included"].values == labels)
+    assert np.sum(labels) == int(round(n_records*prevalence))
+    assert np.all(df["record_id"].values == np.arange(n_records))
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import numpy as np
+from pytest import mark
+
+from asreviewcontrib.hyperopt import base_job
+from asreviewcontrib.hyperopt.base_job import BaseJobRunner
+from asreviewcontrib.hyperopt.feature_cache import FeatureCache
+from asreviewcontrib.hyperopt.passive_job import compute_train_idx
+from asreviewcontrib.hyperopt.random_state import uses_global_random_state
+from asreviewcontrib.hyperopt.thread_executor import thread_executor
+
+
+class FakeRunner():
+    metrics = None
+
+    def __init__(self, global_random_state=False):
+        self.global_random_state = global_random_state
+        self.threads = set()
+
+    def uses_global_random_state(self):
+        return self.global_random_state
+
+    def execute_job(self, param, data_name, i_run):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return {"i_run": i_run}
+
+
+def create_jobs(n_jobs):
+    return [{"param": {}, "data_name": "data", "i_run": i_run}
+            for i_run in range(n_jobs)]
+
+
+def test_thread_executor():
+    runner = FakeRunner()
+    reports = thread_executor(create_jobs(8), runner, n_threads=4)
+    assert [report["i_run"] for report in reports] == list(range(8))
+    assert len(runner.threads) > 1
+
+
+def test_thread_executor_global_random_state():
+    runner = FakeRunner(global_random_state=True)
+    reports = thread_executor(create_jobs(4), runner, n_threads=4)
+    assert [report["i_run"] for report in reports] == list(range(4))
+    assert runner.threads == {threading.get_ident()}
+
+
+@mark.parametrize("n_threads", [1, 4])
+def test_thread_executor_on_done(n_threads):
+    runner = FakeRunner()
+    done = {}
+
+    def on_done(i_job, report, error):
+        done[i_job] = (report, error)
+        # Every job of the first batch adds one more job, which fails.
+        if i_job < 4:
+            return [{"param": {}, "data_name": "data", "i_run": "fail"}]
+        return []
+
+    def execute_job(param, data_name, i_run):
+        if i_run == "fail":
+            raise ValueError("job failed")
+        return {"i_run": i_run}
+
+    runner.execute_job = execute_job
+    reports = thread_executor(create_jobs(4), runner, n_threads=n_threads,
+                              on_done=on_done)
+    assert len(reports) == 8
+    assert reports[:4] == [{"i_run": i_run} for i_run in range(4)]
+    assert reports[4:] == [None]*4
+    assert sorted(done) == list(range(8))
+    for i_job in range(4, 8):
+        assert "job failed" in done[i_job][1]
+
+
+def test_train_idx_random_state():
+    labels = np.zeros(200, dtype=int)
+    labels[::10] = 1
+
+    # Same training sets as with the global random state seeded by i_run.
+    np.random.seed(3)
+    one_idx = np.where(labels == 1)[0]
+    zero_idx = np.where(labels == 0)[0]
+    global_idx = np.append(np.random.choice(one_idx, 15, replace=False),
+                           np.random.choice(zero_idx, 135, replace=False))
+    assert np.array_equal(compute_train_idx(labels, 3), global_idx)
+
+    # The global random state is neither used nor changed.
+    np.random.seed(0)
+    train_idx = compute_train_idx(labels, 3)
+    assert np.random.randint(2**30) == np.random.RandomState(0).randint(2**30)
+    assert np.array_equal(train_idx, global_idx)
+
+
+def test_uses_global_random_state():
+    assert not uses_global_random_state("nb", "max", "simple", "tfidf")
+    assert not uses_global_random_state(feature_name="tfidf")
+    assert uses_global_random_state(model_name="rf")
+    assert uses_global_random_state(balance_name="double")
+    assert uses_global_random_state("nb", "max_random", "simple", "tfidf")
+    assert uses_global_random_state(feature_name="doc2vec")
+
+
+def test_feature_cache_threads():
+    feature_cache = FeatureCache()
+    n_computed = []
+
+    def compute():
+        n_computed.append(1)
+        time.sleep(0.05)
+        return np.ones(3)
+
+    threads = [threading.Thread(target=feature_cache.get,
+                                args=("key", compute))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(n_computed) == 1
+    assert feature_cache.n_hit == 7
+
+
+def test_token_counts_threads(monkeypatch):
+    n_counted = []
+
+    class SlowTokenCounts():
+        def __init__(self, texts, title, abstract, ngram_max):
+            n_counted.append(ngram_max)
+            time.sleep(0.05)
+            self.ngram_max = ngram_max
+
+    monkeypatch.setattr(base_job, "TokenCounts", SlowTokenCounts)
+    job_runner = BaseJobRunner()
+    job_runner._cache = {"data": {}}
+    results = []
+
+    def get_counts(ngram_max):
+        token_counts = job_runner.get_cached_token_counts(
+            "data", 1.0, ngram_max, None, None, None)
+        results.append((ngram_max, token_counts.ngram_max))
+
+    threads = [threading.Thread(target=get_counts, args=(ngram_max,))
+               for ngram_max in [3, 1, 2] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(n_counted) <= 3
+    assert all(counted >= wanted for wanted, counted in results)
+    all_counts = job_runner._cache["data"]["token_counts"]
+    assert all_counts[1.0].ngram_max == 3
@@ -0,0 +1,68 @@
+import numpy as np
+from pytest import skip
+
+from asreviewcontrib.hyperopt.thread_executor import thread_executor
+from asreviewcontrib.hyperopt.timing import PhaseTimer
+from asreviewcontrib.hyperopt.timing import merge_reports
+from asreviewcontrib.hyperopt.timing import reset_peak_memory
+
+
+class TimedRunner():
+    metrics = None
+
+    def __init__(self, global_random_state=False):
+        self.global_random_state = global_random_state
+
+    def uses_global_random_state(self):
+        return self.global_random_state
+
+    def execute_job(self, param, data_name, i_run):
+        timer = PhaseTimer()
+        with timer.phase("fit"):
+            np.ones(2**16).sum()
+        return timer.report()
+
+
+def create_jobs(n_jobs):
+    return [{"param": {}, "data_name": "data", "i_run": i_run}
+            for i_run in range(n_jobs)]
+
+
+def test_phase_timer():
+    timer = PhaseTimer()
+    with timer.phase("fit"):
+        pass
+    with timer.phase("fit"):
+        pass
+    with timer.phase("loss"):
+        pass
+    report = timer.report()
+    assert sorted(report["timings"]) == ["fit", "loss"]
+    assert all(value >= 0 for value in report["timings"].values())
+
+
+def test_peak_memory():
+    if not reset_peak_memory():
+        skip("The peak memory cannot be reset on this platform.")
+    timer = PhaseTimer()
+    big = np.ones(2**25)
+    del big
+    first_peak = timer.report()["peak_memory"]
+
+    # The 256MB array of the first job is not part of the second one.
+    timer = PhaseTimer()
+    assert timer.report()["peak_memory"] < first_peak - 200
+
+
+def test_peak_memory_threads():
+    # Jobs in threads share the peak memory of the process.
+    reports = thread_executor(create_jobs(4), TimedRunner(), n_threads=2)
+    assert all(report["peak_memory"] is None for report in reports)
+    assert merge_reports(reports)["peak_memory"] is None
+    assert "fit" in merge_reports(reports)["timings"]
+
+    # Unless they are computed one at a time.
+    reports = thread_executor(create_jobs(2), TimedRunner(True), n_threads=2)
+    has_peak_memory = PhaseTimer().report()["peak_memory"] is not None
+    assert all((report["peak_memory"] is not None) == has_peak_memory
+               for report in reports)
@@ -0,0 +1,52 @@
+import numpy as np
+from pytest import mark
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.pipeline import Pipeline
+from scipy.sparse import hstack
+
+from asreviewcontrib.hyperopt.synthetic import generate_texts
+from asreviewcontrib.hyperopt.synthetic import make_vocabulary
+from asreviewcontrib.hyperopt.synthetic import synthetic_labels
+from asreviewcontrib.hyperopt.token_counts import TokenCounts
+from asreviewcontrib.hyperopt.token_counts import supports_token_counts
+
+
+class TfidfModel():
+    """Same pipeline as the asreview Tfidf feature model."""
+    def __init__(self, ngram_max):
+        self._model = Pipeline([
+            ('vect', CountVectorizer(ngram_range=(1, ngram_max))),
+            ('tfidf', TfidfTransformer())]
+        )
+
+
+@mark.parametrize("ngram_max", [1, 2, 3])
+@mark.parametrize("split_ta", [0, 1])
+def test_token_counts(ngram_max, split_ta):
+    labels = synthetic_labels(200)
+    titles, abstracts = generate_texts(
+        labels, make_vocabulary(300), np.arange(10), n_words=30,
+        random_state=np.random.RandomState(0))
+    titles, abstracts = np.array(titles), np.array(abstracts)
+    texts = np.array([title + " " + abstract
+                      for title, abstract in zip(titles, abstracts)])
+
+    model = TfidfModel(ngram_max)._model.fit(texts)
+    if split_ta:
+        X = hstack([model.transform(titles), model.transform(abstracts)])
+    else:
+        X = model.transform(texts)
+
+    token_counts = TokenCounts(texts, titles, abstracts, ngram_max=3)
+    X_counts = token_counts.tfidf(ngram_max, split_ta)
+    assert X_counts.shape == X.shape
+    assert np.allclose(X_counts.toarray(), X.toarray())
+
+
+def test_supports_token_counts():
+    assert supports_token_counts(TfidfModel(2))
+    model = TfidfModel(2)
+    model._model.steps[0][1].set_params(stop_words="english")
+    assert not supports_token_counts(model)
+    assert not supports_token_counts(object())
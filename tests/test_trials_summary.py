@@ -0,0 +1,62 @@
+import os
+from os.path import join
+import pickle
+from pathlib import Path
+
+from hyperopt import STATUS_FAIL, STATUS_OK, Trials, fmin, hp, rand
+import numpy as np
+from pytest import mark
+
+from asreviewcontrib.hyperopt.show_trials import load_trials
+from asreviewcontrib.hyperopt.trials_summary import load_trials_summary
+from asreviewcontrib.hyperopt.trials_summary import summary_fp_from_trials
+from asreviewcontrib.hyperopt.trials_summary import top_k
+from asreviewcontrib.hyperopt.trials_summary import write_trials_summary
+
+
+def objective(param):
+    if param["mdl_alpha"] > 9:
+        return {"status": STATUS_FAIL}
+    return {"loss": param["mdl_alpha"], "status": STATUS_OK,
+            "timings": {"fit": 0.5}, "peak_memory": 10.0}
+
+
+@mark.parametrize("write_summary", [True, False])
+def test_trials_summary(request, write_summary):
+    test_dir = request.fspath.dirname
+    output_dir = Path(test_dir, "temp")
+    os.makedirs(output_dir, exist_ok=True)
+    trials_fp = join(str(output_dir), "summary_trials.pkl")
+
+    trials = Trials()
+    hyper_space = {
+        "mdl_alpha": hp.uniform("mdl_alpha", 0, 10),
+        "fex_ngram_max": hp.quniform("fex_ngram_max", 1, 3, 1),
+        "fex_split_ta": hp.choice("fex_split_ta", ["yes", "no"]),
+    }
+    fmin(objective, hyper_space, algo=rand.suggest, max_evals=50,
+         trials=trials, show_progressbar=False, return_argmin=False)
+    trials_data = {"trials": trials,
+                   "hyper_choices": {"fex_split_ta": ["yes", "no"]},
+                   "model_name": "nb"}
+    with open(trials_fp, "wb") as fp:
+        pickle.dump(trials_data, fp)
+    if write_summary:
+        write_trials_summary(trials_fp, trials_data)
+
+    summary = load_trials_summary(trials_fp, timings=True)
+    values = load_trials(trials_fp)["values"]
+    os.remove(trials_fp)
+    os.remove(summary_fp_from_trials(trials_fp))
+
+    assert summary["model_name"] == "nb"
+    assert set(summary["values"]) == set(values)
+    for key in values:
+        assert np.array_equal(summary["values"][key], values[key],
+                              equal_nan=key == "loss")
+    assert summary["values"]["fex_ngram_max"].dtype == np.int64
+    assert np.all(np.isnan(summary["values"]["loss"])
+                  == np.isnan(summary["timings"]["time_fit"]))
+
+    idx = top_k(summary["values"]["loss"], 5)
+    assert np.array_equal(idx, np.argsort(values["loss"])[:5])
@@ -0,0 +1,54 @@
+import os
+from os.path import join
+import pickle
+from pathlib import Path
+
+from hyperopt import STATUS_OK, Trials, fmin, hp, tpe
+
+from asreviewcontrib.hyperopt.warm_start import WarmStart
+from asreviewcontrib.hyperopt.warm_start import count_warm_start
+
+
+HYPER_SPACE = {
+    "mdl_alpha": hp.uniform("mdl_alpha", 0, 1),
+    "fex_split_ta": hp.choice("fex_split_ta", ["yes", "no"]),
+}
+
+
+def objective(param):
+    loss = (param["mdl_alpha"] - 0.3)**2 + (param["fex_split_ta"] == "no")
+    return {"loss": loss, "status": STATUS_OK}
+
+
+def test_warm_start(request):
+    test_dir = request.fspath.dirname
+    output_dir = Path(test_dir, "temp")
+    os.makedirs(output_dir, exist_ok=True)
+    trials_fp = join(str(output_dir), "warm_trials.pkl")
+
+    old_trials = Trials()
+    fmin(objective, HYPER_SPACE, algo=tpe.suggest, max_evals=30,
+         trials=old_trials, show_progressbar=False)
+    # The order of the choices is different in the old run.
+    old_trials_data = {"trials": old_trials,
+                       "hyper_choices": {"fex_split_ta": ["no", "yes"]}}
+    for trial in old_trials.trials:
+        vals = trial["misc"]["vals"]["fex_split_ta"]
+        vals[0] = 1 - vals[0]
+    with open(trials_fp, "wb") as fp:
+        pickle.dump(old_trials_data, fp)
+
+    trials = Trials()
+    warm_start = WarmStart([trials_fp], n_points=3)
+    algo = warm_start.wrap_algo(tpe.suggest, trials,
+                                {"fex_split_ta": ["yes", "no"]})
+    fmin(objective, HYPER_SPACE, algo=algo, max_evals=5, trials=trials,
+         show_progressbar=False)
+    os.remove(trials_fp)
+
+    assert count_warm_start(trials) == 3
+    assert len(trials.trials) == 5
+    best_old = sorted(old_trials.trials,
+                      key=lambda trial: trial["result"]["loss"])[:3]
+    for old_trial, trial in zip(best_old, trials.trials):
+        assert trial["result"]["loss"] == old_trial["result"]["loss"]